@@ -0,0 +1,72 @@
+"""Compare full-resolution vs reduced-resolution decode in ImageLoader._process.
+
+Usage: python -m benchmarks.image_decode [--sizes 4032x3024,6000x4000] [--repeat 5]
+"""
+
+import argparse
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from lensforge.loaders.image_loader import ImageLoader
+
+
+def _photo_like(w: int, h: int, fmt: str) -> bytes:
+    """Smooth noise: compresses like a photo rather than like white noise."""
+    img = Image.effect_noise((w, h), 60).convert("RGB").filter(ImageFilter.GaussianBlur(3))
+    buf = BytesIO()
+    img.save(buf, format=fmt, quality=90)
+    return buf.getvalue()
+
+
+def _legacy_process(data: bytes, max_size: int) -> Image.Image:
+    """The pre-draft path: full decode, RGB convert, single LANCZOS resize."""
+    img = Image.open(BytesIO(data))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    w, h = img.size
+    if max(w, h) <= max_size:
+        return img
+    scale = max_size / max(w, h)
+    return img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
+
+
+def _best_ms(fn, repeat: int) -> tuple[float, Image.Image]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="2048x1536,4032x3024,6000x4000")
+    parser.add_argument("--formats", default="JPEG,PNG")
+    parser.add_argument("--max-size", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    loader = ImageLoader(max_size=args.max_size)
+    print(
+        f"{'input':>16} {'fmt':>5} {'legacy ms':>10} {'new ms':>8} {'speedup':>8} {'mean |Δ|':>9}"
+    )
+    for size in args.sizes.split(","):
+        w, h = (int(v) for v in size.split("x"))
+        for fmt in args.formats.split(","):
+            data = _photo_like(w, h, fmt)
+            legacy_ms, legacy = _best_ms(lambda: _legacy_process(data, args.max_size), args.repeat)
+            new_ms, new = _best_ms(lambda: loader._process(BytesIO(data)), args.repeat)
+            assert new.size == legacy.size, (new.size, legacy.size)
+            diff = np.abs(np.asarray(new, dtype=float) - np.asarray(legacy, dtype=float)).mean()
+            print(
+                f"{size:>16} {fmt:>5} {legacy_ms:>10.1f} {new_ms:>8.1f} "
+                f"{legacy_ms / new_ms:>7.2f}x {diff:>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
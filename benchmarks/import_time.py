@@ -0,0 +1,54 @@
+"""Where startup time goes: ``python -X importtime`` of app creation.
+
+Usage: python -m benchmarks.import_time [--top 20] [--models]
+
+Runs in a fresh interpreter and prints the slowest modules by cumulative
+import time plus the total. ``--models`` also loads the model weights (as warmup and
+``lensforge.server`` do), which is where torch/transformers load.
+"""
+
+import argparse
+import subprocess
+import sys
+
+APP = "from lensforge.app import create_app; create_app()"
+MODELS = (
+    "; from lensforge.container import Container; from lensforge.warmup import load_models;"
+    " c = Container(); c.config.from_pydantic(c.settings()); load_models(c)"
+)
+
+
+def _importtime(code: str) -> list[tuple[int, int, str]]:
+    """(self us, cumulative us, module) per imported module; nesting keeps its indentation."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line.removeprefix("import time:").split("|")
+        rows.append((int(own), int(cumulative), name.rstrip()[1:]))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--models", action="store_true", help="also load the model weights")
+    args = parser.parse_args()
+
+    rows = _importtime(APP + (MODELS if args.models else ""))
+    # Top-level imports carry no indentation; their cumulative times sum to the total.
+    total = sum(cumulative for _, cumulative, name in rows if not name.startswith(" "))
+    print(f"{'cumulative ms':>13} {'self ms':>8}  module")
+    for own, cumulative, name in sorted(rows, key=lambda r: r[1], reverse=True)[: args.top]:
+        print(f"{cumulative / 1000:>13.1f} {own / 1000:>8.1f}  {name.strip()}")
+    print(f"total import time: {total / 1000:.0f} ms over {len(rows)} modules")
+
+
+if __name__ == "__main__":
+    main()
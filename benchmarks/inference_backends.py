@@ -0,0 +1,65 @@
+"""Compare PyTorch vs ONNX Runtime (fp32, int8) image-classification throughput.
+
+Usage: python -m benchmarks.inference_backends [--models ...] [--onnx-dir models/onnx]
+       [--batch-sizes 1,8] [--repeat 5]
+
+Models missing from --onnx-dir are exported first (with int8 quantization).
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+from typing import Any
+
+from PIL import Image, ImageFilter
+
+from lensforge.inference.onnx import INT8_FILE, OnnxImagePipeline, export_model, model_dir
+
+DEFAULT_MODELS = "Anwarkh1/Skin_Cancer-Image_Classification,Falconsai/nsfw_image_detection"
+
+
+def _images(n: int) -> list[Image.Image]:
+    return [
+        Image.effect_noise((224, 224), 40 + i).convert("RGB").filter(ImageFilter.GaussianBlur(2))
+        for i in range(n)
+    ]
+
+
+def _images_per_s(pipe: Callable[..., Any], images: list[Image.Image], repeat: int) -> float:
+    pipe(images, batch_size=len(images))  # warm up
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pipe(images, batch_size=len(images))
+        best = min(best, time.perf_counter() - start)
+    return len(images) / best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", default=DEFAULT_MODELS)
+    parser.add_argument("--onnx-dir", default="models/onnx")
+    parser.add_argument("--batch-sizes", default="1,8")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from transformers import pipeline
+
+    print(f"{'model':>44} {'batch':>5} {'torch img/s':>12} {'onnx':>8} {'int8':>8}")
+    for name in args.models.split(","):
+        path = model_dir(args.onnx_dir, name)
+        if not (path / INT8_FILE).exists():
+            export_model(name, args.onnx_dir, quantize=True)
+        backends = [
+            pipeline("image-classification", model=name, top_k=5),
+            OnnxImagePipeline.from_dir(path, quantized=False),
+            OnnxImagePipeline.from_dir(path, quantized=True),
+        ]
+        for batch in (int(b) for b in args.batch_sizes.split(",")):
+            images = _images(batch)
+            rates = [_images_per_s(pipe, images, args.repeat) for pipe in backends]
+            print(f"{name:>44} {batch:>5} {rates[0]:>12.1f} {rates[1]:>8.1f} {rates[2]:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""End-to-end load test: throughput and tail latency of the app vs concurrency.
+
+Usage: python -m benchmarks.load_test [--target asgi|socket|http://host:port]
+       [--concurrency 1,4,16] [--requests 200] [--mix analyze=0.8,batch=0.2]
+       [--batch-size 4] [--url-share 0.25] [--image-host 127.0.0.1]
+       [--sizes 640x480=0.6,1600x1200=0.3,4032x3024=0.1]
+       [--real-models] [--stub-cost 10] [--cache] [--output load.json]
+
+``asgi`` drives the app in this process through ``httpx.ASGITransport``
+(routing, validation and the request threadpool, no sockets); ``socket``
+serves it with uvicorn on a local port; a URL targets a running server,
+configured however that server is. The in-process targets use the stub models
+of ``benchmarks.stub_models`` and no result cache unless ``--real-models`` /
+``--cache``.
+
+At each concurrency level, that many clients send ``--requests`` requests
+back to back (after an untimed warmup round). Requests are drawn from
+``--mix`` (``analyze`` = ``POST /analyze``, ``batch`` = ``POST
+/batch-analyze`` with ``--batch-size`` images); each image is a JPEG of a
+size drawn from ``--sizes``, sent as base64 or, with probability
+``--url-share``, as a URL on a stub image server. That server listens on
+``--image-host`` (default 127.0.0.1), which must be an address the target can
+reach; for a URL target without ``--image-host`` the URL share is forced to 0.
+A request fails on a transport error, a non-200 response or an ``error`` result.
+"""
+
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import math
+import os
+import random
+import socket
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from benchmarks.suite import encode, photo_like
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+PATHS = {"analyze": "/analyze", "batch": "/batch-analyze"}
+STUB_SETTINGS = {
+    "quality_class": "benchmarks.stub_models.StubQualityChecker",
+    "nsfw_class": "benchmarks.stub_models.StubNsfwDetector",
+    "classifier_class": "benchmarks.stub_models.StubClassifier",
+}
+
+Size = tuple[int, int]
+
+
+@dataclass
+class Sample:
+    kind: str
+    ms: float
+    images: int
+    error: str | None
+
+
+def _weights(text: str, key: Callable[[str], Any]) -> dict[Any, float]:
+    """Parse ``a=0.8,b=0.2`` into normalized weights."""
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        weights[key(name.strip())] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError(f"Weights must add up to more than 0: {text!r}")
+    return {k: w / total for k, w in weights.items()}
+
+
+def _size(text: str) -> Size:
+    w, h = (int(v) for v in text.lower().split("x"))
+    return w, h
+
+
+def _kind(text: str) -> str:
+    if text not in PATHS:
+        raise ValueError(f"Unknown request kind {text!r} (choose from {', '.join(PATHS)})")
+    return text
+
+
+class ImageServer:
+    """Serves the JPEGs at ``/<w>x<h>/<i>.jpg`` on a port of ``host``, like an image CDN."""
+
+    def __init__(self, images: dict[Size, list[bytes]], host: str = "127.0.0.1") -> None:
+        routes = {
+            f"/{w}x{h}/{i}.jpg": data
+            for (w, h), items in images.items()
+            for i, data in enumerate(items)
+        }
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:  # noqa: N802
+                body = routes.get(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, 0), Handler)
+        self._httpd.daemon_threads = True
+        self.base_url = f"http://{host}:{self._httpd.server_address[1]}"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class Payloads:
+    """Draws request bodies from the mix; image fragments are encoded once up front."""
+
+    def __init__(
+        self,
+        images: dict[Size, list[bytes]],
+        sizes: dict[Size, float],
+        mix: dict[str, float],
+        url_share: float,
+        batch_size: int,
+        image_base_url: str,
+        seed: int = 0,
+    ) -> None:
+        self._rng = random.Random(seed)
+        self._sizes, self._size_weights = list(sizes), list(sizes.values())
+        self._kinds, self._kind_weights = list(mix), list(mix.values())
+        self._url_share = url_share
+        self._batch_size = batch_size
+        self._base64 = {
+            size: [
+                json.dumps({"image_base64": base64.b64encode(d).decode()}).encode() for d in items
+            ]
+            for size, items in images.items()
+        }
+        self._urls = {
+            (w, h): [
+                json.dumps({"image_url": f"{image_base_url}/{w}x{h}/{i}.jpg"}).encode()
+                for i in range(len(items))
+            ]
+            for (w, h), items in images.items()
+        }
+
+    def _image(self) -> bytes:
+        size = self._rng.choices(self._sizes, self._size_weights)[0]
+        source = self._urls if self._rng.random() < self._url_share else self._base64
+        return self._rng.choice(source[size])
+
+    def next(self) -> tuple[str, bytes, int]:
+        """(kind, JSON body, image count) of the next request."""
+        kind = self._rng.choices(self._kinds, self._kind_weights)[0]
+        if kind == "analyze":
+            return kind, self._image(), 1
+        items = [self._image() for _ in range(self._batch_size)]
+        return kind, b'{"images":[' + b",".join(items) + b"]}", len(items)
+
+
+def _error(response: httpx.Response) -> str | None:
+    if response.status_code != 200:
+        return f"http {response.status_code}"
+    body = response.json()
+    results = body.get("results", [body])
+    if any(result.get("status") == "error" for result in results):
+        return "analysis error"
+    return None
+
+
+async def _run_level(
+    client: httpx.AsyncClient, payloads: Payloads, concurrency: int, requests: int
+) -> tuple[list[Sample], float]:
+    samples: list[Sample] = []
+    counter = itertools.count()
+
+    async def user() -> None:
+        while next(counter) < requests:
+            kind, body, images = payloads.next()
+            start = time.perf_counter()
+            try:
+                response = await client.post(PATHS[kind], content=body, headers=JSON_HEADERS)
+                error = _error(response)
+            except httpx.HTTPError as exc:
+                error = type(exc).__name__
+            samples.append(Sample(kind, (time.perf_counter() - start) * 1000, images, error))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return samples, time.perf_counter() - start
+
+
+def _percentile(sorted_ms: list[float], q: float) -> float:
+    """Nearest-rank percentile of a sorted list."""
+    return sorted_ms[min(len(sorted_ms) - 1, max(0, math.ceil(q * len(sorted_ms)) - 1))]
+
+
+def _latency(samples: list[Sample]) -> dict[str, float]:
+    ms = sorted(s.ms for s in samples)
+    return {
+        "p50_ms": round(_percentile(ms, 0.50), 2),
+        "p95_ms": round(_percentile(ms, 0.95), 2),
+        "p99_ms": round(_percentile(ms, 0.99), 2),
+        "mean_ms": round(statistics.fmean(ms), 2),
+        "max_ms": round(ms[-1], 2),
+    }
+
+
+def summarize(samples: list[Sample], elapsed: float) -> dict[str, Any]:
+    """Throughput, latency percentiles and errors of one level, overall and per kind."""
+    errors = [s.error for s in samples if s.error]
+    return {
+        "requests": len(samples),
+        "images": sum(s.images for s in samples),
+        "seconds": round(elapsed, 3),
+        "req_s": round(len(samples) / elapsed, 2),
+        "images_s": round(sum(s.images for s in samples) / elapsed, 2),
+        "error_rate": round(len(errors) / len(samples), 4),
+        "errors": dict(Counter(errors)),
+        **_latency(samples),
+        "kinds": {
+            kind: {
+                "requests": len(group),
+                "error_rate": round(sum(bool(s.error) for s in group) / len(group), 4),
+                **_latency(group),
+            }
+            for kind in sorted({s.kind for s in samples})
+            for group in [[s for s in samples if s.kind == kind]]
+        },
+    }
+
+
+def _create_app(real_models: bool, cache: bool) -> Any:
+    from dependency_injector import providers
+
+    from lensforge.app import create_app
+    from lensforge.config import Settings
+    from lensforge.container import Container
+
+    overrides: dict[str, Any] = {} if real_models else dict(STUB_SETTINGS)
+    if not cache:
+        overrides["result_cache_backend"] = "none"
+    settings = Settings(**overrides)
+    container = Container()
+    container.settings.override(providers.Object(settings))
+    container.config.from_pydantic(settings)
+    return create_app(container)
+
+
+@asynccontextmanager
+async def _client(
+    target: str, max_connections: int, real_models: bool, cache: bool
+) -> AsyncIterator[httpx.AsyncClient]:
+    limits = httpx.Limits(
+        max_connections=max_connections, max_keepalive_connections=max_connections
+    )
+    timeout = httpx.Timeout(120.0)
+    if target not in ("asgi", "socket"):
+        async with httpx.AsyncClient(base_url=target, limits=limits, timeout=timeout) as client:
+            yield client
+        return
+
+    app = _create_app(real_models, cache)
+    if target == "asgi":
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://lensforge", timeout=timeout
+            ) as client:
+                yield client
+        return
+
+    import uvicorn
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", backlog=2048))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+            yield client
+    finally:
+        server.should_exit = True
+        await asyncio.to_thread(thread.join, 30)
+        sock.close()
+
+
+async def _wait_ready(client: httpx.AsyncClient, timeout: float = 300.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise SystemExit(f"App not ready after {timeout:.0f}s")
+        await asyncio.sleep(0.1)
+
+
+def _url_share(target: str, url_share: float, image_host: str | None) -> float:
+    """``url_share``, or 0 for a remote target that could not reach 127.0.0.1."""
+    if target in ("asgi", "socket") or image_host is not None or not url_share:
+        return url_share
+    print(
+        "URL target without --image-host: the server cannot reach the local image "
+        "server, so every image is sent as base64 (--url-share 0)",
+        file=sys.stderr,
+    )
+    return 0.0
+
+
+async def run(args: argparse.Namespace) -> list[dict[str, Any]]:
+    sizes = _weights(args.sizes, _size)
+    mix = _weights(args.mix, _kind)
+    levels = [int(c) for c in args.concurrency.split(",")]
+    print(f"encoding {args.distinct} images per size...", file=sys.stderr)
+    images = {
+        size: [encode(photo_like(*size), "JPEG") for _ in range(args.distinct)] for size in sizes
+    }
+    image_server = ImageServer(images, args.image_host or "127.0.0.1")
+    payloads = Payloads(
+        images, sizes, mix, args.url_share, args.batch_size, image_server.base_url, args.seed
+    )
+    report = []
+    try:
+        async with _client(args.target, max(levels), args.real_models, args.cache) as client:
+            await _wait_ready(client)
+            for concurrency in levels:
+                await _run_level(client, payloads, concurrency, concurrency)  # warm up
+                samples, elapsed = await _run_level(client, payloads, concurrency, args.requests)
+                report.append({"concurrency": concurrency, **summarize(samples, elapsed)})
+    finally:
+        image_server.close()
+    return report
+
+
+def _print_table(report: list[dict[str, Any]]) -> None:
+    print(
+        f"{'conc':>5} {'kind':>8} {'requests':>9} {'req/s':>8} {'img/s':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+    )
+    for level in report:
+        kinds = level["kinds"] if len(level["kinds"]) > 1 else {}
+        rows = [("all", level), *kinds.items()]
+        for kind, row in rows:
+            rates = (
+                f"{row['req_s']:>8.1f} {row['images_s']:>8.1f}"
+                if kind == "all"
+                else f"{'':>8} {'':>8}"
+            )
+            print(
+                f"{level['concurrency']:>5} {kind:>8} {row['requests']:>9} {rates} "
+                f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} "
+                f"{row['error_rate']:>7.1%}"
+            )
+        if level["errors"]:
+            print(f"{'':>5} errors: {level['errors']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="asgi", help="asgi, socket or a base URL")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=200, help="per concurrency level")
+    parser.add_argument("--mix", default="analyze=0.8,batch=0.2")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--url-share", type=float, default=0.25)
+    parser.add_argument(
+        "--image-host", help="address of the stub image server, reachable from the target"
+    )
+    parser.add_argument("--sizes", default="640x480=0.6,1600x1200=0.3,4032x3024=0.1")
+    parser.add_argument("--distinct", type=int, default=8, help="distinct images per size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--real-models", action="store_true")
+    parser.add_argument("--stub-cost", type=int, help="matrix products per stub model call")
+    parser.add_argument("--cache", action="store_true", help="keep the result cache on")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    if args.stub_cost is not None:
+        os.environ["STUB_MODEL_COST"] = str(args.stub_cost)
+    args.url_share = _url_share(args.target, args.url_share, args.image_host)
+    try:
+        report = asyncio.run(run(args))
+    except ValueError as exc:
+        parser.error(str(exc))
+    _print_table(report)
+    if args.output:
+        settings = {k: v for k, v in vars(args).items() if k != "output"}
+        args.output.write_text(
+            json.dumps({"settings": settings, "levels": report}, indent=2) + "\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
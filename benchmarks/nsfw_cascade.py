@@ -0,0 +1,103 @@
+"""NSFW cascade vs the full model: throughput, escalations, disagreement, accuracy.
+
+Usage: python -m benchmarks.nsfw_cascade --fixtures DIR [--bands 0.2:0.95,0.1:0.98]
+       [--batch-size 8] [--fast-class ...] [--fast-options '{"backend": "onnx"}']
+
+DIR holds a labelled local image set: ``DIR/safe/*`` and ``DIR/nsfw/*``
+(any format Pillow reads). The full tier is the torch
+``FalconsaiNsfwDetector``; the fast tier defaults to the same settings as
+``NSFW_CASCADE_FAST_CLASS`` / ``NSFW_CASCADE_FAST_OPTIONS`` (export the ONNX
+models first with ``make onnx-export``). Disagreement is the share of images
+where the cascade's safe/unsafe call differs from the full model's.
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from lensforge.config import Settings
+from lensforge.container import _fast_tier_kwargs, import_class
+from lensforge.interfaces.nsfw_detector import NsfwResult, detect_batch
+from lensforge.pipeline.cascade import CascadeNsfwDetector
+
+LABELS = {"safe": True, "nsfw": False}
+
+
+def _load_fixtures(root: Path) -> tuple[list[Image.Image], list[bool]]:
+    images, safe = [], []
+    for label, is_safe in LABELS.items():
+        for path in sorted((root / label).glob("*")):
+            if path.is_file():
+                with Image.open(path) as img:
+                    images.append(img.convert("RGB"))
+                safe.append(is_safe)
+    if not images:
+        raise SystemExit(f"No images under {root}/safe or {root}/nsfw")
+    return images, safe
+
+
+def _agreement(calls: list[bool], expected: list[bool]) -> float:
+    return sum(a == b for a, b in zip(calls, expected)) / len(expected)
+
+
+def _run(
+    detector: object, images: list[Image.Image], batch_size: int
+) -> tuple[list[NsfwResult], float]:
+    detect_batch(detector, images[:batch_size])  # warm up
+    results: list[NsfwResult] = []
+    start = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        results += detect_batch(detector, images[i : i + batch_size])
+    return results, len(images) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    settings = Settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", type=Path, required=True)
+    parser.add_argument(
+        "--bands", default=f"{settings.nsfw_cascade_low}:{settings.nsfw_cascade_high}"
+    )
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--fast-class", default=settings.nsfw_cascade_fast_class)
+    parser.add_argument("--fast-options", default=json.dumps(settings.nsfw_cascade_fast_options))
+    args = parser.parse_args()
+
+    from custom.extensions.dermatology.falconsai_nsfw import FalconsaiNsfwDetector
+
+    images, labels = _load_fixtures(args.fixtures)
+    full = FalconsaiNsfwDetector(threshold=settings.nsfw_threshold)
+    fast_kwargs = _fast_tier_kwargs(
+        json.loads(args.fast_options),
+        settings.nsfw_threshold,
+        settings.onnx_model_dir,
+        settings.onnx_quantized,
+    )
+    fast = import_class(args.fast_class)(**fast_kwargs)
+
+    reference, full_rate = _run(full, images, args.batch_size)
+    full_acc = _agreement([r.is_safe for r in reference], labels)
+    print(f"{len(images)} images ({labels.count(True)} safe, {labels.count(False)} nsfw)")
+    print(
+        f"{'config':>16} {'img/s':>8} {'speedup':>8} {'escalated':>10} "
+        f"{'disagree':>9} {'accuracy':>9}"
+    )
+    print(f"{'full':>16} {full_rate:>8.1f} {1.0:>8.2f} {'-':>10} {'-':>9} {full_acc:>9.3f}")
+    for band in args.bands.split(","):
+        low, high = (float(x) for x in band.split(":"))
+        cascade = CascadeNsfwDetector(fast, full, low, high)
+        results, rate = _run(cascade, images, args.batch_size)
+        escalated = sum(r.decided_by == "full" for r in results) / len(results)
+        disagree = 1 - _agreement([r.is_safe for r in results], [r.is_safe for r in reference])
+        accuracy = _agreement([r.is_safe for r in results], labels)
+        print(
+            f"{'cascade ' + band:>16} {rate:>8.1f} {rate / full_rate:>8.2f} {escalated:>10.1%} "
+            f"{disagree:>9.2%} {accuracy:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Stub models with a deterministic CPU cost, for benchmarks and load tests.
+
+Each call resizes the image to the model input size, normalizes it and runs
+``cost`` fixed-size matrix products, so timings track pipeline overhead plus a
+stable amount of "inference" without torch or downloaded weights. Results
+depend only on the pixels. The constructors accept (and ignore) the keyword
+arguments the container passes to real extensions, so the classes also work
+as ``QUALITY_CLASS`` / ``NSFW_CLASS`` / ``CLASSIFIER_CLASS``.
+"""
+
+import os
+from typing import Any
+
+import numpy as np
+from PIL import Image
+
+from lensforge.interfaces.domain_classifier import ClassificationResult, Prediction
+from lensforge.interfaces.nsfw_detector import NsfwResult
+from lensforge.interfaces.quality_checker import QualityResult
+
+INPUT_SIZE = 224
+# Matrix products per call; STUB_MODEL_COST overrides the default (e.g. for the
+# models the container builds, which get no ``cost`` argument).
+DEFAULT_COST = 10
+
+_WEIGHTS = np.random.default_rng(0).standard_normal((INPUT_SIZE, INPUT_SIZE)).astype(np.float32)
+
+
+def _cost(cost: int | None) -> int:
+    return int(os.environ.get("STUB_MODEL_COST", DEFAULT_COST)) if cost is None else cost
+
+
+def _infer(image: Image.Image, cost: int) -> float:
+    """Model-shaped work on ``image``; returns a score in [0, 1].
+
+    ``cost=0`` does not touch the pixels, leaving only the pipeline's overhead.
+    """
+    if cost <= 0:
+        return 0.0
+    x = np.asarray(image.convert("L").resize((INPUT_SIZE, INPUT_SIZE)), dtype=np.float32) / 255
+    score = float(x.mean())
+    for _ in range(cost):
+        x = np.tanh(x @ _WEIGHTS / INPUT_SIZE)
+    return score
+
+
+class StubQualityChecker:
+    def __init__(self, cost: int | None = None, **_: Any) -> None:
+        self._cost = _cost(cost)
+
+    @property
+    def version(self) -> str:
+        return "stub-quality-1.0"
+
+    def check(self, image: Image.Image) -> QualityResult:
+        _infer(image, self._cost)
+        return QualityResult(score=1.0, is_acceptable=True)
+
+
+class StubNsfwDetector:
+    def __init__(self, cost: int | None = None, **_: Any) -> None:
+        self._cost = _cost(cost)
+
+    @property
+    def version(self) -> str:
+        return "stub-nsfw-1.0"
+
+    def detect(self, image: Image.Image) -> NsfwResult:
+        return NsfwResult(is_safe=True, nsfw_score=round(_infer(image, self._cost) / 10, 3))
+
+    def detect_batch(self, images: list[Image.Image]) -> list[NsfwResult]:
+        return [self.detect(image) for image in images]
+
+
+class StubClassifier:
+    def __init__(self, cost: int | None = None, **_: Any) -> None:
+        self._cost = _cost(cost)
+
+    @property
+    def version(self) -> str:
+        return "stub-classifier-1.0"
+
+    def classify(self, image: Image.Image) -> ClassificationResult:
+        score = _infer(image, self._cost)
+        return ClassificationResult(
+            detected=True,
+            predictions=[Prediction("stub", round(score, 3), "low")],
+            description="Stub classification",
+        )
+
+    def classify_batch(self, images: list[Image.Image]) -> list[ClassificationResult]:
+        return [self.classify(image) for image in images]
@@ -0,0 +1,252 @@
+"""Benchmark suite: image loader, quality checker and pipeline, with a regression gate.
+
+Usage: python -m benchmarks.suite [--groups loader,quality,pipeline] [--filter TEXT]
+       [--repeat 15] [--real-models] [--output results.json]
+       [--baseline baseline.json] [--threshold 0.15]
+
+Each case runs ``repeat`` samples of enough calls to last ``--min-sample-ms``
+(garbage collection off, like ``timeit``) and reports per-call milliseconds.
+Pipeline cases use the deterministic stub models of ``benchmarks.stub_models``
+(``stub-zero-cost`` isolates the pipeline's own overhead); ``--real-models``
+adds the dermatology models (torch, downloads weights).
+
+``--output`` writes the results as JSON. With ``--baseline`` (an earlier
+output) every case whose median is more than ``--threshold`` slower than the
+baseline's is flagged and the exit status is 1. Cases missing on either side
+are listed but never fail the run. Baselines only compare on the same machine.
+"""
+
+import argparse
+import base64
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Any
+
+from PIL import Image, ImageFilter
+
+from benchmarks.stub_models import StubClassifier, StubNsfwDetector, StubQualityChecker
+from lensforge.cache.memory import MemoryResultCache
+from lensforge.loaders.image_loader import ImageLoader
+from lensforge.pipeline.analysis_pipeline import AnalysisPipeline
+from lensforge.pipeline.stages import StageGraph
+
+GROUPS = ("loader", "quality", "pipeline")
+LOADER_SIZES = ((640, 480), (1600, 1200), (4032, 3024))
+LOADER_FORMATS = ("JPEG", "PNG", "WEBP")
+QUALITY_SIZES = ((256, 256), (512, 512), (1024, 768))
+PIPELINE_BATCH = 8
+
+Case = tuple[str, Callable[[], object]]
+
+
+def photo_like(w: int, h: int) -> Image.Image:
+    """Smooth noise: compresses like a photo rather than like white noise."""
+    return Image.effect_noise((w, h), 60).convert("RGB").filter(ImageFilter.GaussianBlur(3))
+
+
+def encode(image: Image.Image, fmt: str) -> bytes:
+    buf = BytesIO()
+    image.save(buf, format=fmt, quality=90)
+    return buf.getvalue()
+
+
+def loader_cases() -> list[Case]:
+    loader = ImageLoader(max_size=1024)
+    cases: list[Case] = []
+    for w, h in LOADER_SIZES:
+        image = photo_like(w, h)
+        for fmt in LOADER_FORMATS:
+            data = encode(image, fmt)
+            b64 = base64.b64encode(data).decode()
+            cases.append(
+                (f"loader.load_base64/{fmt}-{w}x{h}", lambda b=b64: loader.load_base64(b).load())
+            )
+            cases.append(
+                (f"loader.process/{fmt}-{w}x{h}", lambda d=data: loader._process(BytesIO(d)).load())
+            )
+    return cases
+
+
+def quality_cases() -> list[Case]:
+    from custom.extensions.dermatology.brisque_checker import BrisqueChecker
+
+    checker = BrisqueChecker()
+    return [
+        (f"quality.brisque/{w}x{h}", lambda i=photo_like(w, h): checker.check(i))
+        for w, h in QUALITY_SIZES
+    ]
+
+
+def _stub_graph(cost: int | None = None) -> StageGraph:
+    return StageGraph.default(
+        StubQualityChecker(cost), StubNsfwDetector(cost), StubClassifier(cost)
+    )
+
+
+def pipeline_cases(real_models: bool, executor: ThreadPoolExecutor) -> list[Case]:
+    image = ImageLoader(max_size=1024)._process(BytesIO(encode(photo_like(1600, 1200), "JPEG")))
+    batch = [image.rotate(90 * i, expand=True) for i in range(PIPELINE_BATCH)]
+    plain = AnalysisPipeline(_stub_graph())
+    overhead = AnalysisPipeline(_stub_graph(cost=0))
+    parallel = AnalysisPipeline(_stub_graph(), stage_executor=executor)
+    cached = AnalysisPipeline(_stub_graph(), cache=MemoryResultCache())
+    cached.analyze(image)
+    cases: list[Case] = [
+        ("pipeline.analyze/stub", lambda: plain.analyze(image)),
+        ("pipeline.analyze/stub-zero-cost", lambda: overhead.analyze(image)),
+        ("pipeline.analyze/stub-parallel", lambda: parallel.analyze(image)),
+        ("pipeline.analyze/stub-cache-hit", lambda: cached.analyze(image)),
+        (f"pipeline.analyze_batch/stub-{PIPELINE_BATCH}", lambda: plain.analyze_batch(batch)),
+    ]
+    if real_models:
+        from custom.extensions.dermatology.brisque_checker import BrisqueChecker
+        from custom.extensions.dermatology.falconsai_nsfw import FalconsaiNsfwDetector
+        from custom.extensions.dermatology.vit_skin import VitSkinClassifier
+        from lensforge.warmup import load_stage_models
+
+        graph = StageGraph.default(
+            BrisqueChecker(blur_threshold=0), FalconsaiNsfwDetector(), VitSkinClassifier()
+        )
+        load_stage_models(graph.stages)
+        real = AnalysisPipeline(graph)
+        cases += [
+            ("pipeline.analyze/real", lambda: real.analyze(image)),
+            (f"pipeline.analyze_batch/real-{PIPELINE_BATCH}", lambda: real.analyze_batch(batch)),
+        ]
+    return cases
+
+
+def measure(fn: Callable[[], object], repeat: int, min_sample_ms: float) -> dict[str, float]:
+    """Per-call milliseconds over ``repeat`` samples of calibrated call counts."""
+    start = time.perf_counter()
+    fn()  # warm up and calibrate
+    once = time.perf_counter() - start
+    number = max(1, math.ceil(min_sample_ms / 1000 / max(once, 1e-9)))
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter() - start) * 1000 / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "min_ms": round(samples[0], 4),
+        "p95_ms": round(samples[min(len(samples) - 1, math.ceil(0.95 * len(samples)) - 1)], 4),
+        "stdev_ms": round(statistics.pstdev(samples), 4),
+        "calls": number * repeat,
+    }
+
+
+def compare(
+    results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]]
+) -> dict[str, float]:
+    """Median change vs the baseline per shared case (0.10 = 10 % slower)."""
+    return {
+        name: result["median_ms"] / baseline[name]["median_ms"] - 1
+        for name, result in results.items()
+        if name in baseline and baseline[name]["median_ms"] > 0
+    }
+
+
+def _environment() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def run(
+    groups: list[str], name_filter: str, repeat: int, min_sample_ms: float, real_models: bool
+) -> dict[str, dict[str, float]]:
+    results: dict[str, dict[str, float]] = {}
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        builders: dict[str, Callable[[], list[Case]]] = {
+            "loader": loader_cases,
+            "quality": quality_cases,
+            "pipeline": lambda: pipeline_cases(real_models, executor),
+        }
+        for group in groups:
+            for name, fn in builders[group]():
+                if name_filter in name:
+                    results[name] = measure(fn, repeat, min_sample_ms)
+                    print(f"  {name}: {results[name]['median_ms']:.3f} ms", file=sys.stderr)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--groups", default=",".join(GROUPS))
+    parser.add_argument("--filter", default="", help="only cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--min-sample-ms", type=float, default=20.0)
+    parser.add_argument("--real-models", action="store_true")
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.15)
+    args = parser.parse_args()
+
+    groups = args.groups.split(",")
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown groups: {', '.join(sorted(unknown))} (choose from {GROUPS})")
+
+    results = run(groups, args.filter, args.repeat, args.min_sample_ms, args.real_models)
+    if args.output:
+        report = {
+            "environment": _environment(),
+            "settings": {"repeat": args.repeat, "min_sample_ms": args.min_sample_ms},
+            "results": results,
+        }
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    baseline = json.loads(args.baseline.read_text())["results"] if args.baseline else {}
+    changes = compare(results, baseline)
+    print(f"{'case':<36} {'median ms':>10} {'p95 ms':>9} {'baseline':>9} {'change':>8}")
+    for name, result in results.items():
+        base = f"{baseline[name]['median_ms']:>9.3f}" if name in baseline else f"{'-':>9}"
+        change = (
+            f"{changes[name]:>+8.1%}" if name in changes else f"{'new' if baseline else '-':>8}"
+        )
+        flag = "  REGRESSION" if changes.get(name, 0) > args.threshold else ""
+        median, p95 = result["median_ms"], result["p95_ms"]
+        print(f"{name:<36} {median:>10.3f} {p95:>9.3f} {base} {change}{flag}")
+    missing = sorted(set(baseline) - set(results))
+    if missing:
+        print(f"{len(missing)} baseline case(s) not run")
+
+    regressions = [name for name, change in changes.items() if change > args.threshold]
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
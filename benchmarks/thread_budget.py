@@ -0,0 +1,126 @@
+"""Latency under concurrency with and without a thread budget.
+
+Usage: python -m benchmarks.thread_budget [--concurrency 8] [--requests 64]
+       [--workload synthetic|models]
+
+Each configuration runs in a fresh process (thread pools and BLAS env vars
+are fixed once per process). ``default`` applies nothing, so every library
+sizes itself to the whole machine; ``budget`` applies
+``ThreadBudget.derive`` with the intra-op share split across the concurrent
+requests; ``budget-1`` runs every library single-threaded.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CONFIGS = ["default", "budget", "budget-1"]
+
+
+def _workload(kind: str):
+    """A per-request callable mixing OpenCV, BLAS and (if present) torch work."""
+    import numpy as np
+    from PIL import Image
+
+    from custom.extensions.dermatology.brisque_checker import BrisqueChecker
+
+    image = Image.effect_noise((1024, 768), 40).convert("RGB")
+    if kind == "models":
+        from custom.extensions.dermatology.falconsai_nsfw import FalconsaiNsfwDetector
+        from custom.extensions.dermatology.vit_skin import VitSkinClassifier
+        from lensforge.pipeline.analysis_pipeline import AnalysisPipeline
+        from lensforge.pipeline.stages import StageGraph
+
+        pipeline = AnalysisPipeline(
+            StageGraph.default(
+                BrisqueChecker(blur_threshold=0), FalconsaiNsfwDetector(), VitSkinClassifier()
+            )
+        )
+        return lambda: pipeline.analyze(image)
+
+    checker = BrisqueChecker()
+    a = np.random.default_rng(0).random((384, 384), dtype=np.float32)
+    try:
+        import torch
+
+        t = torch.rand(256, 768)
+        w = torch.rand(768, 768)
+    except ImportError:
+        torch = None
+
+    def run() -> None:
+        checker.check(image)
+        a @ a
+        if torch is not None:
+            with torch.inference_mode():
+                for _ in range(4):
+                    torch.nn.functional.gelu(t @ w)
+
+    return run
+
+
+def _child(config: str, kind: str, concurrency: int, requests: int) -> dict[str, float]:
+    from lensforge.threads import ThreadBudget, apply_thread_budget, available_cpus
+
+    if config == "budget":
+        cores = len(available_cpus())
+        apply_thread_budget(
+            ThreadBudget.derive(torch_intra_op_threads=max(1, cores // concurrency))
+        )
+    elif config == "budget-1":
+        apply_thread_budget(ThreadBudget.derive(torch_intra_op_threads=1))
+
+    run = _workload(kind)
+    run()  # warm up
+
+    def timed(_: int) -> float:
+        start = time.perf_counter()
+        run()
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = sorted(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "req_s": requests / elapsed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--workload", choices=["synthetic", "models"], default="synthetic")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = _child(args.child, args.workload, args.concurrency, args.requests)
+        print(json.dumps(result))
+        return
+
+    print(f"cores={os.cpu_count()} concurrency={args.concurrency} workload={args.workload}")
+    print(f"{'config':>10} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    for config in CONFIGS:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.thread_budget", "--child", config]
+            + ["--concurrency", str(args.concurrency), "--requests", str(args.requests)]
+            + ["--workload", args.workload],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        row = json.loads(out.strip().splitlines()[-1])
+        print(f"{config:>10} {row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['req_s']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Latency, throughput and top-1 agreement of torch optimizations vs fp32.
+
+Usage: python -m benchmarks.torch_optimizations [--models ...] [--configs int8;bf16;compile]
+       [--batch-size 8] [--images 64] [--repeat 5]
+
+Each config is a comma-separated set of names from lensforge.inference.torch_cpu;
+the baseline is the unmodified fp32 transformers pipeline.
+"""
+
+import argparse
+import statistics
+import time
+from typing import Any
+
+from PIL import Image, ImageFilter
+
+from lensforge.inference.torch_cpu import optimize_pipeline, resolve_optimizations
+
+DEFAULT_MODELS = "Anwarkh1/Skin_Cancer-Image_Classification,Falconsai/nsfw_image_detection"
+DEFAULT_CONFIGS = "inference_mode;int8,inference_mode;bf16,inference_mode;compile,inference_mode"
+
+
+def _images(n: int) -> list[Image.Image]:
+    return [
+        Image.effect_noise((224, 224), 20 + i).convert("RGB").filter(ImageFilter.GaussianBlur(2))
+        for i in range(n)
+    ]
+
+
+def _measure(pipe: Any, images: list[Image.Image], batch: int, repeat: int) -> dict[str, Any]:
+    pipe(images[:batch], batch_size=batch)  # warm up (and compile)
+    pipe(images[0])
+    latencies = []
+    for image in images[: repeat * 4]:
+        start = time.perf_counter()
+        pipe(image)
+        latencies.append((time.perf_counter() - start) * 1000)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outputs = pipe(images, batch_size=batch)
+        best = min(best, time.perf_counter() - start)
+    return {
+        "p50_ms": statistics.median(latencies),
+        "img_s": len(images) / best,
+        "top1": [results[0]["label"] for results in outputs],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", default=DEFAULT_MODELS)
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from transformers import pipeline
+
+    images = _images(args.images)
+    print(f"{'model':>44} {'config':>26} {'p50 ms':>8} {'img/s':>8} {'top-1 agree':>12}")
+    for name in args.models.split(","):
+        baseline = _measure(
+            pipeline("image-classification", model=name), images, args.batch_size, args.repeat
+        )
+        rows = [("fp32 baseline", baseline)]
+        for config in args.configs.split(";"):
+            optimizations = resolve_optimizations(config.split(","))
+            pipe = optimize_pipeline(pipeline("image-classification", model=name), optimizations)
+            rows.append(
+                (
+                    ",".join(sorted(optimizations)) or "none",
+                    _measure(pipe, images, args.batch_size, args.repeat),
+                )
+            )
+        for label, row in rows:
+            agree = sum(a == b for a, b in zip(row["top1"], baseline["top1"])) / len(images)
+            print(
+                f"{name:>44} {label:>26} {row['p50_ms']:>8.1f} {row['img_s']:>8.1f} {agree:>12.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
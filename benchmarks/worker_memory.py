@@ -0,0 +1,113 @@
+"""Memory of N server workers: fork-after-load vs ``uvicorn --workers``.
+
+Usage: python -m benchmarks.worker_memory [--workers 1,2,4] [--modes fork,uvicorn]
+
+Starts the server in each mode, waits until every worker reports ready,
+sends a few requests so activations are allocated, then reads
+``/proc/<pid>/smaps_rollup`` of the whole process tree (Linux only). PSS
+splits shared pages between the processes mapping them, so total PSS is
+the real footprint; per-worker private memory is what one extra worker costs.
+"""
+
+import argparse
+import base64
+import io
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from PIL import Image, ImageFilter
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rollup(pid: int) -> dict[str, int]:
+    """Rss, Pss and private (clean + dirty) memory in KiB."""
+    fields: dict[str, int] = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        key, value = line.split(":", 1)
+        fields[key] = int(value.split()[0])
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def _command(mode: str, workers: int, port: int) -> list[str]:
+    address = ["--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)]
+    if mode == "fork":
+        return [sys.executable, "-m", "lensforge.server", *address]
+    return [sys.executable, "-m", "uvicorn", "lensforge.app:create_app", "--factory", *address]
+
+
+def _payload() -> dict[str, str]:
+    img = Image.effect_noise((512, 512), 40).convert("RGB").filter(ImageFilter.GaussianBlur(1))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG")
+    return {"image_base64": base64.b64encode(buf.getvalue()).decode()}
+
+
+def _measure(
+    mode: str, workers: int, timeout: float
+) -> tuple[dict[str, int], list[dict[str, int]]]:
+    """Memory of the supervising process and of each worker (its direct children)."""
+    port = _free_port()
+    proc = subprocess.Popen(
+        _command(mode, workers, port), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + timeout
+        ready = 0
+        # Each request lands on some worker; require a run of ready answers.
+        while ready < workers * 4:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{mode} x{workers} not ready after {timeout:.0f} s")
+            try:
+                ok = httpx.get(f"{base_url}/ready", timeout=5).status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            ready = ready + 1 if ok else 0
+            time.sleep(0.05 if ok else 0.5)
+        payload = _payload()
+        for _ in range(workers * 4):
+            httpx.post(f"{base_url}/analyze", json=payload, timeout=60)
+        children = Path(f"/proc/{proc.pid}/task/{proc.pid}/children").read_text().split()
+        if not children:  # uvicorn runs a single worker in-process
+            return {"rss": 0, "pss": 0, "private": 0}, [_rollup(proc.pid)]
+        return _rollup(proc.pid), [_rollup(int(pid)) for pid in children]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--modes", default="fork,uvicorn")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    args = parser.parse_args()
+
+    print(
+        f"{'mode':>8} {'workers':>7} {'total PSS MiB':>14} {'RSS/worker MiB':>15} "
+        f"{'private/worker MiB':>19}"
+    )
+    for mode in args.modes.split(","):
+        for workers in (int(n) for n in args.workers.split(",")):
+            parent, worker_rows = _measure(mode, workers, args.timeout)
+            total_pss = (parent["pss"] + sum(r["pss"] for r in worker_rows)) / 1024
+            rss = sum(r["rss"] for r in worker_rows) / workers / 1024
+            private = sum(r["private"] for r in worker_rows) / workers / 1024
+            print(f"{mode:>8} {workers:>7} {total_pss:>14.0f} {rss:>15.0f} {private:>19.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,11 +17,11 @@ echo ""
 
 # Lint: ruff check + format check (SDK + extensions + tests)
 echo "--- Lint: ruff check ---"
-docker compose run --rm --no-deps --entrypoint ruff test check lensforge/ custom/ tests/
+docker compose run --rm --no-deps --entrypoint ruff test check lensforge/ custom/ tests/ benchmarks/
 echo ""
 
 echo "--- Lint: ruff format --check ---"
-docker compose run --rm --no-deps --entrypoint ruff test format --check lensforge/ custom/ tests/
+docker compose run --rm --no-deps --entrypoint ruff test format --check lensforge/ custom/ tests/ benchmarks/
 echo ""
 
 # Unit tests
@@ -1,7 +1,5 @@
 """BRISQUE + Laplacian blur quality checker."""
 
-import cv2
-import numpy as np
 from PIL import Image
 
 from lensforge.interfaces.quality_checker import QualityResult
@@ -18,6 +16,9 @@ class BrisqueChecker:
         return "brisque-laplacian-1.0"
 
     def check(self, image: Image.Image) -> QualityResult:
+        import cv2
+        import numpy as np
+
         arr = np.array(image)
         gray = cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
 
@@ -4,34 +4,81 @@ from typing import Any
 
 from PIL import Image
 
+from lensforge.inference.onnx import OnnxImagePipeline, check_backend, model_dir
+from lensforge.inference.torch_cpu import (
+    DEFAULT_OPTIMIZATIONS,
+    optimize_pipeline,
+    resolve_optimizations,
+    version_suffix,
+)
 from lensforge.interfaces.nsfw_detector import NsfwResult
 
+MODEL_NAME = "Falconsai/nsfw_image_detection"
+
 
 def _load_pipeline() -> Any:
     """Lazy-load transformers pipeline."""
     from transformers import pipeline
 
-    return pipeline("image-classification", model="Falconsai/nsfw_image_detection")
+    return pipeline("image-classification", model=MODEL_NAME)
 
 
 class FalconsaiNsfwDetector:
-    """NSFW detector using Falconsai/nsfw_image_detection (Apache 2.0)."""
+    """NSFW detector using Falconsai/nsfw_image_detection (Apache 2.0).
+
+    ``backend="onnx"`` runs the model exported by ``lensforge.inference.onnx``
+    from ``onnx_dir`` (the int8 copy when ``quantized``) instead of PyTorch.
+    On the torch backend, ``optimizations`` names the speedups from
+    ``lensforge.inference.torch_cpu`` to apply (default: inference mode only).
+    """
 
-    def __init__(self, threshold: float = 0.7, _pipeline: Any = None) -> None:
+    def __init__(
+        self,
+        threshold: float = 0.7,
+        backend: str = "torch",
+        onnx_dir: str = "models/onnx",
+        quantized: bool = True,
+        optimizations: list[str] | None = None,
+        _pipeline: Any = None,
+    ) -> None:
+        check_backend(backend)
+        self._optimizations = resolve_optimizations(
+            DEFAULT_OPTIMIZATIONS if optimizations is None else optimizations
+        )
         self._threshold = threshold
+        self._backend = backend
+        self._onnx_dir = onnx_dir
+        self._quantized = quantized
         self._pipe = _pipeline
 
     def _get_pipe(self) -> Any:
         if self._pipe is None:
-            self._pipe = _load_pipeline()
+            if self._backend == "onnx":
+                self._pipe = OnnxImagePipeline.from_dir(
+                    model_dir(self._onnx_dir, MODEL_NAME), quantized=self._quantized
+                )
+            else:
+                self._pipe = optimize_pipeline(_load_pipeline(), self._optimizations)
         return self._pipe
 
     @property
     def version(self) -> str:
-        return "falconsai-nsfw-vit-1.0"
+        if self._backend == "onnx":
+            return f"falconsai-nsfw-vit-1.0-onnx{'-int8' if self._quantized else ''}"
+        return "falconsai-nsfw-vit-1.0" + version_suffix(self._optimizations)
+
+    def load(self) -> None:
+        """Load the model weights now instead of on the first call."""
+        self._get_pipe()
 
     def detect(self, image: Image.Image) -> NsfwResult:
-        results = self._get_pipe()(image)
+        return self._to_result(self._get_pipe()(image))
+
+    def detect_batch(self, images: list[Image.Image]) -> list[NsfwResult]:
+        outputs = self._get_pipe()(images, batch_size=len(images))
+        return [self._to_result(results) for results in outputs]
+
+    def _to_result(self, results: list[dict[str, Any]]) -> NsfwResult:
         scores = {r["label"]: r["score"] for r in results}
         nsfw_score = scores.get("nsfw", 0.0)
         is_safe = nsfw_score < self._threshold
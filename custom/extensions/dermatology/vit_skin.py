@@ -4,6 +4,13 @@ from typing import Any
 
 from PIL import Image
 
+from lensforge.inference.onnx import OnnxImagePipeline, check_backend, model_dir
+from lensforge.inference.torch_cpu import (
+    DEFAULT_OPTIMIZATIONS,
+    optimize_pipeline,
+    resolve_optimizations,
+    version_suffix,
+)
 from lensforge.interfaces.domain_classifier import ClassificationResult, Prediction
 
 RISK_MAP: dict[str, str] = {
@@ -31,30 +38,70 @@ def _load_pipeline(model_name: str, device: str) -> Any:
 
 
 class VitSkinClassifier:
-    """Skin lesion classifier using ViT fine-tuned on HAM10000."""
+    """Skin lesion classifier using ViT fine-tuned on HAM10000.
+
+    ``backend="onnx"`` runs the model exported by ``lensforge.inference.onnx``
+    from ``onnx_dir`` (the int8 copy when ``quantized``) instead of PyTorch.
+    On the torch backend, ``optimizations`` names the speedups from
+    ``lensforge.inference.torch_cpu`` to apply (default: inference mode only).
+    """
 
     def __init__(
         self,
         model_name: str = "Anwarkh1/Skin_Cancer-Image_Classification",
         device: str = "cpu",
+        backend: str = "torch",
+        onnx_dir: str = "models/onnx",
+        quantized: bool = True,
+        optimizations: list[str] | None = None,
         _pipeline: Any = None,
     ) -> None:
+        check_backend(backend)
+        self._optimizations = resolve_optimizations(
+            DEFAULT_OPTIMIZATIONS if optimizations is None else optimizations, device
+        )
         self._model_name = model_name
         self._device = device
+        self._backend = backend
+        self._onnx_dir = onnx_dir
+        self._quantized = quantized
         self._pipe = _pipeline
 
     def _get_pipe(self) -> Any:
         if self._pipe is None:
-            self._pipe = _load_pipeline(self._model_name, self._device)
+            if self._backend == "onnx":
+                self._pipe = OnnxImagePipeline.from_dir(
+                    model_dir(self._onnx_dir, self._model_name),
+                    quantized=self._quantized,
+                    device=self._device,
+                )
+            else:
+                self._pipe = optimize_pipeline(
+                    _load_pipeline(self._model_name, self._device),
+                    self._optimizations,
+                    self._device,
+                )
         return self._pipe
 
     @property
     def version(self) -> str:
-        return f"vit-skin-{self._model_name.split('/')[-1]}"
+        version = f"vit-skin-{self._model_name.split('/')[-1]}"
+        if self._backend == "onnx":
+            return version + f"-onnx{'-int8' if self._quantized else ''}"
+        return version + version_suffix(self._optimizations)
+
+    def load(self) -> None:
+        """Load the model weights now instead of on the first call."""
+        self._get_pipe()
 
     def classify(self, image: Image.Image) -> ClassificationResult:
-        results = self._get_pipe()(image)
+        return self._to_result(self._get_pipe()(image))
+
+    def classify_batch(self, images: list[Image.Image]) -> list[ClassificationResult]:
+        outputs = self._get_pipe()(images, batch_size=len(images))
+        return [self._to_result(results) for results in outputs]
 
+    def _to_result(self, results: list[dict[str, Any]]) -> ClassificationResult:
         predictions = [
             Prediction(
                 label=r["label"],
@@ -1,32 +1,107 @@
 """FastAPI application factory."""
 
+import asyncio
+import logging
 from contextlib import asynccontextmanager
-from typing import AsyncIterator
+from typing import TYPE_CHECKING, AsyncIterator
 
-from fastapi import FastAPI
+import anyio
+from fastapi import FastAPI, Response
 
-from lensforge.container import Container
+from lensforge import tracing
+from lensforge.threads import apply_thread_budget, parse_cpu_list, pin_to_cpus, set_request_threads
+from lensforge.warmup import warm_up
+
+if TYPE_CHECKING:
+    from lensforge.container import Container
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
-    """Initialize DI container on startup."""
-    container = Container()
-    container.config.from_pydantic(container.settings())
+    """Initialize DI container on startup, warm up models in the background.
+
+    The server accepts requests while warming up; ``/ready`` reports 503
+    until warmup has finished so load balancers keep traffic away. A
+    container passed to ``create_app`` (e.g. with models already loaded by
+    ``lensforge.server``) is used as is.
+    """
+    container = getattr(app.state, "container", None)
+    if container is None:
+        from lensforge.container import Container
+
+        container = Container()
+        container.config.from_pydantic(container.settings())
+    settings = container.settings()
+    if settings.cpu_affinity:
+        pin_to_cpus(parse_cpu_list(settings.cpu_affinity))
+    budget = container.thread_budget()
+    apply_thread_budget(budget)
+    set_request_threads(budget.request_threads)
+    tracer_provider = container.tracer_provider()
+    if tracer_provider is not None:
+        tracing.install(tracer_provider)
     app.state.container = container
+    app.state.ready = False
+
+    if settings.warmup_enabled:
+        batch_sizes = settings.warmup_batch_sizes or sorted({1, settings.batch_max_size})
+        app.state.warmup_task = asyncio.create_task(
+            _warm_up(app, container, settings.warmup_runs, batch_sizes)
+        )
+    else:
+        app.state.ready = True
     yield
+    for loader in container.built_image_loaders():
+        await loader.aclose()
+    executor = container.stage_executor()
+    if executor is not None:
+        executor.shutdown(cancel_futures=True)
+    pool = container.inference_pool()
+    if pool is not None:
+        pool.close()
+    if tracer_provider is not None:
+        tracing.uninstall()
+        tracer_provider.shutdown()
+
 
+async def _warm_up(app: FastAPI, container: "Container", runs: int, batch_sizes: list[int]) -> None:
+    try:
+        await anyio.to_thread.run_sync(warm_up, container, runs, batch_sizes)
+    except Exception:
+        logger.exception("Warmup failed; /ready stays unavailable")
+        return
+    app.state.ready = True
 
-def create_app() -> FastAPI:
+
+def create_app(container: "Container | None" = None) -> FastAPI:
     """Create and configure FastAPI application."""
     app = FastAPI(title="LensForge", version="0.1.0", lifespan=lifespan)
+    if container is not None:
+        app.state.container = container
 
     @app.get("/health")
     async def health() -> dict[str, str]:
         return {"status": "ok"}
 
+    @app.get("/ready")
+    async def ready(response: Response) -> dict[str, str]:
+        if not getattr(app.state, "ready", False):
+            response.status_code = 503
+            return {"status": "warming_up"}
+        return {"status": "ready"}
+
+    from lensforge.metrics import InFlightMiddleware
     from lensforge.routes.analyze import router as analyze_router
+    from lensforge.routes.metrics import router as metrics_router
+    from lensforge.routes.pipeline import router as pipeline_router
 
     app.include_router(analyze_router)
+    app.include_router(pipeline_router)
+    app.include_router(metrics_router)
+    analysis_paths = {route.path for route in analyze_router.routes}  # type: ignore[attr-defined]
+    app.add_middleware(InFlightMiddleware, paths=analysis_paths)
+    app.add_middleware(tracing.TracingMiddleware, paths=analysis_paths)
 
     return app
@@ -0,0 +1,17 @@
+"""Content-addressed analysis result caches."""
+
+from lensforge.cache.base import CacheStats, IResultCache
+from lensforge.cache.disk import DiskResultCache
+from lensforge.cache.keys import image_digest, result_key
+from lensforge.cache.memory import MemoryResultCache
+from lensforge.cache.sqlite import SqliteResultCache
+
+__all__ = [
+    "IResultCache",
+    "CacheStats",
+    "MemoryResultCache",
+    "DiskResultCache",
+    "SqliteResultCache",
+    "image_digest",
+    "result_key",
+]
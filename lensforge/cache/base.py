@@ -0,0 +1,34 @@
+"""Result cache protocol."""
+
+from dataclasses import dataclass
+from typing import Protocol
+
+from lensforge.schemas.response import AnalyzeResponse
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters of a result cache."""
+
+    hits: int = 0
+    misses: int = 0
+    entries: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class IResultCache(Protocol):
+    """Protocol for analysis result cache backends.
+
+    ``get`` must only return an entry whose embedded ``model_versions`` equal
+    the caller's, so results from stale models are never served.
+    """
+
+    def get(self, key: str, model_versions: dict[str, str]) -> AnalyzeResponse | None: ...
+
+    def set(self, key: str, response: AnalyzeResponse) -> None: ...
+
+    def stats(self) -> CacheStats: ...
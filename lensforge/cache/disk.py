@@ -0,0 +1,91 @@
+"""On-disk LRU + TTL result cache (one JSON file per entry)."""
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from lensforge.cache.base import CacheStats
+from lensforge.schemas.response import AnalyzeResponse
+
+
+class DiskResultCache:
+    """Directory-backed cache that survives restarts.
+
+    Entries are written atomically (temp file + rename); file mtime tracks
+    recency, so eviction drops the least recently read entries first.
+    """
+
+    def __init__(
+        self, directory: str, max_entries: int = 10_000, ttl_seconds: float = 86_400.0
+    ) -> None:
+        self._dir = Path(directory)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._entries = sum(1 for _ in self._dir.glob("*.json"))
+
+    def get(self, key: str, model_versions: dict[str, str]) -> AnalyzeResponse | None:
+        path = self._path(key)
+        try:
+            payload = json.loads(path.read_bytes())
+            if payload["expires"] <= time.time():
+                path.unlink(missing_ok=True)
+                raise FileNotFoundError(path)
+            response = AnalyzeResponse.model_validate(payload["response"])
+            if response.model_versions != model_versions:
+                raise ValueError("stale model versions")
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self._misses += 1
+            return None
+        with contextlib.suppress(OSError):  # evicted or replaced since the read
+            os.utime(path)
+        with self._lock:
+            self._hits += 1
+        return response
+
+    def set(self, key: str, response: AnalyzeResponse) -> None:
+        payload = {"expires": time.time() + self._ttl, "response": response.model_dump()}
+        fd, tmp = tempfile.mkstemp(dir=self._dir, suffix=".tmp")
+        path = self._path(key)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(payload, f)
+            is_new = not path.exists()
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            self._entries += is_new
+            if self._entries > self._max_entries:
+                self._evict()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(hits=self._hits, misses=self._misses, entries=self._entries)
+
+    def _path(self, key: str) -> Path:
+        return self._dir / f"{key}.json"
+
+    def _evict(self) -> None:
+        """Drop least recently used entries down to 90% of capacity."""
+        files = sorted(self._dir.glob("*.json"), key=_mtime)
+        excess = len(files) - int(self._max_entries * 0.9)
+        for path in files[: max(0, excess)]:
+            path.unlink(missing_ok=True)
+        self._entries = len(files) - max(0, excess)
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
@@ -0,0 +1,27 @@
+"""Cache keys derived from decoded pixels and model versions."""
+
+import hashlib
+import json
+from typing import Any
+
+from PIL import Image
+
+
+def image_digest(image: Image.Image) -> str:
+    """Hash the decoded, resized pixels (mode and size included)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode())
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def result_key(
+    digest: str, model_versions: dict[str, str], settings: dict[str, Any] | None = None
+) -> str:
+    """Combine an image digest with model versions and decision ``settings``
+    (e.g. thresholds) so upgrades and config changes miss the cache."""
+    versions = json.dumps(model_versions, sort_keys=True, separators=(",", ":"))
+    key = f"{digest}|{versions}"
+    if settings:
+        key += "|" + json.dumps(settings, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
@@ -0,0 +1,45 @@
+"""In-process LRU + TTL result cache."""
+
+import threading
+import time
+from collections import OrderedDict
+
+from lensforge.cache.base import CacheStats
+from lensforge.schemas.response import AnalyzeResponse
+
+
+class MemoryResultCache:
+    """Bounded LRU cache with per-entry TTL, local to one worker process."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, AnalyzeResponse]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: str, model_versions: dict[str, str]) -> AnalyzeResponse | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now or entry[1].model_versions != model_versions:
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1].model_copy(deep=True)
+
+    def set(self, key: str, response: AnalyzeResponse) -> None:
+        expires = time.monotonic() + self._ttl
+        with self._lock:
+            self._entries[key] = (expires, response.model_copy(deep=True))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(hits=self._hits, misses=self._misses, entries=len(self._entries))
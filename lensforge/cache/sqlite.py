@@ -0,0 +1,142 @@
+"""SQLite (WAL) result cache shared by all worker processes on a host."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from lensforge.cache.base import CacheStats
+from lensforge.schemas.response import AnalyzeResponse
+
+# Eviction scans the table, so it runs every few writes rather than on each one.
+EVICT_EVERY_WRITES = 32
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    model_versions TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+"""
+
+
+class SqliteResultCache:
+    """Size-bounded LRU + TTL cache in one SQLite database file.
+
+    WAL mode lets many uvicorn workers read concurrently while one writes;
+    each thread keeps its own connection. The ``model_versions`` of every entry
+    are stored in their own column, so stale entries can be purged in bulk.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: float = 86_400.0,
+        busy_timeout_ms: int = 5000,
+    ) -> None:
+        self._path = path
+        self._max_bytes = max_bytes
+        self._ttl = ttl_seconds
+        self._busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._connect().executescript(_SCHEMA)
+
+    def get(self, key: str, model_versions: dict[str, str]) -> AnalyzeResponse | None:
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT model_versions, response FROM results WHERE key = ? AND expires > ?",
+            (key, now),
+        ).fetchone()
+        if row is not None and json.loads(row[0]) == model_versions:
+            conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+            self._count(hit=True)
+            return AnalyzeResponse.model_validate_json(row[1])
+        self._count(hit=False)
+        return None
+
+    def set(self, key: str, response: AnalyzeResponse) -> None:
+        payload = response.model_dump_json()
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                json.dumps(response.model_versions, sort_keys=True),
+                payload,
+                len(payload),
+                now + self._ttl,
+                now,
+            ),
+        )
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % EVICT_EVERY_WRITES == 0
+        if evict:
+            self._evict(conn, now)
+
+    def stats(self) -> CacheStats:
+        (entries,) = self._connect().execute("SELECT COUNT(*) FROM results").fetchone()
+        with self._lock:
+            return CacheStats(hits=self._hits, misses=self._misses, entries=entries)
+
+    def purge_stale(self, model_versions: dict[str, str]) -> int:
+        """Delete entries produced by other model versions; returns the count removed."""
+        cursor = self._connect().execute(
+            "DELETE FROM results WHERE model_versions != ?",
+            (json.dumps(model_versions, sort_keys=True),),
+        )
+        return cursor.rowcount
+
+    def _connect(self) -> sqlite3.Connection:
+        """Per-thread connection, reopened in forked children."""
+        conn: sqlite3.Connection | None = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(
+                self._path, timeout=self._busy_timeout_ms / 1000, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={self._busy_timeout_ms}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Drop expired entries, then least recently used ones past ``max_bytes``."""
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM results WHERE expires <= ?", (now,))
+            (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()
+            if total <= self._max_bytes:
+                return
+            excess = total - int(self._max_bytes * 0.9)
+            conn.execute(
+                """
+                DELETE FROM results WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY accessed, key) - size AS before
+                        FROM results
+                    ) WHERE before < ?
+                )
+                """,
+                (excess,),
+            )
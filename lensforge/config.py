@@ -1,7 +1,12 @@
 """LensForge configuration from custom/.env."""
 
+from typing import Any
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from lensforge.pipeline.stages import DEFAULT_STAGES, StageSpec
+
 
 class Settings(BaseSettings):
     device: str = "cpu"
@@ -12,13 +17,122 @@ class Settings(BaseSettings):
 
     nsfw_class: str = "custom.extensions.dermatology.falconsai_nsfw.FalconsaiNsfwDetector"
     nsfw_threshold: float = 0.7
+    # Torch-backend speedups, any of inference_mode, int8, bf16, compile
+    # (None = extension default, inference_mode only)
+    nsfw_torch_optimizations: list[str] | None = None
+    # Two-tier cascade: the fast detector decides outside [low, high], the NSFW_CLASS
+    # detector inside (default fast tier: the int8 ONNX export of the same model)
+    nsfw_cascade: bool = False
+    nsfw_cascade_fast_class: str = (
+        "custom.extensions.dermatology.falconsai_nsfw.FalconsaiNsfwDetector"
+    )
+    # (kwargs over NSFW_THRESHOLD and, for ONNX, ONNX_MODEL_DIR / ONNX_QUANTIZED)
+    nsfw_cascade_fast_options: dict[str, Any] = {"backend": "onnx"}
+    nsfw_cascade_low: float = 0.2
+    nsfw_cascade_high: float = 0.95
 
     classifier_class: str = "custom.extensions.dermatology.vit_skin.VitSkinClassifier"
     classifier_model_name: str = "Anwarkh1/Skin_Cancer-Image_Classification"
+    classifier_torch_optimizations: list[str] | None = None
+
+    # Inference backend of the model extensions: "torch" or "onnx" (see lensforge.inference.onnx)
+    inference_backend: str = "torch"
+    onnx_model_dir: str = "models/onnx"
+    onnx_quantized: bool = True  # serve the int8 model.int8.onnx
+
+    # Run these model stages in a pool of worker processes (0 = in-process);
+    # each worker loads its own copy of the listed models
+    inference_workers: int = 0
+    inference_worker_models: list[str] = ["nsfw", "classifier"]
+
+    # CPU thread budget, applied at startup (0 = derive from the cores available,
+    # split across inference workers); cpu_affinity pins the server, e.g. "0-7"
+    cpu_threads: int = 0
+    torch_intra_op_threads: int = 0
+    torch_inter_op_threads: int = 1
+    opencv_threads: int = 1
+    request_threads: int = 40
+    cpu_affinity: str = ""
+    pin_inference_workers: bool = False
+
+    # Analysis stage graph (JSON list; see lensforge.pipeline.stages.StageSpec)
+    pipeline_stages: list[StageSpec] = DEFAULT_STAGES
+    # Reorder the gates by observed latency / rejection rate (responses unchanged);
+    # inspect with GET /pipeline/stages
+    adaptive_stage_order: bool = False
+    adaptive_min_images: int = 100
+
+    # Micro-batching of concurrent NSFW / classifier calls (batch_max_size <= 1 disables)
+    batch_max_size: int = 8
+    batch_max_wait_ms: float = 5.0
+
+    # Analysis result cache: "none", "memory", "disk", "sqlite" or a dotted class path
+    result_cache_backend: str = "memory"
+    result_cache_max_entries: int = 1024
+    result_cache_ttl_seconds: float = 3600.0
+    result_cache_dir: str = ".cache/lensforge/results"
+    # "sqlite" backend: one WAL database shared by all workers on the host
+    result_cache_path: str = ".cache/lensforge/results.sqlite3"
+    result_cache_max_bytes: int = 256 * 1024 * 1024
+
+    # Start the classifier alongside the NSFW check instead of after it: lower
+    # latency, but rejected images cost a wasted classification
+    parallel_stages: bool = False
+    parallel_stage_threads: int = 8
+
+    # Share one analysis between concurrent requests for identical images
+    coalesce_inflight: bool = True
+
+    # Per-stage milliseconds in responses (also per request: X-Stage-Timings header)
+    stage_timings: bool = False
+
+    # Tracing: "none", "otlp", "jsonl" or a dotted SpanExporter class path
+    # (otlp needs the tracing extra; an empty endpoint uses the OTEL_* env vars)
+    tracing_exporter: str = "none"
+    tracing_otlp_endpoint: str = ""
+    tracing_jsonl_path: str = "traces/spans-{pid}.jsonl"
+    tracing_sample_ratio: float = 1.0
+    tracing_service_name: str = "lensforge"
+
+    # Sampled profiling: cProfile one in every N analyses and/or keep the
+    # sampled stacks of analyses slower than PROFILE_SLOW_MS (empty dir = off)
+    profile_dir: str = ""
+    profile_sample_every: int = 0
+    profile_slow_ms: float = 0.0
+    profile_interval_ms: float = 5.0
+    profile_max_files: int = 100
+
+    # Startup: build singletons and run warmup passes before /ready reports ready
+    warmup_enabled: bool = True
+    warmup_runs: int = 1
+    warmup_batch_sizes: list[int] = []  # empty = [1, batch_max_size]
 
     max_image_size: int = 1024
+
+    # Image URL downloads (streamed; aborted past the byte or pixel cap)
+    max_download_bytes: int = 20 * 1024 * 1024
+    max_image_pixels: int = 50_000_000
+    http_timeout: float = 10.0
+    http_max_connections: int = 32
+    http_max_connections_per_host: int = 8
+
+    # lensforge.server: worker processes forked after the models are loaded
+    server_workers: int = 1
+
     host: str = "0.0.0.0"
     port: int = 8000
     hf_token: str | None = None
 
     model_config = SettingsConfigDict(env_file="custom/.env", extra="ignore")
+
+    @model_validator(mode="after")
+    def check_cascade_band(self) -> "Settings":
+        # Outside the band the fast tier alone would decide images the
+        # threshold puts on the other side.
+        low, high = self.nsfw_cascade_low, self.nsfw_cascade_high
+        if self.nsfw_cascade and not low <= self.nsfw_threshold <= high:
+            raise ValueError(
+                f"NSFW_THRESHOLD ({self.nsfw_threshold}) must lie inside the cascade band "
+                f"[NSFW_CASCADE_LOW, NSFW_CASCADE_HIGH] = [{low}, {high}]"
+            )
+        return self
@@ -1,12 +1,26 @@
-"""Dependency injection container with dynamic extension loading."""
+"""Dependency injection container with dynamic extension loading.
+
+Heavy or optional modules (HTTP clients, cache backends, the process pool,
+and the extensions with their model libraries) are imported inside the
+factories, so importing the container stays cheap.
+"""
 
 import importlib
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
 from dependency_injector import containers, providers
 
 from lensforge.config import Settings
-from lensforge.loaders.image_loader import ImageLoader
 from lensforge.pipeline.analysis_pipeline import AnalysisPipeline
+from lensforge.pipeline.batching import BatchingDomainClassifier, BatchingNsfwDetector
+from lensforge.pipeline.singleflight import SingleFlight
+from lensforge.pipeline.stages import StageGraph, StageSpec
+from lensforge.threads import ThreadBudget, init_inference_worker
+
+if TYPE_CHECKING:
+    from lensforge.pipeline.process_pool import InferencePool
 
 
 def import_class(dotted_path: str) -> type:
@@ -16,19 +30,236 @@ def import_class(dotted_path: str) -> type:
     return getattr(module, class_name)
 
 
-def _create_quality(quality_class: str, blur_threshold: float):
+def _create_image_loader(built: list, **kwargs: Any):
+    from lensforge.loaders.image_loader import ImageLoader
+
+    loader = ImageLoader(**kwargs)
+    built.append(loader)
+    return loader
+
+
+def _create_quality(quality_class: str, blur_threshold: float, pool: "InferencePool | None" = None):
     cls = import_class(quality_class)
-    return cls(blur_threshold=blur_threshold)
+    checker = cls(blur_threshold=blur_threshold)
+    if pool is not None and "quality" in pool.models:
+        from lensforge.pipeline.process_pool import PooledQualityChecker
+
+        return PooledQualityChecker(pool, checker)
+    return checker
+
+
+def _backend_kwargs(
+    backend: str, onnx_dir: str, onnx_quantized: bool, optimizations: list[str] | None
+) -> dict[str, object]:
+    """Extra constructor kwargs for model extensions.
 
+    Only settings that were changed from their defaults are passed, so
+    extensions without backend support keep working.
+    """
+    if backend != "torch":
+        return {"backend": backend, "onnx_dir": onnx_dir, "quantized": onnx_quantized}
+    if optimizations is not None:
+        return {"optimizations": optimizations}
+    return {}
 
-def _create_nsfw(nsfw_class: str, threshold: float):
+
+def _fast_tier_kwargs(
+    options: dict[str, Any], threshold: float, onnx_dir: str, onnx_quantized: bool
+) -> dict[str, Any]:
+    """Constructor kwargs of the cascade's first tier: ``NSFW_CASCADE_FAST_OPTIONS``
+    over the detector settings (and, for a non-torch backend, ``ONNX_MODEL_DIR``
+    and ``ONNX_QUANTIZED``)."""
+    defaults: dict[str, Any] = {"threshold": threshold}
+    if options.get("backend", "torch") != "torch":
+        defaults.update(onnx_dir=onnx_dir, quantized=onnx_quantized)
+    return {**defaults, **options}
+
+
+def _create_nsfw(
+    nsfw_class: str,
+    threshold: float,
+    max_batch_size: int,
+    max_wait_ms: float,
+    backend: str = "torch",
+    onnx_dir: str = "models/onnx",
+    onnx_quantized: bool = True,
+    optimizations: list[str] | None = None,
+    pool: "InferencePool | None" = None,
+    cascade: bool = False,
+    cascade_fast_class: str = "",
+    cascade_fast_options: dict[str, Any] | None = None,
+    cascade_low: float = 0.2,
+    cascade_high: float = 0.95,
+):
     cls = import_class(nsfw_class)
-    return cls(threshold=threshold)
+    detector = cls(
+        threshold=threshold,
+        **_backend_kwargs(backend, onnx_dir, onnx_quantized, optimizations),
+    )
+    if cascade:
+        from lensforge.pipeline.cascade import CascadeNsfwDetector
 
+        fast = import_class(cascade_fast_class)(
+            **_fast_tier_kwargs(cascade_fast_options or {}, threshold, onnx_dir, onnx_quantized)
+        )
+        detector = CascadeNsfwDetector(fast, detector, cascade_low, cascade_high)
+    if pool is not None and "nsfw" in pool.models:
+        from lensforge.pipeline.process_pool import PooledNsfwDetector
 
-def _create_classifier(classifier_class: str, model_name: str, device: str):
+        # Concurrent calls go to different workers; batching them here would serialize them.
+        return PooledNsfwDetector(pool, detector)
+    if max_batch_size > 1:
+        return BatchingNsfwDetector(detector, max_batch_size, max_wait_ms)
+    return detector
+
+
+def _create_classifier(
+    classifier_class: str,
+    model_name: str,
+    device: str,
+    max_batch_size: int,
+    max_wait_ms: float,
+    backend: str = "torch",
+    onnx_dir: str = "models/onnx",
+    onnx_quantized: bool = True,
+    optimizations: list[str] | None = None,
+    pool: "InferencePool | None" = None,
+):
     cls = import_class(classifier_class)
-    return cls(model_name=model_name, device=device)
+    classifier = cls(
+        model_name=model_name,
+        device=device,
+        **_backend_kwargs(backend, onnx_dir, onnx_quantized, optimizations),
+    )
+    if pool is not None and "classifier" in pool.models:
+        from lensforge.pipeline.process_pool import PooledDomainClassifier
+
+        return PooledDomainClassifier(pool, classifier)
+    if max_batch_size > 1:
+        return BatchingDomainClassifier(classifier, max_batch_size, max_wait_ms)
+    return classifier
+
+
+def _create_stage_graph(
+    specs: list[dict[str, Any]],
+    quality,
+    nsfw,
+    classifier,
+    adaptive: bool = False,
+    min_images: int = 100,
+) -> StageGraph:
+    """Build the ``PIPELINE_STAGES`` graph; extension stages are instantiated here."""
+    parsed = [StageSpec.model_validate(spec) for spec in specs]
+    components: dict[str, Any] = {"quality": quality, "nsfw": nsfw, "classifier": classifier}
+    for spec in parsed:
+        if spec.class_path is not None:
+            components[spec.name] = import_class(spec.class_path)(**spec.options)
+    return StageGraph.from_specs(parsed, components, adaptive=adaptive, min_images=min_images)
+
+
+def _create_result_cache(
+    backend: str,
+    max_entries: int,
+    ttl_seconds: float,
+    directory: str,
+    path: str,
+    max_bytes: int,
+):
+    if backend == "none":
+        return None
+    if backend == "memory":
+        from lensforge.cache.memory import MemoryResultCache
+
+        return MemoryResultCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    if backend == "disk":
+        from lensforge.cache.disk import DiskResultCache
+
+        return DiskResultCache(directory, max_entries=max_entries, ttl_seconds=ttl_seconds)
+    if backend == "sqlite":
+        from lensforge.cache.sqlite import SqliteResultCache
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        return SqliteResultCache(path, max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+    cls = import_class(backend)
+    return cls(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+
+def _create_inflight(enabled: bool):
+    return SingleFlight() if enabled else None
+
+
+def _create_profiler(
+    directory: str, sample_every: int, slow_ms: float, interval_ms: float, max_files: int
+):
+    if not directory or (sample_every <= 0 and slow_ms <= 0):
+        return None
+    from lensforge.profiling import RequestProfiler
+
+    return RequestProfiler(directory, sample_every, slow_ms, interval_ms, max_files)
+
+
+def _create_tracer_provider(
+    exporter: str, service_name: str, sample_ratio: float, otlp_endpoint: str, jsonl_path: str
+):
+    if exporter == "none":
+        return None
+    from lensforge.tracing import create_provider
+
+    return create_provider(exporter, service_name, sample_ratio, otlp_endpoint, jsonl_path)
+
+
+def _create_thread_budget(
+    server_workers: int,
+    inference_workers: int,
+    parallel_stages: bool,
+    parallel_stage_threads: int,
+    **kwargs: Any,
+):
+    """Budget per process: the cores are shared by every server worker and, per
+    server worker, by its inference workers. With parallel stages, the stage
+    pool's threads run models alongside the request thread."""
+    return ThreadBudget.derive(
+        processes=max(1, server_workers) * max(1, inference_workers),
+        model_threads=1 + max(0, parallel_stage_threads) if parallel_stages else 1,
+        **kwargs,
+    )
+
+
+def _create_stage_executor(enabled: bool, threads: int):
+    if not enabled:
+        return None
+    from concurrent.futures import ThreadPoolExecutor
+
+    return ThreadPoolExecutor(max(1, threads), thread_name_prefix="lensforge-stage")
+
+
+def _create_inference_pool(
+    workers: int,
+    models: list[str],
+    config: dict[str, Any],
+    budget: ThreadBudget | None = None,
+    pin_workers: bool = False,
+):
+    if workers <= 0:
+        return None
+    from lensforge.pipeline.process_pool import InferencePool
+
+    initializer = partial(init_inference_worker, budget, pin_workers) if budget else None
+    return InferencePool(
+        partial(build_worker_models, config, models), models, workers, initializer=initializer
+    )
+
+
+def build_worker_models(config: dict[str, Any], models: list[str]) -> dict[str, object]:
+    """Runs in each inference worker: build the in-process components named in ``models``."""
+    container = Container()
+    container.config.from_dict({**config, "inference_workers": 0, "batch_max_size": 1})
+    stages = {
+        "quality": container.quality_checker,
+        "nsfw": container.nsfw_detector,
+        "classifier": container.domain_classifier,
+    }
+    return {name: stages[name]() for name in models}
 
 
 class Container(containers.DeclarativeContainer):
@@ -38,21 +269,65 @@ class Container(containers.DeclarativeContainer):
 
     settings = providers.Singleton(Settings)
 
+    # Loaders actually created, so shutdown closes them without building one.
+    built_image_loaders = providers.Singleton(list)
+
     image_loader = providers.Singleton(
-        ImageLoader,
+        _create_image_loader,
+        built=built_image_loaders,
         max_size=config.max_image_size.as_int(),
+        max_download_bytes=config.max_download_bytes.as_int(),
+        max_pixels=config.max_image_pixels.as_int(),
+        timeout=config.http_timeout.as_float(),
+        max_connections=config.http_max_connections.as_int(),
+        max_connections_per_host=config.http_max_connections_per_host.as_int(),
+    )
+
+    thread_budget = providers.Singleton(
+        _create_thread_budget,
+        server_workers=config.server_workers.as_int(),
+        inference_workers=config.inference_workers.as_int(),
+        parallel_stages=config.parallel_stages.as_(bool),
+        parallel_stage_threads=config.parallel_stage_threads.as_int(),
+        cpu_threads=config.cpu_threads.as_int(),
+        torch_intra_op_threads=config.torch_intra_op_threads.as_int(),
+        torch_inter_op_threads=config.torch_inter_op_threads.as_int(),
+        opencv_threads=config.opencv_threads.as_int(),
+        request_threads=config.request_threads.as_int(),
+    )
+
+    inference_pool = providers.Singleton(
+        _create_inference_pool,
+        workers=config.inference_workers.as_int(),
+        models=config.inference_worker_models,
+        config=config,
+        budget=thread_budget,
+        pin_workers=config.pin_inference_workers.as_(bool),
     )
 
     quality_checker = providers.Singleton(
         _create_quality,
         quality_class=config.quality_class,
         blur_threshold=config.quality_blur_threshold.as_float(),
+        pool=inference_pool,
     )
 
     nsfw_detector = providers.Singleton(
         _create_nsfw,
         nsfw_class=config.nsfw_class,
         threshold=config.nsfw_threshold.as_float(),
+        max_batch_size=config.batch_max_size.as_int(),
+        max_wait_ms=config.batch_max_wait_ms.as_float(),
+        backend=config.inference_backend,
+        onnx_dir=config.onnx_model_dir,
+        onnx_quantized=config.onnx_quantized.as_(bool),
+        optimizations=config.nsfw_torch_optimizations,
+        pool=inference_pool,
+        cascade=config.nsfw_cascade.as_(bool),
+        cascade_fast_class=config.nsfw_cascade_fast_class,
+        cascade_fast_options=config.nsfw_cascade_fast_options,
+        cascade_low=config.nsfw_cascade_low.as_float(),
+        cascade_high=config.nsfw_cascade_high.as_float(),
     )
 
     domain_classifier = providers.Singleton(
@@ -60,11 +335,74 @@ class Container(containers.DeclarativeContainer):
         classifier_class=config.classifier_class,
         model_name=config.classifier_model_name,
         device=config.device,
+        max_batch_size=config.batch_max_size.as_int(),
+        max_wait_ms=config.batch_max_wait_ms.as_float(),
+        backend=config.inference_backend,
+        onnx_dir=config.onnx_model_dir,
+        onnx_quantized=config.onnx_quantized.as_(bool),
+        optimizations=config.classifier_torch_optimizations,
+        pool=inference_pool,
     )
 
-    analysis_pipeline = providers.Factory(
-        AnalysisPipeline,
+    result_cache = providers.Singleton(
+        _create_result_cache,
+        backend=config.result_cache_backend,
+        max_entries=config.result_cache_max_entries.as_int(),
+        ttl_seconds=config.result_cache_ttl_seconds.as_float(),
+        directory=config.result_cache_dir,
+        path=config.result_cache_path,
+        max_bytes=config.result_cache_max_bytes.as_int(),
+    )
+
+    inflight = providers.Singleton(
+        _create_inflight,
+        enabled=config.coalesce_inflight.as_(bool),
+    )
+
+    stage_executor = providers.Singleton(
+        _create_stage_executor,
+        enabled=config.parallel_stages.as_(bool),
+        threads=config.parallel_stage_threads.as_int(),
+    )
+
+    stage_graph = providers.Singleton(
+        _create_stage_graph,
+        specs=config.pipeline_stages,
         quality=quality_checker,
-        safety=nsfw_detector,
+        nsfw=nsfw_detector,
         classifier=domain_classifier,
+        adaptive=config.adaptive_stage_order.as_(bool),
+        min_images=config.adaptive_min_images.as_int(),
+    )
+
+    tracer_provider = providers.Singleton(
+        _create_tracer_provider,
+        exporter=config.tracing_exporter,
+        service_name=config.tracing_service_name,
+        sample_ratio=config.tracing_sample_ratio.as_float(),
+        otlp_endpoint=config.tracing_otlp_endpoint,
+        jsonl_path=config.tracing_jsonl_path,
+    )
+
+    request_profiler = providers.Singleton(
+        _create_profiler,
+        directory=config.profile_dir,
+        sample_every=config.profile_sample_every.as_int(),
+        slow_ms=config.profile_slow_ms.as_float(),
+        interval_ms=config.profile_interval_ms.as_float(),
+        max_files=config.profile_max_files.as_int(),
+    )
+
+    analysis_pipeline = providers.Factory(
+        AnalysisPipeline,
+        stages=stage_graph,
+        cache=result_cache,
+        inflight=inflight,
+        stage_executor=stage_executor,
+        stage_timings=config.stage_timings.as_(bool),
+        profiler=request_profiler,
+        cache_settings=providers.Dict(
+            nsfw_threshold=config.nsfw_threshold.as_float(),
+            quality_blur_threshold=config.quality_blur_threshold.as_float(),
+        ),
     )
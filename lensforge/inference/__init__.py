@@ -0,0 +1 @@
+"""Alternative inference backends for HuggingFace image-classification models."""
@@ -0,0 +1,167 @@
+"""ONNX Runtime backend for HuggingFace image-classification models.
+
+Export once, then serve without PyTorch in the inference path:
+
+    python -m lensforge.inference.onnx Anwarkh1/Skin_Cancer-Image_Classification \
+        Falconsai/nsfw_image_detection --output models/onnx
+
+Each model lands in ``<output>/<org>__<name>/`` with ``model.onnx``,
+``model.int8.onnx`` (dynamic int8 weight quantization, served by default;
+``--no-quantize`` skips it) and the HF ``config.json``/preprocessor config
+needed for labels and preprocessing.
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any
+
+from PIL import Image
+
+BACKENDS = {"torch", "onnx"}
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+
+# Session thread counts (0 = ONNX Runtime default: all cores); see lensforge.threads.
+_session_threads = {"intra_op": 0, "inter_op": 0}
+
+
+def set_session_threads(intra_op: int, inter_op: int) -> None:
+    """Thread counts for sessions created from now on."""
+    _session_threads.update(intra_op=intra_op, inter_op=inter_op)
+
+
+def model_dir(onnx_dir: str | Path, model_name: str) -> Path:
+    """Directory holding the exported files of ``model_name``."""
+    return Path(onnx_dir) / model_name.replace("/", "__")
+
+
+def check_backend(backend: str) -> None:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend} (expected one of {BACKENDS})")
+
+
+class OnnxImagePipeline:
+    """Drop-in for a transformers ``image-classification`` pipeline.
+
+    Called with one image it returns ``[{"label", "score"}, ...]`` sorted by
+    score; called with a list it returns one such list per image. Scores are
+    softmax probabilities, as in the transformers pipeline.
+    """
+
+    def __init__(self, session: Any, processor: Any, labels: list[str], top_k: int = 5) -> None:
+        self._session = session
+        self._processor = processor
+        self._labels = labels
+        self._top_k = min(top_k, len(labels))
+        self._input_name = session.get_inputs()[0].name
+
+    @classmethod
+    def from_dir(
+        cls, path: str | Path, quantized: bool = True, device: str = "cpu", top_k: int = 5
+    ) -> "OnnxImagePipeline":
+        path = Path(path)
+        model_file = path / (INT8_FILE if quantized else FP32_FILE)
+        if not model_file.exists():
+            hint = " (without --no-quantize), or set ONNX_QUANTIZED=false" if quantized else ""
+            raise FileNotFoundError(
+                f"{model_file} not found; export it with `python -m lensforge.inference.onnx`"
+                + hint
+            )
+
+        import onnxruntime as ort
+        from transformers import AutoImageProcessor
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = _session_threads["intra_op"]
+        options.inter_op_num_threads = _session_threads["inter_op"]
+        providers = ["CPUExecutionProvider"]
+        if device.startswith("cuda"):
+            providers.insert(0, "CUDAExecutionProvider")
+        session = ort.InferenceSession(str(model_file), options, providers=providers)
+
+        id2label = json.loads((path / "config.json").read_text())["id2label"]
+        labels = [id2label[str(i)] for i in range(len(id2label))]
+        return cls(session, AutoImageProcessor.from_pretrained(path), labels, top_k)
+
+    def __call__(
+        self, images: Image.Image | list[Image.Image], batch_size: int | None = None
+    ) -> list[dict[str, Any]] | list[list[dict[str, Any]]]:
+        if isinstance(images, Image.Image):
+            return self._run([images])[0]
+        size = batch_size or len(images) or 1
+        outputs: list[list[dict[str, Any]]] = []
+        for i in range(0, len(images), size):
+            outputs.extend(self._run(images[i : i + size]))
+        return outputs
+
+    def _run(self, images: list[Image.Image]) -> list[list[dict[str, Any]]]:
+        import numpy as np
+
+        pixel_values = self._processor(images=images, return_tensors="np")["pixel_values"]
+        (logits,) = self._session.run(None, {self._input_name: pixel_values.astype(np.float32)})
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        return [
+            [
+                {"label": self._labels[j], "score": float(row[j])}
+                for j in np.argsort(-row)[: self._top_k]
+            ]
+            for row in probs
+        ]
+
+
+def export_model(model_name: str, onnx_dir: str | Path, quantize: bool = True) -> Path:
+    """Export ``model_name`` to ONNX, optionally adding an int8-quantized copy."""
+    import torch
+    from transformers import AutoImageProcessor, AutoModelForImageClassification
+
+    out = model_dir(onnx_dir, model_name)
+    out.mkdir(parents=True, exist_ok=True)
+
+    processor = AutoImageProcessor.from_pretrained(model_name)
+    model = AutoModelForImageClassification.from_pretrained(model_name).eval()
+    processor.save_pretrained(out)
+    model.config.save_pretrained(out)
+
+    size = getattr(processor, "size", None) or {}
+    height = size.get("height") or size.get("shortest_edge") or 224
+    width = size.get("width") or size.get("shortest_edge") or 224
+    model.config.return_dict = False  # export a plain logits output
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (torch.zeros(1, 3, height, width),),
+            str(out / FP32_FILE),
+            input_names=["pixel_values"],
+            output_names=["logits"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=17,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(out / FP32_FILE), str(out / INT8_FILE), weight_type=QuantType.QInt8)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export HF image classifiers to ONNX.")
+    parser.add_argument("models", nargs="+", help="HuggingFace model IDs")
+    parser.add_argument("--output", default="models/onnx")
+    parser.add_argument(
+        "--quantize",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="also write a dynamic int8 model.int8.onnx (served when ONNX_QUANTIZED=true)",
+    )
+    args = parser.parse_args()
+    for name in args.models:
+        print(f"{name} -> {export_model(name, args.output, quantize=args.quantize)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Optional speedups for PyTorch transformers pipelines.
+
+Optimizations are named and switched per model:
+
+- ``inference_mode`` — run under ``torch.inference_mode()`` (no autograd bookkeeping).
+- ``int8`` — ``torch.ao`` dynamic int8 quantization of ``nn.Linear`` layers (CPU only).
+- ``bf16`` — bf16 autocast, where the CPU (AVX512-BF16/AMX) or GPU supports it.
+- ``compile`` — ``torch.compile`` the model; the first calls compile, so warm up.
+
+``int8`` and ``bf16`` change the numerics and are reflected in the model version.
+"""
+
+import logging
+from collections.abc import Callable, Iterable
+from contextlib import ExitStack
+from functools import cache
+from typing import Any
+
+from lensforge.threads import apply_torch_threads
+
+logger = logging.getLogger(__name__)
+
+TORCH_OPTIMIZATIONS = {"inference_mode", "int8", "bf16", "compile"}
+DEFAULT_OPTIMIZATIONS = ("inference_mode",)
+_NUMERIC = ("int8", "bf16")
+
+
+def resolve_optimizations(names: Iterable[str], device: str = "cpu") -> frozenset[str]:
+    """Validate ``names`` and drop the ones this device cannot apply."""
+    chosen = frozenset(names)
+    unknown = chosen - TORCH_OPTIMIZATIONS
+    if unknown:
+        raise ValueError(
+            f"Unknown torch optimizations: {sorted(unknown)} "
+            f"(expected any of {sorted(TORCH_OPTIMIZATIONS)})"
+        )
+    if "int8" in chosen and device != "cpu":
+        logger.warning("int8 dynamic quantization is CPU-only; skipped on %s", device)
+        chosen -= {"int8"}
+    if "bf16" in chosen and "int8" in chosen:
+        logger.warning("bf16 autocast does not combine with int8 quantization; using int8")
+        chosen -= {"bf16"}
+    if "bf16" in chosen and not bf16_supported(device):
+        logger.warning("bf16 not supported on %s; running fp32", device)
+        chosen -= {"bf16"}
+    return chosen
+
+
+def version_suffix(optimizations: Iterable[str]) -> str:
+    """``-int8`` / ``-bf16`` for the optimizations that change outputs."""
+    return "".join(f"-{name}" for name in _NUMERIC if name in optimizations)
+
+
+@cache
+def bf16_supported(device: str = "cpu") -> bool:
+    if device.startswith("cuda"):
+        import torch
+
+        return bool(torch.cuda.is_bf16_supported())
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = next((line for line in f if line.startswith("flags")), "").split()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def optimize_pipeline(
+    pipe: Any, optimizations: frozenset[str], device: str = "cpu"
+) -> Callable[..., Any]:
+    """Apply model-level optimizations to a transformers pipeline and wrap its calls.
+
+    Also applies the process thread budget, now that torch has been imported.
+    """
+    apply_torch_threads()
+    if not optimizations:
+        return pipe  # type: ignore[no-any-return]
+    import torch
+
+    if "int8" in optimizations:
+        pipe.model = torch.ao.quantization.quantize_dynamic(
+            pipe.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    if "compile" in optimizations:
+        pipe.model = torch.compile(pipe.model, dynamic=True)
+    return TorchOptimizedPipeline(pipe, optimizations, device)
+
+
+class TorchOptimizedPipeline:
+    """Calls the wrapped pipeline under inference mode and/or bf16 autocast."""
+
+    def __init__(self, pipe: Any, optimizations: frozenset[str], device: str = "cpu") -> None:
+        self.pipe = pipe
+        self._optimizations = optimizations
+        self._device_type = "cuda" if device.startswith("cuda") else "cpu"
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        import torch
+
+        with ExitStack() as stack:
+            if "inference_mode" in self._optimizations:
+                stack.enter_context(torch.inference_mode())
+            if "bf16" in self._optimizations:
+                stack.enter_context(torch.autocast(self._device_type, dtype=torch.bfloat16))
+            return self.pipe(*args, **kwargs)
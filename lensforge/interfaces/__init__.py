@@ -2,18 +2,36 @@
 
 from lensforge.interfaces.domain_classifier import (
     ClassificationResult,
+    IBatchDomainClassifier,
     IDomainClassifier,
     Prediction,
+    classify_batch,
+)
+from lensforge.interfaces.nsfw_detector import (
+    IBatchNsfwDetector,
+    INsfwDetector,
+    NsfwResult,
+    detect_batch,
+)
+from lensforge.interfaces.quality_checker import (
+    IBatchQualityChecker,
+    IQualityChecker,
+    QualityResult,
+    check_batch,
 )
-from lensforge.interfaces.nsfw_detector import INsfwDetector, NsfwResult
-from lensforge.interfaces.quality_checker import IQualityChecker, QualityResult
 
 __all__ = [
     "IQualityChecker",
+    "IBatchQualityChecker",
     "QualityResult",
+    "check_batch",
     "INsfwDetector",
+    "IBatchNsfwDetector",
     "NsfwResult",
+    "detect_batch",
     "IDomainClassifier",
+    "IBatchDomainClassifier",
     "ClassificationResult",
     "Prediction",
+    "classify_batch",
 ]
@@ -0,0 +1,15 @@
+"""Lookup of optional batch methods on extension instances."""
+
+from collections.abc import Callable
+from typing import Any
+
+
+def batch_method(component: object, name: str) -> Callable[..., Any] | None:
+    """Return the bound batch method if the component's class defines it.
+
+    Looked up on the type so that mocks which answer every attribute are
+    treated as single-image implementations.
+    """
+    if callable(getattr(type(component), name, None)):
+        return getattr(component, name)  # type: ignore[no-any-return]
+    return None
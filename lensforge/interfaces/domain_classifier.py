@@ -5,6 +5,8 @@ from typing import Protocol
 
 from PIL import Image
 
+from lensforge.interfaces._batch import batch_method
+
 
 @dataclass
 class Prediction:
@@ -32,3 +34,19 @@ class IDomainClassifier(Protocol):
     def version(self) -> str: ...
 
     def classify(self, image: Image.Image) -> ClassificationResult: ...
+
+
+class IBatchDomainClassifier(IDomainClassifier, Protocol):
+    """Optional extension of IDomainClassifier with a batched forward pass."""
+
+    def classify_batch(self, images: list[Image.Image]) -> list[ClassificationResult]: ...
+
+
+def classify_batch(
+    classifier: IDomainClassifier, images: list[Image.Image]
+) -> list[ClassificationResult]:
+    """Run ``classify_batch`` if the classifier implements it, else ``classify`` per image."""
+    batch = batch_method(classifier, "classify_batch")
+    if batch is not None:
+        return batch(images)  # type: ignore[no-any-return]
+    return [classifier.classify(image) for image in images]
@@ -5,6 +5,8 @@ from typing import Protocol
 
 from PIL import Image
 
+from lensforge.interfaces._batch import batch_method
+
 
 @dataclass
 class NsfwResult:
@@ -13,6 +15,7 @@ class NsfwResult:
     is_safe: bool
     nsfw_score: float  # 0.0-1.0 (1.0 = definitely NSFW)
     reason: str | None = None
+    decided_by: str | None = None  # e.g. the tier of a cascade that made the call
 
 
 class INsfwDetector(Protocol):
@@ -22,3 +25,17 @@ class INsfwDetector(Protocol):
     def version(self) -> str: ...
 
     def detect(self, image: Image.Image) -> NsfwResult: ...
+
+
+class IBatchNsfwDetector(INsfwDetector, Protocol):
+    """Optional extension of INsfwDetector with a batched forward pass."""
+
+    def detect_batch(self, images: list[Image.Image]) -> list[NsfwResult]: ...
+
+
+def detect_batch(detector: INsfwDetector, images: list[Image.Image]) -> list[NsfwResult]:
+    """Run ``detect_batch`` if the detector implements it, else ``detect`` per image."""
+    batch = batch_method(detector, "detect_batch")
+    if batch is not None:
+        return batch(images)  # type: ignore[no-any-return]
+    return [detector.detect(image) for image in images]
@@ -5,6 +5,8 @@ from typing import Protocol
 
 from PIL import Image
 
+from lensforge.interfaces._batch import batch_method
+
 
 @dataclass
 class QualityResult:
@@ -22,3 +24,17 @@ class IQualityChecker(Protocol):
     def version(self) -> str: ...
 
     def check(self, image: Image.Image) -> QualityResult: ...
+
+
+class IBatchQualityChecker(IQualityChecker, Protocol):
+    """Optional extension of IQualityChecker with a batched forward pass."""
+
+    def check_batch(self, images: list[Image.Image]) -> list[QualityResult]: ...
+
+
+def check_batch(checker: IQualityChecker, images: list[Image.Image]) -> list[QualityResult]:
+    """Run ``check_batch`` if the checker implements it, else ``check`` per image."""
+    batch = batch_method(checker, "check_batch")
+    if batch is not None:
+        return batch(images)  # type: ignore[no-any-return]
+    return [checker.check(image) for image in images]
@@ -1,55 +1,367 @@
 """Image loading, validation, and preprocessing."""
 
+import asyncio
 import base64
-from io import BytesIO
+import struct
+from collections.abc import AsyncIterable, AsyncIterator, Mapping
+from contextlib import asynccontextmanager
+from io import SEEK_END, BytesIO
+from typing import IO
+from urllib.parse import urlsplit
 
+import anyio
+import httpx
 import requests
 from PIL import Image
+from requests.adapters import HTTPAdapter
+
+from lensforge.metrics import time_load
+from lensforge.tracing import set_attributes, span
 
 SUPPORTED_FORMATS = {"JPEG", "PNG", "WEBP"}
 
+# Resize reduces by whole factors first and resamples only the last <3x with
+# LANCZOS, which Pillow documents as indistinguishable from a full LANCZOS pass.
+REDUCING_GAP = 3.0
+
+CHUNK_SIZE = 64 * 1024
+HEADER_PROBE_BYTES = 256 * 1024  # JPEG SOF can follow large EXIF/ICC segments
+NON_IMAGE_CONTENT_TYPES_OK = {"application/octet-stream", "binary/octet-stream"}
+
+
+def _sniff_header(data: bytes) -> tuple[str, tuple[int, int] | None] | None:
+    """Identify format and, if already present, dimensions from the leading bytes.
+
+    Returns None while more data is needed; raises ValueError for unsupported formats.
+    """
+    if len(data) < 12:
+        return None
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        if len(data) < 24:
+            return "PNG", None
+        w, h = struct.unpack(">II", data[16:24])
+        return "PNG", (w, h)
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "WEBP", _webp_size(data)
+    if data.startswith(b"\xff\xd8\xff"):
+        try:
+            return "JPEG", Image.open(BytesIO(data)).size
+        except Image.DecompressionBombError:
+            raise
+        except Exception:
+            return "JPEG", None
+    raise ValueError("Unsupported image format")
+
+
+def _webp_size(data: bytes) -> tuple[int, int] | None:
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        w, h = struct.unpack("<HH", data[26:30])
+        return w & 0x3FFF, h & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        w = int.from_bytes(data[24:27], "little") + 1
+        h = int.from_bytes(data[27:30], "little") + 1
+        return w, h
+    return None
+
+
+class _DownloadGuard:
+    """Accumulates a streamed download, rejecting it as early as possible.
+
+    Checks Content-Type/Content-Length before the body, then the byte cap on
+    every chunk and the image header (format, pixel count) from the first chunks.
+    """
+
+    def __init__(self, max_bytes: int, max_pixels: int) -> None:
+        self._max_bytes = max_bytes
+        self._max_pixels = max_pixels
+        self._chunks: list[bytes] = []
+        self._size = 0
+        self._header_checked = False
+
+    def check_headers(self, headers: Mapping[str, str]) -> None:
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if (
+            content_type
+            and not content_type.startswith("image/")
+            and content_type not in NON_IMAGE_CONTENT_TYPES_OK
+        ):
+            raise ValueError(f"Unsupported content type: {content_type}")
+        length = headers.get("content-length", "")
+        if length.isdigit() and int(length) > self._max_bytes:
+            raise ValueError(f"Image too large ({length} bytes, max={self._max_bytes})")
+
+    def feed(self, chunk: bytes) -> None:
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        if self._size > self._max_bytes:
+            raise ValueError(f"Image too large (over {self._max_bytes} bytes)")
+        if not self._header_checked:
+            self._check_header(final=False)
+
+    def finish(self) -> BytesIO:
+        if not self._header_checked:
+            self._check_header(final=True)
+        return BytesIO(b"".join(self._chunks))
+
+    def _check_header(self, final: bool) -> None:
+        head = b"".join(self._chunks)[:HEADER_PROBE_BYTES]
+        try:
+            sniffed = _sniff_header(head)
+        except Image.DecompressionBombError as exc:
+            raise ValueError(f"Image too large: {exc}") from exc
+        if sniffed is None or sniffed[1] is None:
+            if self._size >= HEADER_PROBE_BYTES:
+                raise ValueError("Unsupported image format: no image header found")
+            # Short bodies are left to the full decoder in _process.
+            self._header_checked = final
+            return
+        _, (w, h) = sniffed
+        _check_pixels(w, h, self._max_pixels)
+        self._header_checked = True
+
+
+def _check_pixels(w: int, h: int, max_pixels: int) -> None:
+    if w * h > max_pixels:
+        raise ValueError(f"Image too large ({w}x{h} pixels, max={max_pixels})")
+
+
+class _HostLimit:
+    """Per-host download semaphore and the coroutines holding or awaiting it."""
+
+    def __init__(self, max_connections: int) -> None:
+        self.semaphore = asyncio.Semaphore(max_connections)
+        self.users = 0
+
+
+async def _close_stale_client(
+    client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop | None
+) -> None:
+    """Close a client created on another event loop.
+
+    A loop still running (in another thread) closes its own client; otherwise
+    the connections are closed here, and those of a closed loop are already gone.
+    """
+    if loop is not None and loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        return
+    try:
+        await client.aclose()
+    except RuntimeError:  # "Event loop is closed" from the old transports
+        pass
+
 
 class ImageLoader:
-    """Loads images from base64 or URL, validates format, resizes."""
+    """Loads images from base64 or URL, validates format, resizes.
+
+    URL downloads share pooled connections: a ``requests.Session`` for the sync
+    path and an ``httpx.AsyncClient`` for the async path, which additionally caps
+    concurrent downloads per host and in total.
+    """
 
-    def __init__(self, max_size: int = 1024) -> None:
+    def __init__(
+        self,
+        max_size: int = 1024,
+        max_download_bytes: int = 20 * 1024 * 1024,
+        max_pixels: int = 50_000_000,
+        timeout: float = 10.0,
+        max_connections: int = 32,
+        max_connections_per_host: int = 8,
+    ) -> None:
         self._max_size = max_size
+        self._max_download_bytes = max_download_bytes
+        self._max_pixels = max_pixels
+        self._timeout = timeout
+        self._max_connections = max_connections
+        self._max_connections_per_host = max_connections_per_host
+
+        self._session = requests.Session()
+        # pool_connections is the number of per-host pools kept (LRU), pool_maxsize
+        # the idle connections kept per host: together at most max_connections.
+        adapter = HTTPAdapter(
+            pool_connections=max(1, max_connections // max_connections_per_host),
+            pool_maxsize=max_connections_per_host,
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        self._client: httpx.AsyncClient | None = None
+        self._client_loop: asyncio.AbstractEventLoop | None = None
+        self._total_limit: asyncio.Semaphore | None = None
+        self._host_limits: dict[str, _HostLimit] = {}
+
+    @property
+    def max_download_bytes(self) -> int:
+        """Byte cap of one encoded image, from any source."""
+        return self._max_download_bytes
 
     def load_base64(self, data: str) -> Image.Image:
         """Decode base64 string to PIL Image."""
-        try:
-            raw = base64.b64decode(data)
-        except Exception as exc:
-            raise ValueError(f"Invalid base64 data: {exc}") from exc
-        return self._process(BytesIO(raw))
+        with time_load(), span("image.load", {"image.source": "base64"}):
+            try:
+                raw = base64.b64decode(data)
+            except Exception as exc:
+                raise ValueError(f"Invalid base64 data: {exc}") from exc
+            return self._process(BytesIO(raw))
+
+    def load_bytes(self, data: bytes) -> Image.Image:
+        """Decode an encoded image held in memory (e.g. a raw request body).
+
+        ``BytesIO`` shares an immutable ``bytes`` buffer, so nothing is copied.
+        """
+        with time_load(), span("image.load", {"image.source": "bytes"}):
+            self._check_bytes(len(data))
+            return self._process(BytesIO(data))
+
+    def load_file(self, fp: IO[bytes]) -> Image.Image:
+        """Decode an open binary file (e.g. a multipart upload part) in place."""
+        with time_load(), span("image.load", {"image.source": "file"}):
+            size = fp.seek(0, SEEK_END)
+            fp.seek(0)
+            self._check_bytes(size)
+            image = self._process(fp)
+            image.load()  # detach from the file before the caller closes it
+            return image
 
     def load_url(self, url: str) -> Image.Image:
-        """Fetch image from URL."""
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        return self._process(BytesIO(resp.content))
+        """Fetch image from URL, streaming under the download limits."""
+        guard = self._guard()
+        with time_load(), span("image.load", {"image.source": "url"}):
+            try:
+                with self._session.get(url, timeout=self._timeout, stream=True) as resp:
+                    resp.raise_for_status()
+                    guard.check_headers(resp.headers)
+                    for chunk in resp.iter_content(CHUNK_SIZE):
+                        guard.feed(chunk)
+            except requests.RequestException as exc:
+                raise ValueError(f"Failed to fetch image: {exc}") from exc
+            return self._process(guard.finish())
+
+    async def aload_url(self, url: str) -> Image.Image:
+        """Fetch image from URL on the pooled async client."""
+        client, total_limit = await self._async_client()
+        guard = self._guard()
+        with time_load(), span("image.load", {"image.source": "url"}):
+            async with self._host_limit(urlsplit(url).netloc), total_limit:
+                try:
+                    async with client.stream("GET", url) as resp:
+                        resp.raise_for_status()
+                        guard.check_headers(resp.headers)
+                        async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+                            guard.feed(chunk)
+                except httpx.HTTPError as exc:
+                    raise ValueError(f"Failed to fetch image: {exc}") from exc
+            return await anyio.to_thread.run_sync(self._process, guard.finish())
+
+    async def aload_urls(self, urls: list[str]) -> list[Image.Image | ValueError]:
+        """Fetch many URLs concurrently; failures are returned in place, not raised."""
+
+        async def load(url: str) -> Image.Image | ValueError:
+            try:
+                return await self.aload_url(url)
+            except ValueError as exc:
+                return exc
+
+        return list(await asyncio.gather(*(load(url) for url in urls)))
+
+    async def aread_stream(self, chunks: AsyncIterable[bytes], headers: Mapping[str, str]) -> bytes:
+        """Collect a streamed body (e.g. a raw request) under the download limits.
 
-    def _process(self, buf: BytesIO) -> Image.Image:
-        """Validate format, convert to RGB, resize if needed."""
+        Like a URL download, it is rejected on Content-Length before any chunk is
+        read, and on the byte cap or the image header as soon as a chunk shows it.
+        """
+        guard = self._guard()
+        guard.check_headers(headers)
+        async for chunk in chunks:
+            guard.feed(chunk)
+        return guard.finish().getvalue()
+
+    async def aclose(self) -> None:
+        """Close pooled HTTP connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._session.close()
+
+    def _check_bytes(self, size: int) -> None:
+        if size > self._max_download_bytes:
+            raise ValueError(f"Image too large ({size} bytes, max={self._max_download_bytes})")
+
+    def _guard(self) -> _DownloadGuard:
+        return _DownloadGuard(self._max_download_bytes, self._max_pixels)
+
+    async def _async_client(self) -> tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        """Return the async client and limits bound to the running event loop.
+
+        A client left from an earlier event loop is replaced and closed.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            stale, stale_loop = self._client, self._client_loop
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=httpx.Limits(max_connections=self._max_connections),
+                follow_redirects=True,
+            )
+            self._client_loop = loop
+            self._total_limit = asyncio.Semaphore(self._max_connections)
+            self._host_limits.clear()
+            if stale is not None:
+                await _close_stale_client(stale, stale_loop)
+        assert self._client is not None and self._total_limit is not None
+        return self._client, self._total_limit
+
+    @asynccontextmanager
+    async def _host_limit(self, host: str) -> AsyncIterator[None]:
+        """Hold the per-host download slot; idle hosts do not keep a semaphore."""
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = _HostLimit(self._max_connections_per_host)
+        limit.users += 1
+        try:
+            async with limit.semaphore:
+                yield
+        finally:
+            limit.users -= 1
+            if not limit.users and self._host_limits.get(host) is limit:
+                del self._host_limits[host]
+
+    def _process(self, buf: IO[bytes]) -> Image.Image:
+        """Validate format, convert to RGB, resize if needed.
+
+        Oversized JPEGs are decoded at a reduced scale (1/2, 1/4 or 1/8, never
+        below the target size) via libjpeg's scale-on-decode.
+        """
         try:
             img = Image.open(buf)
+        except Image.DecompressionBombError as exc:
+            raise ValueError(f"Image too large: {exc}") from exc
         except Exception as exc:
             raise ValueError(f"Unsupported image format: {exc}") from exc
 
         if img.format and img.format.upper() not in SUPPORTED_FORMATS:
             raise ValueError(f"Unsupported image format: {img.format}")
 
+        set_attributes({"image.width": img.width, "image.height": img.height})
+        _check_pixels(*img.size, self._max_pixels)
+
+        target = self._target_size(*img.size)
+        if target is not None and img.format == "JPEG":
+            img.draft("RGB", target)
+
         if img.mode != "RGB":
             img = img.convert("RGB")
 
-        return self._resize(img)
+        if target is None:
+            return img
+        return img.resize(target, Image.LANCZOS, reducing_gap=REDUCING_GAP)
 
-    def _resize(self, img: Image.Image) -> Image.Image:
-        """Resize to max dimension preserving aspect ratio."""
-        w, h = img.size
+    def _target_size(self, w: int, h: int) -> tuple[int, int] | None:
+        """Max-dimension target preserving aspect ratio, or None if already small."""
         if max(w, h) <= self._max_size:
-            return img
+            return None
         scale = self._max_size / max(w, h)
-        new_w = int(w * scale)
-        new_h = int(h * scale)
-        return img.resize((new_w, new_h), Image.LANCZOS)
+        return int(w * scale), int(h * scale)
@@ -0,0 +1,148 @@
+"""Prometheus metrics, exported on ``GET /metrics``.
+
+Metrics are recorded where the work happens (``Stage.run``, the image
+loader, the routes, the result cache lookup, the micro-batchers), so the
+hot path only pays for a lock-protected increment per observation.
+
+With several worker processes (``lensforge.server`` or ``uvicorn
+--workers``) set ``PROMETHEUS_MULTIPROC_DIR`` to a writable directory: each
+process then writes its samples to memory-mapped files there, and whichever
+worker answers the scrape aggregates all of them. ``lensforge.server``
+clears the directory on startup and removes the files of workers that exit.
+"""
+
+import os
+import shutil
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+MULTIPROCESS_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROCESS_DIR:
+    os.makedirs(MULTIPROCESS_DIR, exist_ok=True)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+# Image load and decode share the stage histogram under this label.
+LOAD_STAGE = "load"
+
+STAGE_SECONDS = Histogram(
+    "lensforge_stage_seconds",
+    "Latency of one call to a pipeline stage (a batch call counts once), or of one image load.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_IMAGES = Counter(
+    "lensforge_stage_images_total", "Images processed per pipeline stage.", ["stage"]
+)
+RESULTS = Counter("lensforge_results_total", "Analysis results per response status.", ["status"])
+CACHE_LOOKUPS = Counter(
+    "lensforge_cache_lookups_total", "Result cache lookups by outcome.", ["result"]
+)
+COALESCED = Counter(
+    "lensforge_coalesced_total", "Analyses served by another request's in-flight work."
+)
+BATCH_SIZE = Histogram(
+    "lensforge_batch_size", "Images per micro-batch.", ["batcher"], buckets=BATCH_SIZE_BUCKETS
+)
+CASCADE_DECISIONS = Counter(
+    "lensforge_nsfw_cascade_decisions_total", "NSFW cascade decisions per tier.", ["tier"]
+)
+IN_FLIGHT = Gauge(
+    "lensforge_requests_in_flight",
+    "Analysis requests being processed.",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+MODEL_LOAD_SECONDS = Gauge(
+    "lensforge_model_load_seconds",
+    "Time the stage's component took to load its model.",
+    ["stage"],
+    multiprocess_mode="max",
+)
+
+_LOAD_SECONDS = STAGE_SECONDS.labels(LOAD_STAGE)
+
+
+@contextmanager
+def time_load() -> Iterator[None]:
+    """Record the duration of an image load and decode."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _LOAD_SECONDS.observe(time.perf_counter() - start)
+
+
+def record_result(status: str, count: int = 1) -> None:
+    RESULTS.labels(status).inc(count)
+
+
+def record_model_load(stage: str, seconds: float) -> None:
+    MODEL_LOAD_SECONDS.labels(stage).set(seconds)
+
+
+def render() -> tuple[bytes, str]:
+    """Return the exposition body and its content type."""
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)  # type: ignore[no-untyped-call]
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def clear_multiprocess_dir() -> None:
+    """Remove samples left over from a previous run (call before forking workers).
+
+    This process's own files are kept: they are already mapped in memory.
+    """
+    if not MULTIPROCESS_DIR:
+        return
+    own = f"_{os.getpid()}.db"
+    for entry in os.scandir(MULTIPROCESS_DIR):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path)
+        elif not entry.name.endswith(own):
+            os.remove(entry.path)
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop the live gauges of a worker that exited."""
+    if MULTIPROCESS_DIR:
+        multiprocess.mark_process_dead(pid)  # type: ignore[no-untyped-call]
+
+
+class InFlightMiddleware:
+    """ASGI middleware counting in-flight requests to ``paths``.
+
+    Other paths (health checks, scrapes, 404s) pass through untouched, which
+    also keeps the ``endpoint`` label to a known set.
+    """
+
+    def __init__(self, app: Any, paths: set[str]) -> None:
+        self.app = app
+        self._gauges = {path: IN_FLIGHT.labels(path) for path in paths}
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        gauge = self._gauges.get(scope["path"]) if scope["type"] == "http" else None
+        if gauge is None:
+            await self.app(scope, receive, send)
+            return
+        gauge.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gauge.dec()
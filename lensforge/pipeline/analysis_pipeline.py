@@ -1,64 +1,246 @@
-"""Two-stage analysis pipeline: NN1 (safety) → NN2 (domain classification)."""
+"""Analysis pipeline: NN1 gates (quality, safety, ...) → NN2 (domain classification)."""
 
 import time
+from concurrent.futures import Executor, Future
+from contextlib import AbstractContextManager, nullcontext
+from typing import TYPE_CHECKING, Any
 
 from PIL import Image
 
-from lensforge.interfaces.domain_classifier import IDomainClassifier
-from lensforge.interfaces.nsfw_detector import INsfwDetector
-from lensforge.interfaces.quality_checker import IQualityChecker
+from lensforge.cache.base import IResultCache
+from lensforge.cache.keys import image_digest, result_key
+from lensforge.interfaces.domain_classifier import ClassificationResult
+from lensforge.metrics import CACHE_LOOKUPS, COALESCED
+from lensforge.pipeline.singleflight import SingleFlight
+from lensforge.pipeline.stages import Outcome, StageGraph
 from lensforge.schemas.response import AnalyzeResponse, PredictionSchema
+from lensforge.tracing import set_attributes, span
+
+if TYPE_CHECKING:
+    from lensforge.profiling import RequestProfiler
 
 DISCLAIMER = "This is NOT a medical diagnosis. See a qualified specialist. AI output only."
 
 
 class AnalysisPipeline:
-    """Orchestrates NN1 safety filter → NN2 domain classification."""
+    """Runs a ``StageGraph`` (by default NN1 quality and safety gates → NN2
+    domain classification) and turns its outcome into an ``AnalyzeResponse``.
+
+    With a ``stage_executor``, each stage starts as soon as its own
+    dependencies are done: in the default graph, the safety check overlaps
+    the quality check, and classification runs alongside the safety check
+    once quality has passed. NSFW rejections are rare, so this saves model
+    latency on nearly every request at the cost of wasted work on rejected
+    images. A rejection still wins: speculative stages are cancelled if they
+    have not started yet, and their results discarded otherwise.
+
+    With ``stage_timings`` (or per call), responses carry the milliseconds
+    of each stage call in ``stage_timings_ms``; cached responses report no
+    stages. A ``profiler`` wraps every call in ``RequestProfiler.profile``.
+
+    ``cache_settings`` (the decision thresholds) are part of every cache key,
+    so changing a threshold misses results decided under the old one.
+    """
 
     def __init__(
         self,
-        quality: IQualityChecker,
-        safety: INsfwDetector,
-        classifier: IDomainClassifier,
+        stages: StageGraph,
+        cache: IResultCache | None = None,
+        inflight: SingleFlight[AnalyzeResponse] | None = None,
+        stage_executor: Executor | None = None,
+        stage_timings: bool = False,
+        profiler: "RequestProfiler | None" = None,
+        cache_settings: dict[str, Any] | None = None,
     ) -> None:
-        self._quality = quality
-        self._safety = safety
-        self._classifier = classifier
+        self._stages = stages
+        self._cache = cache
+        self._inflight = inflight
+        self._executor = stage_executor
+        self._stage_timings = stage_timings
+        self._profiler = profiler
+        self._cache_settings = cache_settings
+
+    @property
+    def stages(self) -> StageGraph:
+        return self._stages
+
+    def analyze(self, image: Image.Image, stage_timings: bool | None = None) -> AnalyzeResponse:
+        """Run the stage graph over one image.
+
+        With a result cache, identical pixels analyzed by the same model
+        versions are answered from the cache. With in-flight coalescing, a
+        request for an image that is already being analyzed waits for that
+        analysis and shares its response. ``stage_timings`` overrides the
+        pipeline's default.
+        """
+        with self._profile("analyze"), span("pipeline.analyze", {"batch.size": 1}):
+            response = self._analyze(image)
+        return self._with_timings(response, stage_timings)
+
+    def analyze_batch(
+        self, images: list[Image.Image], stage_timings: bool | None = None
+    ) -> list[AnalyzeResponse]:
+        """Run each stage once over the images that survived the previous stage.
+
+        Duplicate images within the batch are analyzed once.
+        """
+        with (
+            self._profile("analyze_batch"),
+            span("pipeline.analyze_batch", {"batch.size": len(images)}),
+        ):
+            responses = self._analyze_batch(images)
+        return [self._with_timings(response, stage_timings) for response in responses]
 
-    def analyze(self, image: Image.Image) -> AnalyzeResponse:
-        """Run full pipeline: quality → safety → classify."""
+    def _analyze(self, image: Image.Image) -> AnalyzeResponse:
         start = time.monotonic()
-        versions = {
-            "nn1_quality": self._quality.version,
-            "nn1_safety": self._safety.version,
-            "nn2": self._classifier.version,
-        }
-
-        # NN1: Quality check
-        quality_result = self._quality.check(image)
-        if not quality_result.is_acceptable:
-            return AnalyzeResponse(
-                status="rejected_quality",
-                reason=quality_result.reason,
-                inference_time_ms=self._elapsed(start),
-                disclaimer=DISCLAIMER,
-                model_versions=versions,
-            )
+        versions = self._versions()
+        if self._cache is None and self._inflight is None:
+            return self._run(image, start, versions)
+
+        key = result_key(image_digest(image), versions, self._cache_settings)
+        cached = self._cached(key, start, versions)
+        set_attributes({"cache.hit": cached is not None})
+        if cached is not None:
+            return cached
+        if self._inflight is None:
+            return self._run_and_store(key, image, start, versions)
+
+        response, shared = self._inflight.do(
+            key, lambda: self._run_and_store(key, image, start, versions)
+        )
+        set_attributes({"coalesced": shared})
+        if shared:
+            COALESCED.inc()
+            return response.model_copy(update={"inference_time_ms": self._elapsed(start)})
+        return response
+
+    def _analyze_batch(self, images: list[Image.Image]) -> list[AnalyzeResponse]:
+        start = time.monotonic()
+        versions = self._versions()
+        if self._cache is None and self._inflight is None:
+            return self._run_batch(images, start, versions)
+
+        keys = [result_key(image_digest(image), versions, self._cache_settings) for image in images]
+        by_key: dict[str, AnalyzeResponse] = {}
+        first: dict[str, int] = {}
+        for i, key in enumerate(keys):
+            if key in by_key or key in first:
+                continue
+            cached = self._cached(key, start, versions)
+            if cached is not None:
+                by_key[key] = cached
+            else:
+                first[key] = i
+        set_attributes({"cache.hits": len(by_key)})
+
+        # Lead the keys nobody else is analyzing; wait on the rest afterwards.
+        leading = list(first)
+        futures: dict[str, Future[AnalyzeResponse]] = {}
+        followers: dict[str, Future[AnalyzeResponse]] = {}
+        inflight = self._inflight
+        if inflight is not None:
+            duplicates = len(keys) - len(set(keys))
+            inflight.record_coalesced(duplicates)
+            COALESCED.inc(duplicates)
+            for key in first:
+                future, leader = inflight.acquire(key)
+                (futures if leader else followers)[key] = future
+            leading = list(futures)
+            set_attributes({"coalesced": duplicates + len(followers)})
 
-        # NN1: NSFW safety check
-        nsfw_result = self._safety.detect(image)
-        if not nsfw_result.is_safe:
-            return AnalyzeResponse(
-                status="rejected_nsfw",
-                reason=nsfw_result.reason,
-                inference_time_ms=self._elapsed(start),
-                disclaimer=DISCLAIMER,
-                model_versions=versions,
+        try:
+            computed = self._run_batch([images[first[key]] for key in leading], start, versions)
+        except BaseException as exc:
+            for key, future in futures.items():
+                future.set_exception(exc)
+                inflight.release(key)  # type: ignore[union-attr]
+            raise
+        for key, response in zip(leading, computed):
+            if self._cache is not None:
+                self._cache.set(key, response)
+            by_key[key] = response
+            if key in futures:
+                futures[key].set_result(response)
+                inflight.release(key)  # type: ignore[union-attr]
+
+        COALESCED.inc(len(followers))
+        for key, future in followers.items():
+            by_key[key] = future.result().model_copy(
+                update={"inference_time_ms": self._elapsed(start)}
             )
 
-        # NN2: Domain classification
-        classification = self._classifier.classify(image)
+        return [by_key[key] for key in keys]
+
+    def _cached(self, key: str, start: float, versions: dict[str, str]) -> AnalyzeResponse | None:
+        if self._cache is None:
+            return None
+        cached = self._cache.get(key, versions)
+        if cached is None:
+            CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        CACHE_LOOKUPS.labels("hit").inc()
+        return cached.model_copy(
+            update={"inference_time_ms": self._elapsed(start), "stage_timings_ms": {}}
+        )
+
+    def _with_timings(self, response: AnalyzeResponse, wanted: bool | None) -> AnalyzeResponse:
+        if self._stage_timings if wanted is None else wanted:
+            return response
+        return response.model_copy(update={"stage_timings_ms": None})
+
+    def _profile(self, name: str) -> AbstractContextManager[None]:
+        if self._profiler is None:
+            return nullcontext()
+        return self._profiler.profile(name)
+
+    def _run_and_store(
+        self, key: str, image: Image.Image, start: float, versions: dict[str, str]
+    ) -> AnalyzeResponse:
+        response = self._run(image, start, versions)
+        if self._cache is not None:
+            self._cache.set(key, response)
+        return response
+
+    def _run(self, image: Image.Image, start: float, versions: dict[str, str]) -> AnalyzeResponse:
+        # Single images go through the single-image methods (and micro-batching).
+        outcome = self._stages.run([image], batched=False, executor=self._executor)[0]
+        return self._respond(outcome, start, versions)
+
+    def _run_batch(
+        self, images: list[Image.Image], start: float, versions: dict[str, str]
+    ) -> list[AnalyzeResponse]:
+        if not images:
+            return []
+        outcomes = self._stages.run(images, executor=self._executor)
+        return [self._respond(outcome, start, versions) for outcome in outcomes]
+
+    def _respond(self, outcome: Outcome, start: float, versions: dict[str, str]) -> AnalyzeResponse:
+        stage = outcome.rejected_by
+        if stage is not None:
+            reason = getattr(outcome.result, "reason", None)
+            response = self._rejected(stage.reject_status or "rejected", reason, start, versions)
+        else:
+            response = self._success(outcome.result, start, versions)
+        response.stage_timings_ms = outcome.timings
+        return response
+
+    def _versions(self) -> dict[str, str]:
+        return self._stages.versions()
+
+    def _rejected(
+        self, status: str, reason: str | None, start: float, versions: dict[str, str]
+    ) -> AnalyzeResponse:
+        return AnalyzeResponse(
+            status=status,
+            reason=reason,
+            inference_time_ms=self._elapsed(start),
+            disclaimer=DISCLAIMER,
+            model_versions=versions,
+        )
 
+    def _success(
+        self, classification: ClassificationResult, start: float, versions: dict[str, str]
+    ) -> AnalyzeResponse:
         predictions = [
             PredictionSchema(
                 label=p.label,
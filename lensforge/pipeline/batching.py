@@ -0,0 +1,196 @@
+"""Dynamic micro-batching of concurrent single-image model calls."""
+
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Generic, TypeVar
+
+from opentelemetry.trace import Link, SpanContext
+from PIL import Image
+
+from lensforge.interfaces.domain_classifier import (
+    ClassificationResult,
+    IDomainClassifier,
+    classify_batch,
+)
+from lensforge.interfaces.nsfw_detector import INsfwDetector, NsfwResult, detect_batch
+from lensforge.metrics import BATCH_SIZE
+from lensforge.tracing import current_context, span
+from lensforge.warmup import load_model
+
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class _Pending(Generic[T]):
+    """A queued image; ``started`` and ``batch_size`` are set when its batch runs."""
+
+    image: Image.Image
+    future: Future[T]
+    enqueued: float
+    caller: SpanContext | None
+    started: float = 0.0
+    batch_size: int = 0
+
+
+class MicroBatcher(Generic[T]):
+    """Gathers concurrent single-image calls into one batched call.
+
+    A daemon worker thread takes the first queued image, then keeps collecting
+    until ``max_batch_size`` images are queued or ``max_wait_ms`` has passed,
+    runs ``batch_fn`` once and resolves each caller's future with its result.
+
+    Traced callers get a ``<name>.wait`` span with their queue wait; the
+    batched call gets a ``<name>.batch`` span linked to every caller's span.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[list[Image.Image]], list[T]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        name: str = "micro-batcher",
+    ) -> None:
+        self._batch_fn = batch_fn
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait = max(0.0, max_wait_ms) / 1000
+        self._name = name
+        self._batch_sizes = BATCH_SIZE.labels(name)
+        self._queue: queue.Queue[_Pending[T]] = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+
+    def submit(self, image: Image.Image) -> Future[T]:
+        """Queue an image and return a future for its result."""
+        return self._enqueue(image).future
+
+    def __call__(self, image: Image.Image) -> T:
+        """Queue an image and block until its batch has run."""
+        with span(f"{self._name}.wait") as wait_span:
+            pending = self._enqueue(image)
+            try:
+                return pending.future.result()
+            finally:
+                if wait_span.is_recording() and pending.batch_size:
+                    wait_ms = (pending.started - pending.enqueued) * 1000
+                    wait_span.set_attributes(
+                        {"batch.size": pending.batch_size, "batch.queue_wait_ms": wait_ms}
+                    )
+
+    def _enqueue(self, image: Image.Image) -> _Pending[T]:
+        pending = _Pending(image, Future(), time.perf_counter(), current_context())
+        self._queue.put(pending)
+        self._ensure_worker()
+        return pending
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            self._dispatch(self._collect())
+
+    def _collect(self) -> list[_Pending[T]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._max_wait
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch(self, batch: list[_Pending[T]]) -> None:
+        self._batch_sizes.observe(len(batch))
+        started = time.perf_counter()
+        for pending in batch:
+            pending.started = started
+            pending.batch_size = len(batch)
+        links = [Link(p.caller) for p in batch if p.caller is not None]
+        try:
+            with span(f"{self._name}.batch", {"batch.size": len(batch)}, links=links):
+                results = self._batch_fn([pending.image for pending in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"{self._name}: batch returned {len(results)} results for {len(batch)} images"
+                )
+        except Exception as exc:
+            for pending in batch:
+                pending.future.set_exception(exc)
+            return
+        for pending, result in zip(batch, results):
+            pending.future.set_result(result)
+
+
+def _chunks(images: list[Image.Image], size: int) -> list[list[Image.Image]]:
+    return [images[i : i + size] for i in range(0, len(images), size)]
+
+
+class BatchingNsfwDetector:
+    """INsfwDetector that micro-batches concurrent ``detect`` calls."""
+
+    def __init__(
+        self, detector: INsfwDetector, max_batch_size: int = 8, max_wait_ms: float = 5.0
+    ) -> None:
+        self._detector = detector
+        self._max_batch_size = max(1, max_batch_size)
+        self._batcher: MicroBatcher[NsfwResult] = MicroBatcher(
+            self.detect_batch, max_batch_size, max_wait_ms, name="nsfw-batcher"
+        )
+
+    @property
+    def version(self) -> str:
+        return self._detector.version
+
+    def load(self) -> None:
+        load_model(self._detector)
+
+    def detect(self, image: Image.Image) -> NsfwResult:
+        return self._batcher(image)
+
+    def detect_batch(self, images: list[Image.Image]) -> list[NsfwResult]:
+        results: list[NsfwResult] = []
+        for chunk in _chunks(images, self._max_batch_size):
+            results.extend(detect_batch(self._detector, chunk))
+        return results
+
+
+class BatchingDomainClassifier:
+    """IDomainClassifier that micro-batches concurrent ``classify`` calls."""
+
+    def __init__(
+        self, classifier: IDomainClassifier, max_batch_size: int = 8, max_wait_ms: float = 5.0
+    ) -> None:
+        self._classifier = classifier
+        self._max_batch_size = max(1, max_batch_size)
+        self._batcher: MicroBatcher[ClassificationResult] = MicroBatcher(
+            self.classify_batch, max_batch_size, max_wait_ms, name="classifier-batcher"
+        )
+
+    @property
+    def version(self) -> str:
+        return self._classifier.version
+
+    def load(self) -> None:
+        load_model(self._classifier)
+
+    def classify(self, image: Image.Image) -> ClassificationResult:
+        return self._batcher(image)
+
+    def classify_batch(self, images: list[Image.Image]) -> list[ClassificationResult]:
+        results: list[ClassificationResult] = []
+        for chunk in _chunks(images, self._max_batch_size):
+            results.extend(classify_batch(self._classifier, chunk))
+        return results
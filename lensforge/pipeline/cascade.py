@@ -0,0 +1,102 @@
+"""Two-tier NSFW cascade: a cheap first pass, the full model only when unsure.
+
+Most images are clearly safe, so running the full NSFW model on all of them
+wastes most of its cost. ``CascadeNsfwDetector`` runs the fast tier first and
+decides on its score alone when it falls outside ``[low, high]``: below
+``low`` the image is safe, above ``high`` it is rejected. Scores inside that
+uncertainty band are escalated to the full tier, whose result is returned.
+``NsfwResult.decided_by`` names the tier that decided.
+"""
+
+import threading
+from collections import Counter
+
+from PIL import Image
+
+from lensforge.interfaces.nsfw_detector import INsfwDetector, NsfwResult, detect_batch
+from lensforge.metrics import CASCADE_DECISIONS
+from lensforge.tracing import span
+from lensforge.warmup import load_model
+
+FAST_TIER = "fast"
+FULL_TIER = "full"
+
+
+class CascadeNsfwDetector:
+    """INsfwDetector that escalates from ``fast`` to ``full`` inside the uncertainty band."""
+
+    def __init__(
+        self, fast: INsfwDetector, full: INsfwDetector, low: float = 0.2, high: float = 0.95
+    ) -> None:
+        if not 0.0 <= low <= high <= 1.0:
+            raise ValueError(f"Invalid cascade band [{low}, {high}]; need 0 <= low <= high <= 1")
+        self._fast = fast
+        self._full = full
+        self._low = low
+        self._high = high
+        self._decided: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> str:
+        return f"cascade-{self._fast.version}-{self._low:g}-{self._high:g}-{self._full.version}"
+
+    @property
+    def decided(self) -> dict[str, int]:
+        """Images decided per tier since startup."""
+        with self._lock:
+            return {FAST_TIER: self._decided[FAST_TIER], FULL_TIER: self._decided[FULL_TIER]}
+
+    def load(self) -> None:
+        load_model(self._fast)
+        load_model(self._full)
+
+    def detect(self, image: Image.Image) -> NsfwResult:
+        with span("nsfw_cascade.fast", {"batch.size": 1}):
+            first = self._fast.detect(image)
+        if self._escalate(first):
+            with span("nsfw_cascade.full", {"batch.size": 1}):
+                result = self._full.detect(image)
+            self._count(FULL_TIER, 1)
+            return self._decide(result, FULL_TIER)
+        self._count(FAST_TIER, 1)
+        return self._decide_fast(first)
+
+    def detect_batch(self, images: list[Image.Image]) -> list[NsfwResult]:
+        with span("nsfw_cascade.fast", {"batch.size": len(images)}):
+            first = detect_batch(self._fast, images)
+        results: list[NsfwResult] = [self._decide_fast(r) for r in first]
+        unsure = [i for i, r in enumerate(results) if self._escalate(r)]
+        if unsure:
+            with span("nsfw_cascade.full", {"batch.size": len(unsure)}):
+                escalated = detect_batch(self._full, [images[i] for i in unsure])
+            for i, result in zip(unsure, escalated):
+                results[i] = self._decide(result, FULL_TIER)
+        self._count(FAST_TIER, len(images) - len(unsure))
+        self._count(FULL_TIER, len(unsure))
+        return results
+
+    def _escalate(self, result: NsfwResult) -> bool:
+        return self._low <= result.nsfw_score <= self._high
+
+    def _decide_fast(self, result: NsfwResult) -> NsfwResult:
+        if result.nsfw_score < self._low:
+            return NsfwResult(is_safe=True, nsfw_score=result.nsfw_score, decided_by=FAST_TIER)
+        if result.nsfw_score > self._high:
+            return NsfwResult(
+                is_safe=False,
+                nsfw_score=result.nsfw_score,
+                reason=result.reason or f"NSFW score {result.nsfw_score:.2f}",
+                decided_by=FAST_TIER,
+            )
+        return result  # inside the band: escalated by the caller
+
+    @staticmethod
+    def _decide(result: NsfwResult, tier: str) -> NsfwResult:
+        return NsfwResult(result.is_safe, result.nsfw_score, result.reason, decided_by=tier)
+
+    def _count(self, tier: str, n: int) -> None:
+        if n:
+            with self._lock:
+                self._decided[tier] += n
+            CASCADE_DECISIONS.labels(tier).inc(n)
@@ -0,0 +1,345 @@
+"""Model inference in worker processes, with images handed over in shared memory.
+
+Everything outside the torch kernels (preprocessing, postprocessing, Python
+glue) holds the GIL, so threads stop scaling early. ``InferencePool`` runs
+the model stages in spawned worker processes, each with its own copy of the
+models, loaded once. Decoded RGB pixels are written into a shared-memory
+buffer per worker instead of being pickled; only the small result objects
+travel back over the pipe.
+"""
+
+import logging
+import multiprocessing as mp
+import pickle
+import queue
+from collections.abc import Callable, Iterable
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+from PIL import Image
+
+from lensforge.interfaces.domain_classifier import (
+    ClassificationResult,
+    IDomainClassifier,
+    classify_batch,
+)
+from lensforge.interfaces.nsfw_detector import INsfwDetector, NsfwResult, detect_batch
+from lensforge.interfaces.quality_checker import IQualityChecker, QualityResult, check_batch
+
+logger = logging.getLogger(__name__)
+
+STAGE_BATCH_FNS: dict[str, Callable[[Any, list[Image.Image]], list[Any]]] = {
+    "quality": check_batch,
+    "nsfw": detect_batch,
+    "classifier": classify_batch,
+}
+MIN_SHM_BYTES = 8 * 1024 * 1024
+POLL_INTERVAL = 0.1
+
+
+class WorkerCrashedError(RuntimeError):
+    """An inference worker died while handling a call; it has been respawned."""
+
+
+def _write_images(shm: SharedMemory, images: list[Image.Image]) -> list[tuple[int, int, int]]:
+    """Copy RGB pixels back to back into ``shm``; returns (offset, width, height) per image."""
+    layout = []
+    offset = 0
+    for image in images:
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        w, h = image.size
+        size = w * h * 3
+        shm.buf[offset : offset + size] = image.tobytes()
+        layout.append((offset, w, h))
+        offset += size
+    return layout
+
+
+def _read_images(shm: SharedMemory, layout: list[tuple[int, int, int]]) -> list[Image.Image]:
+    """Images decoded from the shared buffer.
+
+    Pillow copies RGB pixels into its own storage, so the images stay valid
+    after the parent overwrites or replaces ``shm``; the saving is the pickle
+    round trip, not the copy.
+    """
+    return [
+        Image.frombytes("RGB", (w, h), shm.buf[offset : offset + w * h * 3])
+        for offset, w, h in layout
+    ]
+
+
+def _picklable(exc: Exception) -> Exception:
+    try:
+        pickle.dumps(exc)
+    except Exception:
+        return RuntimeError(f"{type(exc).__name__}: {exc}")
+    return exc
+
+
+def _warm(models: dict[str, Any], runs: int, batch_sizes: list[int]) -> None:
+    from lensforge.warmup import warmup_image
+
+    image = warmup_image()
+    for _ in range(runs):
+        for size in batch_sizes:
+            for name, model in models.items():
+                STAGE_BATCH_FNS[name](model, [image] * max(1, size))
+
+
+def _worker_main(
+    conn: Connection,
+    build: Callable[[], dict[str, Any]],
+    initializer: Callable[[int, int], None] | None,
+    index: int,
+    workers: int,
+) -> None:
+    """Worker loop: build the models once, then serve calls until told to stop."""
+    if initializer is not None:
+        initializer(index, workers)
+    models = build()
+    shm: SharedMemory | None = None
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        kind, payload = message
+        try:
+            if kind == "warmup":
+                _warm(models, *payload)
+                result: Any = None
+            else:
+                shm_name, name, layout = payload
+                if shm is None or shm.name != shm_name:
+                    if shm is not None:
+                        shm.close()  # the parent grew the buffer and unlinked the old one
+                    shm = SharedMemory(name=shm_name)
+                result = STAGE_BATCH_FNS[name](models[name], _read_images(shm, layout))
+        except Exception as exc:
+            conn.send((False, _picklable(exc)))
+        else:
+            conn.send((True, result))
+
+
+class _Worker:
+    """One worker process, its pipe and its shared-memory buffer."""
+
+    def __init__(
+        self,
+        ctx: Any,
+        build: Callable[[], dict[str, Any]],
+        initializer: Callable[[int, int], None] | None,
+        index: int,
+        workers: int,
+    ) -> None:
+        self._ctx = ctx
+        self._args = (build, initializer, index, workers)
+        self._name = f"lensforge-inference-{index}"
+        self._shm: SharedMemory | None = None
+        self.restarts = 0
+        self._start()
+
+    def _start(self) -> None:
+        self.conn, child_conn = self._ctx.Pipe()
+        self.process = self._ctx.Process(
+            target=_worker_main, args=(child_conn, *self._args), name=self._name, daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def call(self, name: str, images: list[Image.Image]) -> list[Any]:
+        needed = sum(image.size[0] * image.size[1] * 3 for image in images)
+        if self._shm is None or self._shm.size < needed:
+            self._replace_shm(max(needed, MIN_SHM_BYTES))
+        assert self._shm is not None
+        layout = _write_images(self._shm, images)
+        self.send(("infer", (self._shm.name, name, layout)))
+        return self.receive()  # type: ignore[no-any-return]
+
+    def send(self, message: object) -> None:
+        try:
+            self.conn.send(message)
+        except OSError as exc:
+            self._crashed(exc)
+
+    def receive(self) -> Any:
+        try:
+            while not self.conn.poll(POLL_INTERVAL):
+                if not self.process.is_alive():
+                    raise EOFError
+            ok, result = self.conn.recv()
+        except (EOFError, OSError) as exc:
+            self._crashed(exc)
+        if not ok:
+            raise result
+        return result
+
+    def _crashed(self, exc: BaseException) -> None:
+        self.process.join(timeout=1)
+        exitcode = self.process.exitcode
+        logger.error(
+            "%s (pid %s) died with exit code %s; respawning", self._name, self.process.pid, exitcode
+        )
+        self.restart()
+        raise WorkerCrashedError(f"Inference worker died (exit code {exitcode})") from exc
+
+    def restart(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self.restarts += 1
+        self._start()
+
+    def _replace_shm(self, size: int) -> None:
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+        self._shm = SharedMemory(create=True, size=size)
+
+    def close(self, timeout: float = 5.0) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+class InferencePool:
+    """Pool of worker processes hosting the model stages named in ``models``.
+
+    ``build`` runs once in every worker and returns ``{stage: component}``;
+    it must be picklable (a module-level function or a ``functools.partial``
+    of one), since workers are spawned rather than forked. ``initializer``, if
+    given, runs first with the worker's index and the pool size (e.g. to pin
+    CPUs and size thread pools). A call takes the
+    next idle worker, so up to ``workers`` calls run in parallel. A worker
+    that dies mid-call fails that call with ``WorkerCrashedError`` and is
+    respawned.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[], dict[str, Any]],
+        models: Iterable[str],
+        workers: int = 2,
+        start_method: str = "spawn",
+        initializer: Callable[[int, int], None] | None = None,
+    ) -> None:
+        self.models = frozenset(models)
+        unknown = self.models - STAGE_BATCH_FNS.keys()
+        if unknown:
+            raise ValueError(f"Unknown pool models: {sorted(unknown)}")
+        ctx = mp.get_context(start_method)
+        workers = max(1, workers)
+        self._workers = [_Worker(ctx, build, initializer, i, workers) for i in range(workers)]
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    @property
+    def size(self) -> int:
+        return len(self._workers)
+
+    @property
+    def restarts(self) -> int:
+        return sum(worker.restarts for worker in self._workers)
+
+    def call(self, name: str, images: list[Image.Image]) -> list[Any]:
+        """Run stage ``name`` over ``images`` in the next idle worker."""
+        if not images:
+            return []
+        worker = self._idle.get()
+        try:
+            return worker.call(name, images)
+        finally:
+            self._idle.put(worker)
+
+    def warm_up(self, runs: int, batch_sizes: list[int]) -> None:
+        """Run warmup passes in every worker at once."""
+        workers = [self._idle.get() for _ in self._workers]
+        errors: list[Exception] = []
+        try:
+            sent = []
+            for worker in workers:
+                try:
+                    worker.send(("warmup", (runs, batch_sizes)))
+                    sent.append(worker)
+                except WorkerCrashedError as exc:
+                    errors.append(exc)
+            for worker in sent:  # drain every reply so no worker is left mid-call
+                try:
+                    worker.receive()
+                except Exception as exc:
+                    errors.append(exc)
+        finally:
+            for worker in workers:
+                self._idle.put(worker)
+        if errors:
+            raise errors[0]
+
+    def close(self) -> None:
+        for worker in self._workers:
+            worker.close()
+
+
+class _Pooled:
+    def __init__(self, pool: InferencePool, stage: str, local: Any) -> None:
+        self._pool = pool
+        self._stage = stage
+        self._local = local  # same component, never called here; provides the version
+
+    @property
+    def version(self) -> str:
+        return self._local.version  # type: ignore[no-any-return]
+
+
+class PooledQualityChecker(_Pooled):
+    """IQualityChecker running in the inference pool."""
+
+    def __init__(self, pool: InferencePool, local: IQualityChecker) -> None:
+        super().__init__(pool, "quality", local)
+
+    def check(self, image: Image.Image) -> QualityResult:
+        return self.check_batch([image])[0]
+
+    def check_batch(self, images: list[Image.Image]) -> list[QualityResult]:
+        return self._pool.call(self._stage, images)
+
+
+class PooledNsfwDetector(_Pooled):
+    """INsfwDetector running in the inference pool."""
+
+    def __init__(self, pool: InferencePool, local: INsfwDetector) -> None:
+        super().__init__(pool, "nsfw", local)
+
+    def detect(self, image: Image.Image) -> NsfwResult:
+        return self.detect_batch([image])[0]
+
+    def detect_batch(self, images: list[Image.Image]) -> list[NsfwResult]:
+        return self._pool.call(self._stage, images)
+
+
+class PooledDomainClassifier(_Pooled):
+    """IDomainClassifier running in the inference pool."""
+
+    def __init__(self, pool: InferencePool, local: IDomainClassifier) -> None:
+        super().__init__(pool, "classifier", local)
+
+    def classify(self, image: Image.Image) -> ClassificationResult:
+        return self.classify_batch([image])[0]
+
+    def classify_batch(self, images: list[Image.Image]) -> list[ClassificationResult]:
+        return self._pool.call(self._stage, images)
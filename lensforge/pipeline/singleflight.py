@@ -0,0 +1,63 @@
+"""Coalescing of concurrent identical analyses (singleflight)."""
+
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Lets one caller per key do the work while concurrent callers wait for it.
+
+    ``coalesced`` counts callers that were served by another caller's work.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[str, Future[T]] = {}
+        self._coalesced = 0
+
+    @property
+    def coalesced(self) -> int:
+        return self._coalesced
+
+    def acquire(self, key: str) -> tuple[Future[T], bool]:
+        """Return the in-flight future for ``key`` and whether the caller leads it.
+
+        A leader must resolve the future and then call ``release``.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._coalesced += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def record_coalesced(self, count: int) -> None:
+        """Count callers deduplicated outside ``acquire`` (e.g. within one batch)."""
+        with self._lock:
+            self._coalesced += count
+
+    def do(self, key: str, fn: Callable[[], T]) -> tuple[T, bool]:
+        """Run ``fn`` unless a call for ``key`` is in flight; returns (result, shared)."""
+        future, leader = self.acquire(key)
+        if not leader:
+            return future.result(), True
+        try:
+            result = fn()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self.release(key)
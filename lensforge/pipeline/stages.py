@@ -0,0 +1,557 @@
+"""Declarative stage graph for AnalysisPipeline.
+
+A stage wraps one component (quality checker, NSFW detector, classifier or
+an extension implementing one of those protocols) and declares:
+
+- ``after`` — stages that must have passed an image before this one sees it;
+- ``cost`` — relative cost; among stages that are ready, gates run before
+  non-gates and cheaper gates run first;
+- ``reject_status`` — the response status when the stage rejects an image
+  (gates only; the classifier stage never rejects).
+
+Images rejected by a gate are dropped from every later stage. When several
+gates reject the same image (they ran concurrently), the one that comes
+first in ``StageGraph.order`` decides the response. Exactly one classifier
+stage produces the successful response. Each stage keeps its own call,
+timing and rejection counters (``StageGraph.stats``).
+
+With ``adaptive=True`` the gates are reordered at run time by their recent
+latency per image over their recent rejection rate (cheap, selective gates
+first), within the dependency constraints. The response for an image stays
+the one the fixed order gives: a gate that comes earlier in ``order`` than
+the gate that rejected an image still runs on it, and wins if it rejects too.
+"""
+
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from contextvars import copy_context
+from dataclasses import dataclass, field, replace
+from typing import Any, Literal
+
+from PIL import Image
+from pydantic import BaseModel
+
+from lensforge.interfaces.domain_classifier import classify_batch
+from lensforge.interfaces.nsfw_detector import detect_batch
+from lensforge.interfaces.quality_checker import check_batch
+from lensforge.metrics import STAGE_IMAGES, STAGE_SECONDS
+from lensforge.tracing import span
+
+
+@dataclass(frozen=True)
+class StageKind:
+    """How the pipeline drives components implementing one protocol."""
+
+    method: str  # single-image method
+    batch: Callable[[Any, list[Image.Image]], list[Any]]
+    rejects: Callable[[Any], bool] | None  # None: never rejects
+    reject_status: str | None
+    version_key: str  # model_versions key of the built-in component
+
+
+STAGE_KINDS: dict[str, StageKind] = {
+    "quality": StageKind(
+        "check", check_batch, lambda r: not r.is_acceptable, "rejected_quality", "nn1_quality"
+    ),
+    "nsfw": StageKind(
+        "detect", detect_batch, lambda r: not r.is_safe, "rejected_nsfw", "nn1_safety"
+    ),
+    "classifier": StageKind("classify", classify_batch, None, None, "nn2"),
+}
+
+
+class StageSpec(BaseModel):
+    """One stage of the ``PIPELINE_STAGES`` setting.
+
+    Without ``class_path`` the stage uses the container's component of that
+    kind (``QUALITY_CLASS``, ``NSFW_CLASS``, ``CLASSIFIER_CLASS``, with
+    micro-batching or the inference pool applied). With ``class_path`` it
+    instantiates that class with ``options`` as keyword arguments.
+    """
+
+    name: str
+    kind: Literal["quality", "nsfw", "classifier"]
+    class_path: str | None = None
+    options: dict[str, Any] = {}
+    after: list[str] = []
+    cost: float = 1.0
+    reject_status: str | None = None
+
+
+# The NSFW gate does not depend on quality: cost already puts quality first in
+# the fixed order, whose earliest rejection decides, and adaptive ordering may
+# then move NSFW ahead when it rejects more per millisecond.
+DEFAULT_STAGES = [
+    StageSpec(name="quality", kind="quality", cost=1.0),
+    StageSpec(name="nsfw", kind="nsfw", cost=10.0),
+    StageSpec(name="classifier", kind="classifier", after=["quality"], cost=10.0),
+]
+
+
+# Weight of the latest call in the recent latency / rejection-rate averages.
+RECENT_WEIGHT = 0.05
+
+
+@dataclass(frozen=True)
+class StageStats:
+    """Counters of one stage since startup, plus exponentially weighted recent rates."""
+
+    calls: int = 0
+    images: int = 0
+    rejected: int = 0
+    seconds: float = 0.0
+    recent_ms_per_image: float = 0.0
+    recent_reject_rate: float = 0.0
+
+    @property
+    def ms_per_image(self) -> float:
+        return self.seconds * 1000 / self.images if self.images else 0.0
+
+    @property
+    def reject_rate(self) -> float:
+        return self.rejected / self.images if self.images else 0.0
+
+
+class Stage:
+    """One node of the stage graph."""
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        component: Any,
+        after: Iterable[str] = (),
+        cost: float = 1.0,
+        reject_status: str | None = None,
+        version_key: str | None = None,
+    ) -> None:
+        if kind not in STAGE_KINDS:
+            raise ValueError(f"Unknown stage kind {kind!r} for stage {name!r}")
+        self.name = name
+        self.kind = kind
+        self.component = component
+        self.after = tuple(after)
+        self.cost = cost
+        self._kind = STAGE_KINDS[kind]
+        self.reject_status = reject_status or self._kind.reject_status
+        self.version_key = version_key or name
+        self.load_seconds: float | None = None  # set by warmup.load_stage_models
+        self._stats = StageStats()
+        self._lock = threading.Lock()
+        self._seconds = STAGE_SECONDS.labels(name)
+        self._images = STAGE_IMAGES.labels(name)
+        self._span_name = f"stage.{name}"
+        self._model_attributes = {"model.class": type(component).__name__}
+
+    @property
+    def is_gate(self) -> bool:
+        return self._kind.rejects is not None
+
+    @property
+    def version(self) -> str:
+        return self.component.version  # type: ignore[no-any-return]
+
+    @property
+    def stats(self) -> StageStats:
+        return self._stats
+
+    def call(self, images: list[Image.Image], batched: bool = True) -> list[Any]:
+        """Run the component: its single-image method unless ``batched``."""
+        single = not batched and len(images) == 1
+        method = self._kind.method if single else f"{self._kind.method}_batch"
+        with span(f"{self.kind}.{method}", self._model_attributes) as model_span:
+            if model_span.is_recording():
+                model_span.set_attribute("model.version", self.version)
+            if single:
+                return [getattr(self.component, self._kind.method)(images[0])]
+            return self._kind.batch(self.component, images)
+
+    def run(self, images: list[Image.Image], batched: bool = True) -> tuple[list[Any], float]:
+        """``call`` and record its timing; returns the results and the seconds taken."""
+        start = time.perf_counter()
+        with span(self._span_name, {"stage.kind": self.kind, "batch.size": len(images)}):
+            results = self.call(images, batched)
+        elapsed = time.perf_counter() - start
+        self._seconds.observe(elapsed)
+        self._images.inc(len(images))
+        ms_per_image = elapsed * 1000 / max(1, len(images))
+        with self._lock:
+            s = self._stats
+            self._stats = replace(
+                s,
+                calls=s.calls + 1,
+                images=s.images + len(images),
+                seconds=s.seconds + elapsed,
+                recent_ms_per_image=_recent(s.recent_ms_per_image, ms_per_image, s.calls),
+            )
+        return results, elapsed
+
+    def rejects(self, result: Any) -> bool:
+        return self._kind.rejects is not None and self._kind.rejects(result)
+
+    def record_rejections(self, rejected: int, images: int) -> None:
+        """Record that ``rejected`` of the ``images`` in the last call were rejected."""
+        rate = rejected / max(1, images)
+        with self._lock:
+            s = self._stats
+            self._stats = replace(
+                s,
+                rejected=s.rejected + rejected,
+                recent_reject_rate=_recent(s.recent_reject_rate, rate, s.calls - 1),
+            )
+
+
+def _recent(average: float, value: float, previous_calls: int) -> float:
+    if previous_calls <= 0:
+        return value
+    return average + RECENT_WEIGHT * (value - average)
+
+
+@dataclass(frozen=True)
+class Outcome:
+    """What the graph decided for one image."""
+
+    rejected_by: Stage | None
+    result: Any  # the rejecting gate's result, or the classification
+    # Milliseconds of the stage call that processed the image, per stage that ran on it.
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+class StageGraph:
+    """Validated stage graph and its executor.
+
+    ``stages`` keeps the declared order; ``order`` is the fixed execution
+    order (dependencies first, then gates before non-gates, then by cost).
+    With ``adaptive``, ``current_order()`` reorders the gates once each has
+    seen ``min_images`` images.
+    """
+
+    def __init__(self, stages: list[Stage], adaptive: bool = False, min_images: int = 100) -> None:
+        names = [stage.name for stage in stages]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate stage names: {duplicates}")
+        classifiers = [stage for stage in stages if not stage.is_gate]
+        if len(classifiers) != 1:
+            raise ValueError("The stage graph needs exactly one classifier stage")
+        for stage in stages:
+            missing = set(stage.after) - set(names)
+            if missing:
+                raise ValueError(
+                    f"Stage {stage.name!r} depends on unknown stages {sorted(missing)}"
+                )
+            if classifiers[0].name in stage.after:
+                raise ValueError(f"Stage {stage.name!r} cannot run after the classifier stage")
+        versions = [stage.version_key for stage in stages]
+        if len(set(versions)) != len(versions):
+            raise ValueError("Stages must have distinct version keys")
+        self.stages = list(stages)
+        self.result_stage = classifiers[0]
+        self.order = self._sort(self.stages, lambda s: s.cost)
+        self._rank = {stage.name: i for i, stage in enumerate(self.order)}
+        self.adaptive = adaptive
+        self.min_images = min_images
+
+    @classmethod
+    def default(cls, quality: Any, safety: Any, classifier: Any) -> "StageGraph":
+        """The built-in quality → NSFW → classifier graph."""
+        return cls.from_specs(
+            DEFAULT_STAGES, {"quality": quality, "nsfw": safety, "classifier": classifier}
+        )
+
+    @classmethod
+    def from_specs(
+        cls, specs: Iterable[StageSpec], components: dict[str, Any], **kwargs: Any
+    ) -> "StageGraph":
+        """Build from specs; ``components`` maps a stage name (or, for stages
+        without ``class_path``, its kind) to the component instance."""
+        stages = []
+        for spec in specs:
+            builtin = spec.class_path is None
+            stages.append(
+                Stage(
+                    spec.name,
+                    spec.kind,
+                    components[spec.kind if builtin else spec.name],
+                    after=spec.after,
+                    cost=spec.cost,
+                    reject_status=spec.reject_status,
+                    version_key=STAGE_KINDS[spec.kind].version_key if builtin else spec.name,
+                )
+            )
+        return cls(stages, **kwargs)
+
+    @staticmethod
+    def _sort(stages: list[Stage], cost: Callable[[Stage], float]) -> list[Stage]:
+        order: list[Stage] = []
+        done: set[str] = set()
+        remaining = list(stages)
+        while remaining:
+            ready = [stage for stage in remaining if set(stage.after) <= done]
+            if not ready:
+                cycle = sorted(stage.name for stage in remaining)
+                raise ValueError(f"Stage dependencies form a cycle: {cycle}")
+            stage = min(ready, key=lambda s: (not s.is_gate, cost(s)))
+            order.append(stage)
+            done.add(stage.name)
+            remaining.remove(stage)
+        return order
+
+    def versions(self) -> dict[str, str]:
+        return {stage.version_key: stage.version for stage in self.stages}
+
+    def stats(self) -> dict[str, StageStats]:
+        return {stage.name: stage.stats for stage in self.order}
+
+    def current_order(self) -> list[Stage]:
+        """The order the next sequential run uses.
+
+        Adaptive ordering puts gates with the lowest expected cost per
+        rejection (recent ms per image / recent rejection rate) first, which
+        minimizes the expected cost per image for independent gates. Until
+        every gate has seen ``min_images`` images the fixed order is used.
+        """
+        if not self.adaptive:
+            return self.order
+        gates = [stage.stats for stage in self.order if stage.is_gate]
+        if any(stats.images < self.min_images for stats in gates):
+            return self.order
+        return self._sort(self.order, _cost_per_rejection)
+
+    def describe(self) -> dict[str, Any]:
+        """Ordering and per-stage statistics, for inspection."""
+        return {
+            "adaptive": self.adaptive,
+            "fixed_order": [stage.name for stage in self.order],
+            "current_order": [stage.name for stage in self.current_order()],
+            "stages": {
+                stage.name: {
+                    "kind": stage.kind,
+                    "after": list(stage.after),
+                    "cost": stage.cost,
+                    "calls": stage.stats.calls,
+                    "images": stage.stats.images,
+                    "rejected": stage.stats.rejected,
+                    "ms_per_image": round(stage.stats.ms_per_image, 3),
+                    "reject_rate": round(stage.stats.reject_rate, 4),
+                    "recent_ms_per_image": round(stage.stats.recent_ms_per_image, 3),
+                    "recent_reject_rate": round(stage.stats.recent_reject_rate, 4),
+                }
+                for stage in self.order
+            },
+        }
+
+    def run(
+        self,
+        images: list[Image.Image],
+        batched: bool = True,
+        executor: Executor | None = None,
+    ) -> list[Outcome]:
+        """Run the stages over ``images``.
+
+        Without an executor the stages run one at a time in
+        ``current_order()``. With one, each stage starts as soon as its own
+        dependencies are done: the earliest in ``order`` that is not yet
+        running on the calling thread, the others on the executor. A stage
+        whose images have all been rejected by gates earlier in ``order`` is
+        cancelled (or, if already running, ignored). Either way a gate runs on
+        the images it could still decide, so the outcomes match the sequential run.
+        """
+        if executor is None:
+            return self._run_sequential(images, batched)
+        state = _RunState(len(images))
+        remaining = list(self.order)
+        pending: dict[Stage, tuple[list[int], Future[tuple[list[Any], float]]]] = {}
+        try:
+            while remaining or pending:
+                for stage, (targets, future) in list(pending.items()):
+                    if future.done():
+                        del pending[stage]
+                        self._apply(stage, targets, *future.result(), state)
+                self._drop_decided(pending, state)
+                ready = self._start_ready(remaining, state)
+                inline = self._pick_inline(ready, pending)
+                for stage, targets in ready:
+                    if inline is None or stage is not inline[0]:
+                        # Own context copy, so the stage's spans nest under this one.
+                        future = executor.submit(
+                            copy_context().run, stage.run, [images[i] for i in targets], batched
+                        )
+                        pending[stage] = (targets, future)
+                if inline is not None:
+                    stage, targets = inline
+                    results, seconds = stage.run([images[i] for i in targets], batched)
+                    self._apply(stage, targets, results, seconds, state)
+                elif pending:
+                    wait([future for _, future in pending.values()], return_when=FIRST_COMPLETED)
+        except BaseException:
+            _discard(future for _, future in pending.values())
+            raise
+        return state.outcomes()
+
+    def _start_ready(
+        self, remaining: list[Stage], state: "_RunState"
+    ) -> list[tuple[Stage, list[int]]]:
+        """Take the stages whose dependencies are done out of ``remaining``, with their targets.
+
+        A stage left without targets is done at once (nothing passed it), which
+        may make further stages ready.
+        """
+        ready: list[tuple[Stage, list[int]]] = []
+        progressed = True
+        while progressed:
+            progressed = False
+            for stage in [s for s in remaining if set(s.after) <= set(state.passed)]:
+                remaining.remove(stage)
+                targets = self._targets(stage, state.count, state.passed, state.rejections)
+                if targets:
+                    ready.append((stage, targets))
+                else:
+                    state.passed[stage.name] = set()
+                    progressed = True
+        return ready
+
+    def _pick_inline(
+        self,
+        ready: list[tuple[Stage, list[int]]],
+        pending: dict[Stage, tuple[list[int], Future[tuple[list[Any], float]]]],
+    ) -> tuple[Stage, list[int]] | None:
+        """The stage the calling thread runs next: the earliest in ``order`` among
+        the newly ready ones and those still queued on the executor (taken back)."""
+        queued = [
+            (stage, targets) for stage, (targets, future) in pending.items() if not future.done()
+        ]
+        for stage, targets in sorted(ready + queued, key=lambda entry: self._rank[entry[0].name]):
+            if stage not in pending:
+                return stage, targets
+            if pending[stage][1].cancel():
+                del pending[stage]
+                return stage, targets
+        return None
+
+    def _drop_decided(
+        self,
+        pending: dict[Stage, tuple[list[int], Future[tuple[list[Any], float]]]],
+        state: "_RunState",
+    ) -> None:
+        """Discard running or queued stages that can no longer change any outcome."""
+        for stage, (targets, future) in list(pending.items()):
+            if not any(self._may_decide(stage, state.rejections.get(i)) for i in targets):
+                del pending[stage]
+                _discard([future])
+                state.passed[stage.name] = set()
+
+    def _apply(
+        self,
+        stage: Stage,
+        targets: list[int],
+        results: list[Any],
+        seconds: float,
+        state: "_RunState",
+    ) -> None:
+        """Record a finished stage's results; the earliest rejection in ``order`` wins."""
+        _record_timing(state.timings, targets, stage, seconds)
+        passed = state.passed[stage.name] = set()
+        if stage is self.result_stage:
+            state.classified.update(zip(targets, results))
+            return
+        rejected = 0
+        for i, result in zip(targets, results):
+            if not stage.rejects(result):
+                passed.add(i)
+                continue
+            rejected += 1
+            current = state.rejections.get(i)
+            if current is None or self._rank[stage.name] < self._rank[current[0].name]:
+                state.rejections[i] = (stage, result)
+        stage.record_rejections(rejected, len(targets))
+
+    def _run_sequential(self, images: list[Image.Image], batched: bool) -> list[Outcome]:
+        """One stage at a time; with adaptive ordering, keeps fixed-order responses.
+
+        A gate runs on an image whose dependencies it passed, unless a gate
+        earlier in the fixed order already rejected it. So when a gate
+        reordered to the front rejects an image, gates that precede it in the
+        fixed order still run on that image, and the earliest rejection wins.
+        """
+        state = _RunState(len(images))
+        for stage in self.current_order():
+            targets = self._targets(stage, state.count, state.passed, state.rejections)
+            if not targets:
+                state.passed[stage.name] = set()
+                continue
+            results, seconds = stage.run([images[i] for i in targets], batched)
+            self._apply(stage, targets, results, seconds, state)
+        return state.outcomes()
+
+    def _targets(
+        self,
+        stage: Stage,
+        count: int,
+        passed: dict[str, set[int]],
+        rejections: dict[int, tuple[Stage, Any]],
+    ) -> list[int]:
+        """Images that passed ``stage``'s dependencies and whose outcome it can still change."""
+        return [
+            i
+            for i in range(count)
+            if all(i in passed[dep] for dep in stage.after)
+            and self._may_decide(stage, rejections.get(i))
+        ]
+
+    def _may_decide(self, stage: Stage, rejection: tuple[Stage, Any] | None) -> bool:
+        if rejection is None:
+            return True
+        return stage.is_gate and self._rank[stage.name] < self._rank[rejection[0].name]
+
+
+@dataclass
+class _RunState:
+    """Per-run bookkeeping: images each finished stage passed, rejections, results."""
+
+    count: int
+    passed: dict[str, set[int]] = field(default_factory=dict)
+    rejections: dict[int, tuple[Stage, Any]] = field(default_factory=dict)
+    classified: dict[int, Any] = field(default_factory=dict)
+    timings: list[dict[str, float]] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.timings = [{} for _ in range(self.count)]
+
+    def outcomes(self) -> list[Outcome]:
+        return _outcomes(self.count, self.rejections, self.classified, self.timings)
+
+
+def _record_timing(
+    timings: list[dict[str, float]], targets: list[int], stage: Stage, seconds: float
+) -> None:
+    ms = round(seconds * 1000, 3)
+    for i in targets:
+        timings[i][stage.name] = ms
+
+
+def _outcomes(
+    count: int,
+    rejections: dict[int, tuple[Stage, Any]],
+    classified: dict[int, Any],
+    timings: list[dict[str, float]],
+) -> list[Outcome]:
+    return [
+        Outcome(*rejections[i], timings[i])
+        if i in rejections
+        else Outcome(None, classified[i], timings[i])
+        for i in range(count)
+    ]
+
+
+def _cost_per_rejection(stage: Stage) -> float:
+    stats = stage.stats
+    return stats.recent_ms_per_image / max(stats.recent_reject_rate, 1e-6)
+
+
+def _discard(futures: Iterable[Future[Any]]) -> None:
+    """Drop speculative results: cancel what hasn't started, ignore the rest."""
+    for future in futures:
+        future.cancel()
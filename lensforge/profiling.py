@@ -0,0 +1,173 @@
+"""Sampled request profiling for diagnosing hot paths in production.
+
+``RequestProfiler.profile`` wraps one analysis. Two independent triggers
+write a profile to ``directory``:
+
+- every ``sample_every``-th analysis runs under ``cProfile``; the pstats
+  dump (``*.prof``) opens with ``python -m pstats`` or snakeviz;
+- with ``slow_ms``, a background thread samples the stack of every thread
+  running an analysis each ``interval_ms``; analyses slower than ``slow_ms``
+  are written as collapsed stacks (``*.folded``, one ``frame;frame;... count``
+  line per stack) that flamegraph.pl or speedscope render.
+
+Both only see the thread that called the pipeline: stages running on the
+parallel stage executor, the micro-batcher or inference workers show up as
+the wait for their result. At most ``max_files`` profiles are written per
+process.
+"""
+
+import cProfile
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from types import FrameType
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 128
+
+
+class RequestProfiler:
+    """Profiles one in ``sample_every`` analyses and keeps the stacks of slow ones."""
+
+    def __init__(
+        self,
+        directory: str | Path,
+        sample_every: int = 0,
+        slow_ms: float = 0.0,
+        interval_ms: float = 5.0,
+        max_files: int = 100,
+    ) -> None:
+        self._dir = Path(directory)
+        self._sample_every = max(0, sample_every)
+        self._slow_ms = max(0.0, slow_ms)
+        self._max_files = max_files
+        self._seq = itertools.count(1)
+        self._written = 0
+        self._write_lock = threading.Lock()
+        # Only one cProfile can be active per process on Python 3.12+.
+        self._cprofile_lock = threading.Lock()
+        self._sampler = _StackSampler(interval_ms / 1000) if self._slow_ms else None
+
+    @property
+    def written(self) -> int:
+        """Profiles written by this process."""
+        return self._written
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        seq = next(self._seq)
+        if self._sample_every and seq % self._sample_every == 0:
+            if self._cprofile_lock.acquire(blocking=False):
+                try:
+                    with self._cprofile(name, seq):
+                        yield
+                finally:
+                    self._cprofile_lock.release()
+                return
+        if self._sampler is None:
+            yield
+            return
+        with self._sampled(name, seq):
+            yield
+
+    @contextmanager
+    def _cprofile(self, name: str, seq: int) -> Iterator[None]:
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            path = self._reserve(name, seq, elapsed_ms, "prof")
+            if path is not None:
+                profiler.dump_stats(path)
+
+    @contextmanager
+    def _sampled(self, name: str, seq: int) -> Iterator[None]:
+        assert self._sampler is not None
+        ident = threading.get_ident()
+        stacks = self._sampler.track(ident)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._sampler.untrack(ident)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms >= self._slow_ms and stacks:
+                path = self._reserve(name, seq, elapsed_ms, "folded")
+                if path is not None:
+                    lines = (f"{stack} {count}\n" for stack, count in stacks.most_common())
+                    path.write_text("".join(lines))
+
+    def _reserve(self, name: str, seq: int, elapsed_ms: float, suffix: str) -> Path | None:
+        """Path for the next profile, or None once ``max_files`` have been written."""
+        with self._write_lock:
+            if self._written >= self._max_files:
+                return None
+            self._written += 1
+            if self._written == self._max_files:
+                logger.warning(
+                    "Wrote %d profiles to %s; not writing more", self._written, self._dir
+                )
+        self._dir.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        return self._dir / f"{stamp}-{os.getpid()}-{seq}-{name}-{elapsed_ms:.0f}ms.{suffix}"
+
+
+class _StackSampler:
+    """Daemon thread counting the stacks of tracked threads every ``interval`` seconds."""
+
+    def __init__(self, interval: float) -> None:
+        self._interval = max(0.001, interval)
+        self._tracked: dict[int, Counter[str]] = {}
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+
+    def track(self, ident: int) -> Counter[str]:
+        stacks: Counter[str] = Counter()
+        with self._cond:
+            self._tracked[ident] = stacks
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="lensforge-profiler", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+        return stacks
+
+    def untrack(self, ident: int) -> None:
+        with self._cond:
+            self._tracked.pop(ident, None)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._tracked:
+                    self._cond.wait()
+                # Under the lock, so an untracked thread's counter is final.
+                frames = sys._current_frames()
+                for ident, stacks in self._tracked.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        stacks[_collapse(frame)] += 1
+                del frames
+            time.sleep(self._interval)
+
+
+def _collapse(frame: FrameType | None) -> str:
+    names: list[str] = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
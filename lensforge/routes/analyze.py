@@ -1,60 +1,314 @@
-"""Analysis endpoints: POST /analyze and POST /batch-analyze."""
+"""Analysis endpoints: POST /analyze and POST /batch-analyze.
+
+Besides JSON bodies, images can be posted without base64: ``/analyze/raw`` takes
+the encoded image as the request body and the ``/upload`` variants take
+``multipart/form-data`` parts.
+
+Sending ``X-Stage-Timings: true`` (or ``false``) overrides the
+``STAGE_TIMINGS`` setting for that request.
+"""
+
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any
 
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
 
-from lensforge.schemas.request import AnalyzeRequest, BatchAnalyzeRequest
+from lensforge.metrics import record_result
+from lensforge.pipeline.analysis_pipeline import AnalysisPipeline
+from lensforge.schemas.request import MAX_BATCH_IMAGES, AnalyzeRequest, BatchAnalyzeRequest
 from lensforge.schemas.response import AnalyzeResponse, BatchAnalyzeResponse
 
+if TYPE_CHECKING:
+    from lensforge.loaders.image_loader import ImageLoader
+
 router = APIRouter()
 
+RAW_CONTENT_TYPES = {"application/octet-stream", "image/jpeg", "image/png", "image/webp"}
+STAGE_TIMINGS_HEADER = "x-stage-timings"
+# Multipart bytes allowed per upload besides the image itself (boundary, part headers).
+MULTIPART_PART_OVERHEAD = 16 * 1024
 
-def _get_pipeline(request: Request):
+
+def _get_pipeline(request: Request) -> AnalysisPipeline:
     return request.app.state.container.analysis_pipeline()
 
 
-def _get_loader(request: Request):
+def _get_loader(request: Request) -> "ImageLoader":
     return request.app.state.container.image_loader()
 
 
+def _stage_timings(request: Request) -> bool | None:
+    """The ``X-Stage-Timings`` header as a bool, or None (pipeline default) if absent."""
+    value = request.headers.get(STAGE_TIMINGS_HEADER)
+    if value is None:
+        return None
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _upload_body(field: str, max_files: int) -> dict[str, Any]:
+    """OpenAPI request body of an upload route, whose form the handler parses itself."""
+    binary = {"type": "string", "format": "binary"}
+    schema = {"type": "array", "items": binary, "maxItems": max_files} if max_files > 1 else binary
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {field: schema},
+                        "required": [field],
+                    }
+                }
+            },
+        }
+    }
+
+
 @router.post("/analyze", response_model=AnalyzeResponse)
 def analyze(req: AnalyzeRequest, request: Request) -> AnalyzeResponse:
     """Analyze a single image."""
     pipeline = _get_pipeline(request)
     loader = _get_loader(request)
 
-    try:
+    def load() -> Image.Image:
         if req.image_base64:
-            image = loader.load_base64(req.image_base64)
-        elif req.image_url:
-            image = loader.load_url(req.image_url)
-        else:
-            raise HTTPException(status_code=400, detail="No image provided")
+            return loader.load_base64(req.image_base64)
+        if req.image_url:
+            return loader.load_url(req.image_url)
+        raise ValueError("No image provided")
+
+    return _analyze_one(pipeline, load, _stage_timings(request))
+
+
+@router.post("/analyze/raw", response_model=AnalyzeResponse)
+async def analyze_raw(request: Request) -> AnalyzeResponse:
+    """Analyze a single image sent as the raw request body.
+
+    The body is streamed under the loader's download limits, so oversized
+    uploads are refused without being read into memory.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in RAW_CONTENT_TYPES:
+        raise HTTPException(status_code=415, detail=f"Unsupported content type: {content_type}")
+
+    pipeline = _get_pipeline(request)
+    loader = _get_loader(request)
+    try:
+        body = await loader.aread_stream(request.stream(), request.headers)
     except ValueError as exc:
+        record_result("error")
         raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return await run_in_threadpool(
+        _analyze_one, pipeline, lambda: loader.load_bytes(body), _stage_timings(request)
+    )
 
-    return pipeline.analyze(image)
+
+@router.post(
+    "/analyze/upload", response_model=AnalyzeResponse, openapi_extra=_upload_body("file", 1)
+)
+async def analyze_upload(request: Request) -> AnalyzeResponse:
+    """Analyze a single image sent as a multipart/form-data part named ``file``."""
+    pipeline = _get_pipeline(request)
+    loader = _get_loader(request)
+    async with _uploads(request, loader, "file", max_files=1) as files:
+        if not files:
+            raise HTTPException(status_code=422, detail="Missing multipart part: file")
+        file = files[0].file
+        return await run_in_threadpool(
+            _analyze_one, pipeline, lambda: loader.load_file(file), _stage_timings(request)
+        )
 
 
 @router.post("/batch-analyze", response_model=BatchAnalyzeResponse)
-def batch_analyze(req: BatchAnalyzeRequest, request: Request) -> BatchAnalyzeResponse:
-    """Analyze multiple images."""
+async def batch_analyze(req: BatchAnalyzeRequest, request: Request) -> BatchAnalyzeResponse:
+    """Analyze multiple images, running each pipeline stage once over the batch.
+
+    All URLs are downloaded concurrently before inference starts.
+    """
     pipeline = _get_pipeline(request)
     loader = _get_loader(request)
-    results: list[AnalyzeResponse] = []
+    urls = [item.image_url for item in req.images if not item.image_base64 and item.image_url]
+    downloads = iter(await loader.aload_urls(urls))
+
+    def load(item: AnalyzeRequest) -> Image.Image:
+        if item.image_base64:
+            return loader.load_base64(item.image_base64)
+        if item.image_url:
+            download = next(downloads)
+            if isinstance(download, ValueError):
+                raise download
+            return download
+        raise ValueError("No image provided")
+
+    loaders = [lambda item=item: load(item) for item in req.images]
+    return await run_in_threadpool(_analyze_many, pipeline, loaders, _stage_timings(request))
+
+
+@router.post(
+    "/batch-analyze/upload",
+    response_model=BatchAnalyzeResponse,
+    openapi_extra=_upload_body("files", MAX_BATCH_IMAGES),
+)
+async def batch_analyze_upload(request: Request) -> BatchAnalyzeResponse:
+    """Analyze multiple images sent as multipart/form-data parts named ``files``."""
+    pipeline = _get_pipeline(request)
+    loader = _get_loader(request)
+    async with _uploads(request, loader, "files", max_files=MAX_BATCH_IMAGES) as files:
+        if not files:
+            raise HTTPException(status_code=422, detail="Missing multipart parts: files")
+        if len(files) > MAX_BATCH_IMAGES:
+            raise HTTPException(
+                status_code=422, detail=f"At most {MAX_BATCH_IMAGES} images per batch"
+            )
+        loaders = [lambda f=f: loader.load_file(f.file) for f in files]
+        return await run_in_threadpool(_analyze_many, pipeline, loaders, _stage_timings(request))
+
 
-    for item in req.images:
+class _CappedMultiPartParser(MultiPartParser):
+    """Multipart parser that aborts once one file part passes ``max_file_bytes``."""
+
+    def __init__(self, *args: Any, max_file_bytes: int, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._max_file_bytes = max_file_bytes
+        self._file_bytes = 0
+
+    def on_part_begin(self) -> None:
+        super().on_part_begin()
+        self._file_bytes = 0
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._current_part.file is not None:
+            self._file_bytes += end - start
+            if self._file_bytes > self._max_file_bytes:
+                raise MultiPartException(f"Image too large (over {self._max_file_bytes} bytes)")
+        super().on_part_data(data, start, end)
+
+
+@asynccontextmanager
+async def _uploads(
+    request: Request, loader: "ImageLoader", field: str, max_files: int
+) -> AsyncIterator[list[UploadFile]]:
+    """The ``field`` file parts of a multipart body, streamed under the byte caps.
+
+    Like ``/analyze/raw``, the request is refused on Content-Length before any
+    chunk is read, and as soon as one part passes the loader's byte cap or the
+    body passes ``max_files`` such parts, so oversized uploads are never
+    spooled. The parts' files are closed on exit.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type != "multipart/form-data":
+        raise HTTPException(status_code=415, detail=f"Unsupported content type: {content_type}")
+    limit = max_files * (loader.max_download_bytes + MULTIPART_PART_OVERHEAD)
+
+    async def body() -> AsyncIterator[bytes]:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > limit:
+                raise MultiPartException(f"Request too large (over {limit} bytes)")
+            yield chunk
+
+    length = request.headers.get("content-length", "")
+    try:
+        if length.isdigit() and int(length) > limit:
+            raise MultiPartException(f"Request too large ({length} bytes, max={limit})")
+        parser = _CappedMultiPartParser(
+            request.headers, body(), max_file_bytes=loader.max_download_bytes
+        )
+        form = await parser.parse()
+    except MultiPartException as exc:
+        record_result("error")
+        raise HTTPException(status_code=400, detail=exc.message) from exc
+    try:
+        yield [item for item in form.getlist(field) if isinstance(item, UploadFile)]
+    finally:
+        await form.close()
+
+
+def _analyze_one(
+    pipeline: AnalysisPipeline,
+    load: Callable[[], Image.Image],
+    stage_timings: bool | None = None,
+) -> AnalyzeResponse:
+    start = time.perf_counter()
+    try:
+        image = load()
+    except ValueError as exc:
+        record_result("error")
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    load_ms = (time.perf_counter() - start) * 1000
+    try:
+        response = pipeline.analyze(image, stage_timings)
+    except Exception:
+        record_result("error")
+        raise
+    record_result(response.status)
+    return _with_load_timing(response, load_ms)
+
+
+def _analyze_many(
+    pipeline: AnalysisPipeline,
+    loaders: list[Callable[[], Image.Image]],
+    stage_timings: bool | None = None,
+) -> BatchAnalyzeResponse:
+    """Decode every item, then analyze the decodable ones as one batch.
+
+    Items that fail to decode are reported in place with ``status="error"``.
+    If the batch call raises ``ValueError``, the images are analyzed one at a
+    time so that only the offending ones are reported as errors.
+    """
+    results: list[AnalyzeResponse | None] = []
+    images: list[Image.Image] = []
+    load_ms: list[float] = []
+
+    for load in loaders:
+        start = time.perf_counter()
         try:
-            if item.image_base64:
-                image = loader.load_base64(item.image_base64)
-            elif item.image_url:
-                image = loader.load_url(item.image_url)
-            else:
-                results.append(
-                    AnalyzeResponse(status="error", reason="No image provided", disclaimer="")
-                )
-                continue
-            results.append(pipeline.analyze(image))
+            images.append(load())
+            results.append(None)
         except ValueError as exc:
             results.append(AnalyzeResponse(status="error", reason=str(exc), disclaimer=""))
+        else:
+            load_ms.append((time.perf_counter() - start) * 1000)
+
+    try:
+        try:
+            responses = pipeline.analyze_batch(images, stage_timings)
+        except ValueError:
+            # One image the models cannot handle fails the whole batch call.
+            responses = _analyze_each(pipeline, images, stage_timings)
+    except Exception:
+        record_result("error", len(loaders))
+        raise
+    analyzed = iter(map(_with_load_timing, responses, load_ms))
+    batch = [r if r is not None else next(analyzed) for r in results]
+    for response in batch:
+        record_result(response.status)
+    return BatchAnalyzeResponse(results=batch)
+
+
+def _analyze_each(
+    pipeline: AnalysisPipeline, images: list[Image.Image], stage_timings: bool | None
+) -> list[AnalyzeResponse]:
+    """Analyze one image at a time, reporting a ``ValueError`` in place as ``status="error"``."""
+    responses = []
+    for image in images:
+        try:
+            responses.append(pipeline.analyze(image, stage_timings))
+        except ValueError as exc:
+            responses.append(AnalyzeResponse(status="error", reason=str(exc), disclaimer=""))
+    return responses
+
 
-    return BatchAnalyzeResponse(results=results)
+def _with_load_timing(response: AnalyzeResponse, load_ms: float) -> AnalyzeResponse:
+    if response.stage_timings_ms is None:
+        return response
+    timings = {"load": round(load_ms, 3), **response.stage_timings_ms}
+    return response.model_copy(update={"stage_timings_ms": timings})
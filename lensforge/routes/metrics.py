@@ -0,0 +1,14 @@
+"""Prometheus scrape endpoint: GET /metrics."""
+
+from fastapi import APIRouter, Response
+
+from lensforge.metrics import render
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    """Metrics of this process, or of every worker in multiprocess mode."""
+    body, content_type = render()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,13 @@
+"""Pipeline inspection endpoint: GET /pipeline/stages."""
+
+from typing import Any
+
+from fastapi import APIRouter, Request
+
+router = APIRouter()
+
+
+@router.get("/pipeline/stages")
+def pipeline_stages(request: Request) -> dict[str, Any]:
+    """Stage order (fixed and current) and per-stage statistics of this worker process."""
+    return request.app.state.container.stage_graph().describe()  # type: ignore[no-any-return]
@@ -2,6 +2,8 @@
 
 from pydantic import BaseModel, Field, model_validator
 
+MAX_BATCH_IMAGES = 50
+
 
 class AnalyzeRequest(BaseModel):
     """Single image analysis request."""
@@ -19,4 +21,4 @@ class AnalyzeRequest(BaseModel):
 class BatchAnalyzeRequest(BaseModel):
     """Batch image analysis request."""
 
-    images: list[AnalyzeRequest] = Field(..., max_length=50)
+    images: list[AnalyzeRequest] = Field(..., max_length=MAX_BATCH_IMAGES)
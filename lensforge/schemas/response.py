@@ -14,7 +14,7 @@ class PredictionSchema(BaseModel):
 class AnalyzeResponse(BaseModel):
     """Analysis result for a single image."""
 
-    status: str  # success | rejected_quality | rejected_nsfw | error
+    status: str  # success | rejected_quality | rejected_nsfw | extension gate status | error
     reason: str | None = None
     lesion_detected: bool | None = None
     main_description: str | None = None
@@ -22,6 +22,8 @@ class AnalyzeResponse(BaseModel):
     urgency: str | None = None
     disclaimer: str = ""
     inference_time_ms: int = 0
+    # Per-stage milliseconds ("load" plus each stage that ran), when requested
+    stage_timings_ms: dict[str, float] | None = None
     model_versions: dict[str, str] = {}
 
 
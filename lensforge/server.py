@@ -0,0 +1,147 @@
+"""Multi-worker server that loads the models once and forks the workers.
+
+``uvicorn --workers N`` starts N independent processes, each loading its own
+copy of every model. Here the parent loads the weights, freezes the GC so
+collections don't touch the shared pages, binds the listening socket and
+then forks N uvicorn workers. The weights are shared copy-on-write, so an
+extra worker costs roughly its activation memory. The parent only
+supervises: it respawns workers that die and forwards SIGTERM/SIGINT.
+
+Usage: python -m lensforge.server [--workers N] [--host HOST] [--port PORT]
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+from lensforge.app import create_app
+from lensforge.container import Container
+from lensforge.metrics import clear_multiprocess_dir, mark_process_dead
+from lensforge.warmup import load_models
+
+logger = logging.getLogger(__name__)
+
+# A worker that dies sooner than this after starting is not respawned
+# immediately, so a crash on startup doesn't turn into a fork loop.
+RESPAWN_BACKOFF_SECONDS = 1.0
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(container: Container, sock: socket.socket) -> None:
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, signal.SIG_DFL)
+    config = uvicorn.Config(create_app(container), log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """Forks workers from the loaded parent and keeps ``workers`` of them running."""
+
+    def __init__(self, container: Container, sock: socket.socket, workers: int) -> None:
+        self._container = container
+        self._sock = sock
+        self._workers = max(1, workers)
+        self._children: dict[int, float] = {}
+        self._stopping = False
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self._workers):
+            self._spawn()
+        while self._children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self._children.pop(pid, None)
+            mark_process_dead(pid)
+            if started is None or self._stopping:
+                continue
+            logger.error("Worker %d exited (%s); respawning", pid, _describe(status))
+            if time.monotonic() - started < RESPAWN_BACKOFF_SECONDS:
+                time.sleep(RESPAWN_BACKOFF_SECONDS)
+            if not self._stopping:
+                self._spawn()
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(self._container, self._sock)
+            except BaseException:
+                logger.exception("Worker failed")
+                code = 1
+            finally:
+                os._exit(code)
+        self._children[pid] = time.monotonic()
+        logger.info("Started worker %d", pid)
+
+    def _stop(self, signum: int, frame: object) -> None:
+        self._stopping = True
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def _describe(status: int) -> str:
+    if os.WIFSIGNALED(status):
+        return f"signal {os.WTERMSIG(status)}"
+    return f"exit code {os.waitstatus_to_exitcode(status)}"
+
+
+def serve(workers: int | None = None, host: str | None = None, port: int | None = None) -> None:
+    container = Container()
+    settings = container.settings()
+    container.config.from_pydantic(settings)
+    if settings.inference_workers > 0:
+        raise SystemExit(
+            "lensforge.server forks the server after loading models; "
+            "it cannot be combined with INFERENCE_WORKERS > 0"
+        )
+
+    workers = workers or settings.server_workers
+    # The forked workers share the cores: size their thread budget accordingly.
+    container.config.server_workers.from_value(workers)
+
+    clear_multiprocess_dir()
+    start = time.monotonic()
+    load_models(container)
+    logger.info("Models loaded in %.1f s", time.monotonic() - start)
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(host or settings.host, port or settings.port)
+    Supervisor(container, sock, workers).run()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve LensForge with forked workers.")
+    parser.add_argument("--workers", type=int, help="default: SERVER_WORKERS")
+    parser.add_argument("--host", help="default: HOST")
+    parser.add_argument("--port", type=int, help="default: PORT")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(message)s")
+    serve(args.workers, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
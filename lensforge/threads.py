@@ -0,0 +1,164 @@
+"""CPU thread budget and core pinning.
+
+torch's intra-op pool, OpenCV, the BLAS/OpenMP runtimes and the anyio
+request threadpool each size themselves to the whole machine by default.
+Under concurrent requests that oversubscribes the cores and tail latency
+explodes. ``ThreadBudget`` sizes them together; ``apply_thread_budget`` runs
+once per process (server and each inference worker) before models load.
+"""
+
+import logging
+import os
+import sys
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+BLAS_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+# Budget waiting for torch to be imported (by the first model load).
+_pending_torch: "ThreadBudget | None" = None
+
+
+@dataclass(frozen=True)
+class ThreadBudget:
+    """Thread counts for one process."""
+
+    torch_intra_op: int
+    torch_inter_op: int
+    opencv: int
+    blas: int
+    request_threads: int
+
+    @classmethod
+    def derive(
+        cls,
+        cpu_threads: int = 0,
+        processes: int = 1,
+        model_threads: int = 1,
+        torch_intra_op_threads: int = 0,
+        torch_inter_op_threads: int = 1,
+        opencv_threads: int = 1,
+        request_threads: int = 40,
+    ) -> "ThreadBudget":
+        """Split ``cpu_threads`` (0 = cores available here) across ``processes``,
+        and each process's share across its ``model_threads`` (threads that may
+        run models at once, e.g. the request thread plus the parallel stage pool).
+
+        Explicit non-zero thread counts win over the derived share.
+        """
+        cores = cpu_threads or len(available_cpus())
+        share = max(1, cores // max(1, processes) // max(1, model_threads))
+        intra = torch_intra_op_threads or share
+        return cls(
+            torch_intra_op=intra,
+            torch_inter_op=max(1, torch_inter_op_threads),
+            opencv=opencv_threads,
+            blas=intra,
+            request_threads=max(1, request_threads),
+        )
+
+
+def available_cpus() -> list[int]:
+    """CPUs this process may run on (respects cgroup/affinity limits on Linux)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cpu_list(spec: str) -> list[int]:
+    """Parse a Linux-style CPU list such as ``"0-3,8,10-11"``."""
+    cpus: set[int] = set()
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        first, _, last = part.partition("-")
+        try:
+            cpus.update(range(int(first), int(last or first) + 1))
+        except ValueError as exc:
+            raise ValueError(f"Invalid CPU list: {spec!r}") from exc
+    return sorted(cpus)
+
+
+def worker_cpus(index: int, workers: int, cpus: list[int]) -> list[int]:
+    """The disjoint slice of ``cpus`` for worker ``index`` out of ``workers``."""
+    per_worker = max(1, len(cpus) // max(1, workers))
+    start = (index * per_worker) % len(cpus)
+    return cpus[start : start + per_worker]
+
+
+def pin_to_cpus(cpus: list[int]) -> bool:
+    """Restrict the current process to ``cpus``; a no-op (False) off Linux."""
+    if not cpus:
+        return False
+    if not hasattr(os, "sched_setaffinity"):
+        logger.warning("CPU affinity is not supported on %s; not pinning", sys.platform)
+        return False
+    os.sched_setaffinity(0, cpus)
+    return True
+
+
+def apply_thread_budget(budget: ThreadBudget) -> None:
+    """Size the BLAS/OpenMP, torch, OpenCV and ONNX Runtime thread pools.
+
+    Nothing heavy is imported here: the BLAS/OpenMP variables (left alone
+    when already set in the environment) and ``OPENCV_FOR_THREADS_NUM`` take
+    effect when those libraries load, and torch is configured by
+    ``apply_torch_threads`` once a model has imported it.
+    """
+    global _pending_torch
+
+    for var in BLAS_ENV_VARS:
+        os.environ.setdefault(var, str(budget.blas))
+    os.environ["OPENCV_FOR_THREADS_NUM"] = str(budget.opencv)
+    if "cv2" in sys.modules:
+        sys.modules["cv2"].setNumThreads(budget.opencv)
+
+    _pending_torch = budget
+    if "torch" in sys.modules:
+        apply_torch_threads()
+
+    from lensforge.inference import onnx
+
+    onnx.set_session_threads(budget.torch_intra_op, budget.torch_inter_op)
+    logger.info("Thread budget: %s", budget)
+
+
+def apply_torch_threads() -> None:
+    """Apply the pending budget to torch; model loaders call this after importing torch."""
+    global _pending_torch
+
+    budget, _pending_torch = _pending_torch, None
+    if budget is None:
+        return
+    import torch
+
+    torch.set_num_threads(budget.torch_intra_op)
+    try:
+        torch.set_num_interop_threads(budget.torch_inter_op)
+    except RuntimeError:
+        # Only allowed before the first inter-op parallel work in the process.
+        logger.warning("torch inter-op threads already fixed; keeping the current pool")
+
+
+def set_request_threads(count: int) -> None:
+    """Size anyio's default threadpool (sync handlers, run_in_threadpool).
+
+    Must be called from within the running event loop.
+    """
+    import anyio.to_thread
+
+    anyio.to_thread.current_default_thread_limiter().total_tokens = count
+
+
+def init_inference_worker(budget: ThreadBudget, pin: bool, index: int, workers: int) -> None:
+    """InferencePool initializer: optionally pin to a core slice, then apply the budget."""
+    if pin:
+        cpus = worker_cpus(index, workers, available_cpus())
+        if pin_to_cpus(cpus):
+            logger.info("Inference worker %d pinned to CPUs %s", index, cpus)
+    apply_thread_budget(budget)
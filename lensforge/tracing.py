@@ -0,0 +1,187 @@
+"""Tracing spans across the HTTP handlers, image loader, stages and model calls.
+
+Instrumentation uses the OpenTelemetry API only. Until ``install`` is called
+with an SDK ``TracerProvider`` (``TRACING_EXPORTER`` other than ``none``),
+``span`` returns a shared no-op context manager, so disabled tracing costs a
+function call per span.
+
+Spans (attributes in brackets):
+
+- ``POST /analyze`` and the other analysis routes — server span, continuing
+  the trace of an incoming ``traceparent`` header [``http.*``];
+- ``image.load`` [``image.source``, ``image.width``, ``image.height``];
+- ``pipeline.analyze`` / ``pipeline.analyze_batch`` [``batch.size``,
+  ``cache.hit`` / ``cache.hits``, ``coalesced``];
+- ``stage.<name>`` [``stage.kind``, ``batch.size``] and, inside it, the
+  component call ``<kind>.<method>`` [``model.class``, ``model.version``];
+- ``<batcher>.wait`` for a micro-batched call [``batch.size``,
+  ``batch.queue_wait_ms``] and ``<batcher>.batch`` for the batched model call,
+  linked to the waiting callers;
+- ``nsfw_cascade.fast`` / ``nsfw_cascade.full`` per cascade tier.
+
+Calls handed to inference worker processes are traced up to the pool.
+"""
+
+import os
+import threading
+from collections.abc import Sequence
+from contextlib import AbstractContextManager, nullcontext
+from pathlib import Path
+from typing import Any
+
+from opentelemetry import propagate, trace
+from opentelemetry.trace import Link, Span, SpanContext, SpanKind, Tracer
+
+_tracer: Tracer | None = None
+_NOOP = nullcontext(trace.INVALID_SPAN)
+
+
+def install(provider: Any) -> None:
+    """Route ``span`` to ``provider`` (an SDK ``TracerProvider``)."""
+    global _tracer
+    _tracer = provider.get_tracer("lensforge")
+
+
+def uninstall() -> None:
+    global _tracer
+    _tracer = None
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def span(
+    name: str,
+    attributes: dict[str, Any] | None = None,
+    links: Sequence[Link] | None = None,
+    kind: SpanKind = SpanKind.INTERNAL,
+) -> AbstractContextManager[Span]:
+    """Start a child of the current span (no-op while tracing is disabled)."""
+    if _tracer is None:
+        return _NOOP
+    return _tracer.start_as_current_span(name, attributes=attributes, links=links, kind=kind)
+
+
+def current_context() -> SpanContext | None:
+    """The current span's context, to link work done for it on another thread."""
+    if _tracer is None:
+        return None
+    context = trace.get_current_span().get_span_context()
+    return context if context.is_valid else None
+
+
+def set_attributes(attributes: dict[str, Any]) -> None:
+    """Add attributes to the current span."""
+    if _tracer is not None:
+        trace.get_current_span().set_attributes(attributes)
+
+
+def create_provider(
+    exporter: str,
+    service_name: str = "lensforge",
+    sample_ratio: float = 1.0,
+    otlp_endpoint: str = "",
+    jsonl_path: str = "",
+) -> Any:
+    """Build an SDK ``TracerProvider`` exporting through ``exporter``, or None for ``none``.
+
+    ``exporter`` is ``otlp`` (OTLP/HTTP protobuf), ``jsonl`` (one span per line
+    in ``jsonl_path``) or a dotted class path of a ``SpanExporter``. Traces
+    started by a sampled ``traceparent`` are always recorded; new traces are
+    sampled with ``sample_ratio``.
+    """
+    if exporter == "none":
+        return None
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    except ImportError as exc:
+        raise RuntimeError(
+            "TRACING_EXPORTER needs the tracing extra: pip install 'lensforge[tracing]'"
+        ) from exc
+
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        span_exporter = OTLPSpanExporter(endpoint=otlp_endpoint or None)
+    elif exporter == "jsonl":
+        span_exporter = JsonlSpanExporter(jsonl_path)
+    else:
+        from lensforge.container import import_class
+
+        span_exporter = import_class(exporter)()
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    return provider
+
+
+class JsonlSpanExporter:
+    """SpanExporter appending one JSON object per finished span to ``path``.
+
+    ``{pid}`` in the path is replaced by the process id, so worker processes
+    write separate files.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self._path = str(path)
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[Any]) -> Any:
+        from opentelemetry.sdk.trace.export import SpanExportResult
+
+        lines = "".join(s.to_json(indent=None) + "\n" for s in spans)
+        path = Path(self._path.format(pid=os.getpid()))
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a", encoding="utf-8") as f:
+                f.write(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per request to ``paths``.
+
+    The span continues the trace of an incoming W3C ``traceparent`` header,
+    and the response carries the server span's ``traceparent``.
+    """
+
+    def __init__(self, app: Any, paths: set[str]) -> None:
+        self.app = app
+        self._paths = paths
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        if _tracer is None or scope["type"] != "http" or scope["path"] not in self._paths:
+            await self.app(scope, receive, send)
+            return
+        carrier = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        with _tracer.start_as_current_span(
+            f"{scope['method']} {scope['path']}",
+            context=propagate.extract(carrier),
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": scope["method"], "url.path": scope["path"]},
+        ) as server_span:
+
+            async def send_with_context(message: dict[str, Any]) -> None:
+                if message["type"] == "http.response.start":
+                    server_span.set_attribute("http.response.status_code", message["status"])
+                    headers: dict[str, str] = {}
+                    propagate.inject(headers)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_context)
@@ -0,0 +1,108 @@
+"""Startup phase: build container singletons and run warmup inferences."""
+
+import logging
+import time
+from typing import TYPE_CHECKING
+
+from PIL import Image, ImageDraw
+
+from lensforge.metrics import record_model_load
+
+if TYPE_CHECKING:
+    from lensforge.container import Container
+    from lensforge.pipeline.stages import Stage
+
+logger = logging.getLogger(__name__)
+
+
+def warmup_image(size: int = 224) -> Image.Image:
+    """Synthetic image with edges, so quality gates and models see real work."""
+    img = Image.new("RGB", (size, size), color=(180, 130, 100))
+    draw = ImageDraw.Draw(img)
+    for i in range(0, size, 8):
+        draw.line([(i, 0), (i, size)], fill=(60, 40, 30), width=2)
+        draw.line([(0, i), (size, i)], fill=(60, 40, 30), width=1)
+    return img
+
+
+def load_model(component: object) -> None:
+    """Call the component's optional ``load()`` (eager weight loading), if it has one."""
+    load = getattr(type(component), "load", None)
+    if load is not None:
+        load(component)
+
+
+def load_stage_models(stages: "list[Stage]") -> None:
+    """``load_model`` every stage's component and record how long each load took.
+
+    Stages loaded before (e.g. by the parent of forked workers) are skipped.
+    """
+    for stage in stages:
+        if stage.load_seconds is not None:
+            continue
+        if getattr(type(stage.component), "load", None) is None:
+            continue
+        start = time.monotonic()
+        load_model(stage.component)
+        stage.load_seconds = time.monotonic() - start
+        record_model_load(stage.name, stage.load_seconds)
+        logger.info("Loaded %s in %.1f s", stage.name, stage.load_seconds)
+
+
+def purge_stale_results(cache: object, versions: dict[str, str]) -> None:
+    """Drop cached results of other model versions, if the result cache supports it.
+
+    Persistent caches (``SqliteResultCache``) outlive deploys; entries from
+    replaced models could never be served again but would keep their space.
+    """
+    purge = getattr(type(cache), "purge_stale", None)
+    if purge is None:
+        return
+    removed = purge(cache, versions)
+    if removed:
+        logger.info("Purged %d cached results of other model versions", removed)
+
+
+def load_models(container: "Container") -> None:
+    """Build every stage's component and load its weights, without running inference."""
+    container.image_loader()
+    graph = container.stage_graph()
+    load_stage_models(graph.stages)
+    purge_stale_results(container.result_cache(), graph.versions())
+
+
+def warm_up(container: "Container", runs: int = 1, batch_sizes: list[int] | None = None) -> float:
+    """Build every singleton and run ``runs`` passes per batch size; returns seconds taken.
+
+    Each stage's component is loaded first (``load_stage_models``), then
+    each pass runs every stage of the stage graph. The first pass sets up
+    kernels (and loads components without ``load()``), so real requests
+    don't pay for it. Batch size 1 goes through the single-image methods (and the
+    micro-batcher, if enabled); larger sizes through the batch methods used by
+    micro-batching and ``/batch-analyze``. With an inference pool, every
+    worker runs the same passes.
+    """
+    start = time.monotonic()
+    container.image_loader()
+    pool = container.inference_pool()
+    if pool is not None:
+        pool.warm_up(runs, batch_sizes or [1])
+    graph = container.stage_graph()
+    stages = graph.stages
+    load_stage_models(stages)
+    purge_stale_results(container.result_cache(), graph.versions())
+
+    image = warmup_image()
+    for _ in range(runs):
+        for size in batch_sizes or [1]:
+            pass_start = time.monotonic()
+            for stage in stages:
+                # Not Stage.run: warmup stays out of the stage statistics.
+                stage.call([image] * max(1, size), batched=size > 1)
+            logger.info(
+                "Warmup pass (batch=%d) took %.0f ms", size, (time.monotonic() - pass_start) * 1000
+            )
+
+    elapsed = time.monotonic() - start
+    logger.info("Warmup finished in %.1f s", elapsed)
+    return elapsed
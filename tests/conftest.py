@@ -1,5 +1,10 @@
 """Shared test fixtures for LensForge."""
 
+import threading
+import time
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
 from unittest.mock import MagicMock
 
 import pytest
@@ -29,6 +34,67 @@ def sharp_image() -> Image.Image:
     return img
 
 
+# --- Local HTTP server standing in for remote image hosts ---
+
+
+class ImageServer:
+    """Serves registered byte payloads and tracks peak request concurrency."""
+
+    def __init__(self) -> None:
+        self.routes: dict[str, tuple[bytes, str]] = {}
+        self.delay = 0.0
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        self.base_url = ""
+
+    def add(self, path: str, body: bytes, content_type: str = "image/jpeg") -> str:
+        self.routes[path] = (body, content_type)
+        return self.base_url + path
+
+    def add_image(self, path: str, size: tuple[int, int] = (224, 224), fmt: str = "JPEG") -> str:
+        buf = BytesIO()
+        Image.new("RGB", size, color=(180, 130, 100)).save(buf, format=fmt)
+        return self.add(path, buf.getvalue(), f"image/{fmt.lower()}")
+
+
+@pytest.fixture
+def image_server() -> Iterator[ImageServer]:
+    server_state = ImageServer()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            with server_state.lock:
+                server_state.active += 1
+                server_state.peak = max(server_state.peak, server_state.active)
+            try:
+                time.sleep(server_state.delay)
+                route = server_state.routes.get(self.path)
+                if route is None:
+                    self.send_error(404)
+                    return
+                body, content_type = route
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                with server_state.lock:
+                    server_state.active -= 1
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server_state.base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield server_state
+    httpd.shutdown()
+    httpd.server_close()
+
+
 # --- Mock fixtures for pipeline tests ---
 
 
@@ -110,7 +176,11 @@ async def client(
 
     from lensforge.loaders.image_loader import ImageLoader
     from lensforge.pipeline.analysis_pipeline import AnalysisPipeline
+    from lensforge.pipeline.stages import StageGraph
     from lensforge.routes.analyze import router as analyze_router
+    from lensforge.routes.metrics import router as metrics_router
+    from lensforge.routes.pipeline import router as pipeline_router
+    from lensforge.tracing import TracingMiddleware
 
     app = FastAPI()
 
@@ -119,11 +189,12 @@ async def client(
         return {"status": "ok"}
 
     app.include_router(analyze_router)
+    app.include_router(pipeline_router)
+    app.include_router(metrics_router)
+    app.add_middleware(TracingMiddleware, paths={r.path for r in analyze_router.routes})
 
     pipeline = AnalysisPipeline(
-        quality=mock_quality_ok,
-        safety=mock_nsfw_safe,
-        classifier=mock_classifier,
+        StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier)
     )
     loader = ImageLoader(max_size=1024)
 
@@ -131,6 +202,7 @@ async def client(
     mock_container = MagicMock()
     mock_container.analysis_pipeline.return_value = pipeline
     mock_container.image_loader.return_value = loader
+    mock_container.stage_graph.return_value = pipeline.stages
 
     app.state.container = mock_container
 
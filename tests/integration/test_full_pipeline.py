@@ -18,11 +18,14 @@ def test_full_dermatology_pipeline():
     from custom.extensions.dermatology.falconsai_nsfw import FalconsaiNsfwDetector
     from custom.extensions.dermatology.vit_skin import VitSkinClassifier
     from lensforge.pipeline.analysis_pipeline import AnalysisPipeline
+    from lensforge.pipeline.stages import StageGraph
 
     pipeline = AnalysisPipeline(
-        quality=BrisqueChecker(blur_threshold=50.0),
-        safety=FalconsaiNsfwDetector(threshold=0.7),
-        classifier=VitSkinClassifier(device="cpu"),
+        StageGraph.default(
+            BrisqueChecker(blur_threshold=50.0),
+            FalconsaiNsfwDetector(threshold=0.7),
+            VitSkinClassifier(device="cpu"),
+        )
     )
 
     img = Image.new("RGB", (224, 224), color=(180, 130, 100))
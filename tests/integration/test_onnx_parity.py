@@ -0,0 +1,46 @@
+"""ONNX Runtime vs PyTorch parity on the real models. Slow — skipped in fast CI."""
+
+import os
+
+import pytest
+from PIL import Image, ImageDraw
+
+skip_in_ci = pytest.mark.skipif(
+    os.getenv("CI_FAST") == "true",
+    reason="Skips model download in fast CI",
+)
+
+MODELS = ["Anwarkh1/Skin_Cancer-Image_Classification", "Falconsai/nsfw_image_detection"]
+
+
+def _images() -> list[Image.Image]:
+    images = []
+    for color in [(180, 130, 100), (90, 60, 50), (220, 190, 170)]:
+        img = Image.new("RGB", (224, 224), color=color)
+        draw = ImageDraw.Draw(img)
+        for i in range(0, 224, 8):
+            draw.line([(i, 0), (i, 224)], fill=(150, 100, 80), width=2)
+        draw.ellipse([(60, 60), (160, 150)], fill=(70, 40, 30))
+        images.append(img)
+    return images
+
+
+@skip_in_ci
+@pytest.mark.parametrize("model_name", MODELS)
+def test_onnx_matches_torch(model_name, tmp_path):
+    pytest.importorskip("onnxruntime")
+    from transformers import pipeline
+
+    from lensforge.inference.onnx import OnnxImagePipeline, export_model
+
+    out = export_model(model_name, tmp_path, quantize=True)
+    torch_pipe = pipeline("image-classification", model=model_name, top_k=None)
+    images = _images()
+    expected = [{r["label"]: r["score"] for r in rs} for rs in torch_pipe(images)]
+
+    for quantized, atol in [(False, 1e-3), (True, 0.05)]:
+        onnx_pipe = OnnxImagePipeline.from_dir(out, quantized=quantized, top_k=100)
+        for want, got in zip(expected, onnx_pipe(images, batch_size=len(images))):
+            assert {r["label"] for r in got} == set(want)
+            for r in got:
+                assert r["score"] == pytest.approx(want[r["label"]], abs=atol)
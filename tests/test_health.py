@@ -14,3 +14,20 @@ async def test_health_endpoint():
         resp = await ac.get("/health")
     assert resp.status_code == 200
     assert resp.json()["status"] == "ok"
+
+
+@pytest.mark.asyncio
+async def test_ready_endpoint_reports_warmup_state():
+    from lensforge.app import create_app
+
+    app = create_app()
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        resp = await ac.get("/ready")
+        assert resp.status_code == 503
+        assert resp.json()["status"] == "warming_up"
+
+        app.state.ready = True
+        resp = await ac.get("/ready")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "ready"
@@ -6,6 +6,8 @@ from io import BytesIO
 import pytest
 from PIL import Image
 
+from lensforge.loaders.image_loader import ImageLoader
+
 
 def _make_b64_image(w: int = 224, h: int = 224, color: str = "red") -> str:
     img = Image.new("RGB", (w, h), color=color)
@@ -35,6 +37,38 @@ class TestAnalyzeEndpoint:
         assert resp.status_code == 400
 
 
+class TestStageTimingsHeader:
+    @pytest.mark.asyncio
+    async def test_header_enables_timings(self, client):
+        resp = await client.post(
+            "/analyze",
+            json={"image_base64": _make_b64_image()},
+            headers={"X-Stage-Timings": "true"},
+        )
+
+        timings = resp.json()["stage_timings_ms"]
+        assert list(timings) == ["load", "quality", "nsfw", "classifier"]
+
+    @pytest.mark.asyncio
+    async def test_absent_by_default(self, client):
+        resp = await client.post("/analyze", json={"image_base64": _make_b64_image()})
+
+        assert resp.json()["stage_timings_ms"] is None
+
+    @pytest.mark.asyncio
+    async def test_batch_items(self, client):
+        b64 = _make_b64_image()
+        resp = await client.post(
+            "/batch-analyze",
+            json={"images": [{"image_base64": b64}, {"image_base64": "!!!invalid!!!"}]},
+            headers={"X-Stage-Timings": "1"},
+        )
+
+        ok, error = resp.json()["results"]
+        assert set(ok["stage_timings_ms"]) == {"load", "quality", "nsfw", "classifier"}
+        assert error["stage_timings_ms"] is None
+
+
 class TestBatchEndpoint:
     @pytest.mark.asyncio
     async def test_batch_analyze(self, client):
@@ -48,6 +82,64 @@ class TestBatchEndpoint:
         assert len(data["results"]) == 2
         assert all(r["status"] == "success" for r in data["results"])
 
+    @pytest.mark.asyncio
+    async def test_batch_keeps_item_order_with_errors(self, client):
+        b64 = _make_b64_image()
+        resp = await client.post(
+            "/batch-analyze",
+            json={
+                "images": [
+                    {"image_base64": b64},
+                    {"image_base64": "!!!invalid!!!"},
+                    {"image_base64": b64},
+                ]
+            },
+        )
+        assert resp.status_code == 200
+        statuses = [r["status"] for r in resp.json()["results"]]
+        assert statuses == ["success", "error", "success"]
+
+    @pytest.mark.asyncio
+    async def test_batch_isolates_pipeline_value_error(self, client, mock_classifier):
+        result = mock_classifier.classify.return_value
+
+        def classify(image):
+            if image.getpixel((0, 0))[2] > 128:
+                raise ValueError("Unsupported image for classifier")
+            return result
+
+        mock_classifier.classify.side_effect = classify
+        images = [_make_b64_image(), _make_b64_image(color="blue"), _make_b64_image()]
+        resp = await client.post(
+            "/batch-analyze", json={"images": [{"image_base64": b} for b in images]}
+        )
+
+        assert resp.status_code == 200
+        results = resp.json()["results"]
+        assert [r["status"] for r in results] == ["success", "error", "success"]
+        assert results[1]["reason"] == "Unsupported image for classifier"
+
+    @pytest.mark.asyncio
+    async def test_batch_fetches_urls(self, client, image_server):
+        b64 = _make_b64_image()
+        ok = image_server.add_image("/ok.jpg")
+        missing = image_server.base_url + "/missing.jpg"
+        resp = await client.post(
+            "/batch-analyze",
+            json={
+                "images": [
+                    {"image_url": ok},
+                    {"image_base64": b64},
+                    {"image_url": missing},
+                    {"image_url": ok},
+                ]
+            },
+        )
+        assert resp.status_code == 200
+        results = resp.json()["results"]
+        assert [r["status"] for r in results] == ["success", "success", "error", "success"]
+        assert "Failed to fetch image" in results[2]["reason"]
+
     @pytest.mark.asyncio
     async def test_batch_max_50(self, client):
         resp = await client.post(
@@ -55,3 +147,156 @@ class TestBatchEndpoint:
             json={"images": [{"image_base64": "x"}] * 51},
         )
         assert resp.status_code == 422
+
+
+def _make_jpeg(w: int = 224, h: int = 224, color: str = "red") -> bytes:
+    buf = BytesIO()
+    Image.new("RGB", (w, h), color=color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+class TestRawEndpoint:
+    @pytest.mark.asyncio
+    async def test_analyze_octet_stream(self, client):
+        resp = await client.post(
+            "/analyze/raw",
+            content=_make_jpeg(),
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        assert resp.status_code == 200
+        assert resp.json()["status"] == "success"
+
+    @pytest.mark.asyncio
+    async def test_accepts_image_content_type(self, client):
+        resp = await client.post(
+            "/analyze/raw", content=_make_jpeg(), headers={"Content-Type": "image/jpeg"}
+        )
+        assert resp.status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_rejects_other_content_type(self, client):
+        resp = await client.post(
+            "/analyze/raw", content=b"{}", headers={"Content-Type": "application/json"}
+        )
+        assert resp.status_code == 415
+
+    @pytest.mark.asyncio
+    async def test_invalid_image(self, client):
+        resp = await client.post(
+            "/analyze/raw",
+            content=b"not an image",
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        assert resp.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_rejects_content_length_over_cap(self, client):
+        client._transport.app.state.container.image_loader.return_value = ImageLoader(
+            max_download_bytes=100
+        )
+        resp = await client.post(
+            "/analyze/raw", content=_make_jpeg(), headers={"Content-Type": "image/jpeg"}
+        )
+        assert resp.status_code == 400
+        assert "Image too large" in resp.json()["detail"]
+
+    @pytest.mark.asyncio
+    async def test_stops_reading_chunked_body_past_cap(self, client):
+        client._transport.app.state.container.image_loader.return_value = ImageLoader(
+            max_download_bytes=4096
+        )
+        sent = 0
+
+        async def body():
+            nonlocal sent
+            jpeg = _make_jpeg(w=1024, h=1024)
+            for i in range(0, len(jpeg), 1024):
+                sent += 1
+                yield jpeg[i : i + 1024]
+            for _ in range(1000):
+                sent += 1
+                yield b"\x00" * 1024
+
+        resp = await client.post(
+            "/analyze/raw", content=body(), headers={"Content-Type": "image/jpeg"}
+        )
+        assert resp.status_code == 400
+        assert "Image too large" in resp.json()["detail"]
+        assert sent < 10
+
+
+class TestUploadEndpoints:
+    @pytest.mark.asyncio
+    async def test_analyze_upload(self, client):
+        resp = await client.post(
+            "/analyze/upload", files={"file": ("a.jpg", _make_jpeg(), "image/jpeg")}
+        )
+        assert resp.status_code == 200
+        assert resp.json()["status"] == "success"
+
+    @pytest.mark.asyncio
+    async def test_analyze_upload_invalid(self, client):
+        resp = await client.post(
+            "/analyze/upload", files={"file": ("a.jpg", b"junk", "image/jpeg")}
+        )
+        assert resp.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_batch_upload(self, client):
+        files = [
+            ("files", ("a.jpg", _make_jpeg(), "image/jpeg")),
+            ("files", ("b.jpg", b"junk", "image/jpeg")),
+            ("files", ("c.jpg", _make_jpeg(color="blue"), "image/jpeg")),
+        ]
+        resp = await client.post("/batch-analyze/upload", files=files)
+        assert resp.status_code == 200
+        statuses = [r["status"] for r in resp.json()["results"]]
+        assert statuses == ["success", "error", "success"]
+
+    @pytest.mark.asyncio
+    async def test_upload_rejects_content_length_over_cap(self, client):
+        client._transport.app.state.container.image_loader.return_value = ImageLoader(
+            max_download_bytes=100
+        )
+        resp = await client.post(
+            "/analyze/upload",
+            files={"file": ("a.jpg", _make_jpeg(1024, 1024), "image/jpeg")},
+        )
+        assert resp.status_code == 400
+        assert "Request too large" in resp.json()["detail"]
+
+    @pytest.mark.asyncio
+    async def test_batch_upload_stops_reading_part_past_cap(self, client):
+        client._transport.app.state.container.image_loader.return_value = ImageLoader(
+            max_download_bytes=4096
+        )
+        sent = 0
+
+        async def body():
+            nonlocal sent
+            yield b'--b\r\nContent-Disposition: form-data; name="files"; filename="a.jpg"\r\n\r\n'
+            for _ in range(1000):
+                sent += 1
+                yield b"\x00" * 1024
+            yield b"\r\n--b--\r\n"
+
+        resp = await client.post(
+            "/batch-analyze/upload",
+            content=body(),
+            headers={"Content-Type": "multipart/form-data; boundary=b"},
+        )
+        assert resp.status_code == 400
+        assert "Image too large" in resp.json()["detail"]
+        assert sent < 10
+
+    @pytest.mark.asyncio
+    async def test_upload_missing_part(self, client):
+        resp = await client.post("/analyze/upload", files={"other": ("a.jpg", b"x", "image/jpeg")})
+        assert resp.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_batch_upload_max_50(self, client):
+        jpeg = _make_jpeg(8, 8)
+        files = [("files", (f"{i}.jpg", jpeg, "image/jpeg")) for i in range(51)]
+        resp = await client.post("/batch-analyze/upload", files=files)
+        assert resp.status_code == 422
@@ -0,0 +1,109 @@
+"""MicroBatcher and batching wrapper tests."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+from PIL import Image
+
+from lensforge.interfaces.nsfw_detector import NsfwResult
+from lensforge.pipeline.batching import (
+    BatchingDomainClassifier,
+    BatchingNsfwDetector,
+    MicroBatcher,
+)
+
+
+def _images(n: int) -> list[Image.Image]:
+    return [Image.new("RGB", (8, 8), color=(i, i, i)) for i in range(n)]
+
+
+class TestMicroBatcher:
+    def test_gathers_concurrent_calls(self):
+        batch_sizes: list[int] = []
+        release = threading.Event()
+
+        def batch_fn(images):
+            batch_sizes.append(len(images))
+            release.wait(timeout=1)
+            return [img.getpixel((0, 0))[0] for img in images]
+
+        batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=200)
+        images = _images(4)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(batcher, img) for img in images]
+            release.set()
+            results = [f.result(timeout=2) for f in futures]
+
+        assert sorted(results) == [0, 1, 2, 3]
+        assert batch_sizes == [4]
+
+    def test_routes_results_to_callers(self):
+        batcher = MicroBatcher(
+            lambda imgs: [img.getpixel((0, 0))[0] * 10 for img in imgs],
+            max_batch_size=8,
+            max_wait_ms=20,
+        )
+        futures = [batcher.submit(img) for img in _images(5)]
+        assert [f.result(timeout=2) for f in futures] == [0, 10, 20, 30, 40]
+
+    def test_respects_max_batch_size(self):
+        batch_sizes: list[int] = []
+
+        def batch_fn(images):
+            batch_sizes.append(len(images))
+            return [0] * len(images)
+
+        batcher = MicroBatcher(batch_fn, max_batch_size=2, max_wait_ms=50)
+        futures = [batcher.submit(img) for img in _images(5)]
+        for f in futures:
+            f.result(timeout=2)
+        assert max(batch_sizes) <= 2
+        assert sum(batch_sizes) == 5
+
+    def test_propagates_errors_to_all_callers(self):
+        def batch_fn(images):
+            raise RuntimeError("model failed")
+
+        batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=20)
+        futures = [batcher.submit(img) for img in _images(2)]
+        for f in futures:
+            with pytest.raises(RuntimeError, match="model failed"):
+                f.result(timeout=2)
+
+    def test_rejects_mismatched_result_count(self):
+        batcher = MicroBatcher(lambda imgs: [], max_batch_size=4, max_wait_ms=1)
+        with pytest.raises(RuntimeError, match="0 results for 1 images"):
+            batcher(Image.new("RGB", (8, 8)))
+
+
+class TestBatchingWrappers:
+    def test_nsfw_falls_back_to_detect(self, mock_nsfw_safe):
+        detector = BatchingNsfwDetector(mock_nsfw_safe, max_batch_size=4, max_wait_ms=1)
+        result = detector.detect(Image.new("RGB", (8, 8)))
+
+        assert result.is_safe is True
+        assert detector.version == "mock-nsfw-1.0"
+        mock_nsfw_safe.detect.assert_called_once()
+
+    def test_nsfw_uses_detect_batch(self):
+        class BatchDetector:
+            version = "batch-1.0"
+            detect = MagicMock()
+
+            def detect_batch(self, images):
+                return [NsfwResult(is_safe=True, nsfw_score=0.0) for _ in images]
+
+        inner = BatchDetector()
+        detector = BatchingNsfwDetector(inner, max_batch_size=4, max_wait_ms=1)
+        assert detector.detect(Image.new("RGB", (8, 8))).is_safe is True
+        inner.detect.assert_not_called()
+
+    def test_classifier_falls_back_to_classify(self, mock_classifier):
+        classifier = BatchingDomainClassifier(mock_classifier, max_batch_size=4, max_wait_ms=1)
+        results = classifier.classify_batch(_images(3))
+
+        assert len(results) == 3
+        assert results[0].predictions[0].label == "nv"
+        assert mock_classifier.classify.call_count == 3
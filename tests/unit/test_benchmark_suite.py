@@ -0,0 +1,71 @@
+"""Benchmark suite plumbing: measurement, baseline comparison, regression exit."""
+
+import json
+import sys
+
+import pytest
+from PIL import Image
+
+from benchmarks import suite
+from benchmarks.stub_models import StubClassifier, StubNsfwDetector, StubQualityChecker
+from lensforge.pipeline.analysis_pipeline import AnalysisPipeline
+from lensforge.pipeline.stages import StageGraph
+
+
+def test_measure_reports_per_call_stats():
+    calls = []
+
+    result = suite.measure(lambda: calls.append(1), repeat=3, min_sample_ms=1.0)
+
+    assert result["calls"] == len(calls) - 1  # minus the calibration call
+    assert result["calls"] % 3 == 0
+    assert 0 <= result["min_ms"] <= result["median_ms"] <= result["p95_ms"]
+
+
+def test_compare_only_shared_cases():
+    results = {"a": {"median_ms": 1.2}, "new": {"median_ms": 1.0}}
+    baseline = {"a": {"median_ms": 1.0}, "gone": {"median_ms": 1.0}}
+
+    changes = suite.compare(results, baseline)
+
+    assert list(changes) == ["a"]
+    assert changes["a"] == pytest.approx(0.2)
+
+
+def test_stub_models_are_deterministic():
+    pipeline = AnalysisPipeline(
+        StageGraph.default(StubQualityChecker(2), StubNsfwDetector(2), StubClassifier(2))
+    )
+    image = Image.effect_noise((64, 48), 40).convert("RGB")
+
+    first, second = pipeline.analyze(image), pipeline.analyze(image)
+
+    assert first.status == "success"
+    assert first.predictions == second.predictions
+    assert first.model_versions["nn1_safety"] == "stub-nsfw-1.0"
+
+
+def _main(monkeypatch, *args: str) -> None:
+    argv = ["suite", "--groups", "pipeline", "--filter", "zero-cost", "--repeat", "2"]
+    monkeypatch.setattr(sys, "argv", [*argv, "--min-sample-ms", "1", *args])
+    suite.main()
+
+
+def test_baseline_regression_fails_the_run(tmp_path, monkeypatch, capsys):
+    output = tmp_path / "results.json"
+    _main(monkeypatch, "--output", str(output))
+    report = json.loads(output.read_text())
+    assert list(report["results"]) == ["pipeline.analyze/stub-zero-cost"]
+    assert report["environment"]["python"]
+
+    # Within the threshold of itself.
+    _main(monkeypatch, "--baseline", str(output), "--threshold", "10")
+    assert "REGRESSION" not in capsys.readouterr().out
+
+    report["results"]["pipeline.analyze/stub-zero-cost"]["median_ms"] /= 1000
+    faster = tmp_path / "faster.json"
+    faster.write_text(json.dumps(report))
+    with pytest.raises(SystemExit) as exc:
+        _main(monkeypatch, "--baseline", str(faster))
+    assert exc.value.code == 1
+    assert "REGRESSION" in capsys.readouterr().out
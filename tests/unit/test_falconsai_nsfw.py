@@ -52,6 +52,20 @@ class TestFalconsaiNsfw:
         detector_lax = FalconsaiNsfwDetector(threshold=0.8, _pipeline=mock_pipe)
         assert detector_lax.detect(Image.new("RGB", (224, 224))).is_safe is True
 
+    def test_detect_batch(self):
+        mock_pipe = MagicMock()
+        mock_pipe.return_value = [
+            [{"label": "normal", "score": 0.97}, {"label": "nsfw", "score": 0.03}],
+            [{"label": "nsfw", "score": 0.92}, {"label": "normal", "score": 0.08}],
+        ]
+
+        detector = FalconsaiNsfwDetector(threshold=0.7, _pipeline=mock_pipe)
+        images = [Image.new("RGB", (224, 224)), Image.new("RGB", (224, 224))]
+        results = detector.detect_batch(images)
+
+        assert [r.is_safe for r in results] == [True, False]
+        mock_pipe.assert_called_once_with(images, batch_size=2)
+
     def test_version(self):
         detector = FalconsaiNsfwDetector(threshold=0.7, _pipeline=MagicMock())
         assert "falconsai" in detector.version
@@ -1,12 +1,15 @@
 """ImageLoader tests."""
 
+import asyncio
 import base64
+import time
 from io import BytesIO
 
+import numpy as np
 import pytest
-from PIL import Image
+from PIL import Image, ImageFilter
 
-from lensforge.loaders.image_loader import ImageLoader
+from lensforge.loaders.image_loader import ImageLoader, _DownloadGuard, _sniff_header
 
 
 class TestLoadBase64:
@@ -74,6 +77,32 @@ class TestResize:
         result = loader.load_base64(b64)
         assert result.size == (100, 80)
 
+    @pytest.mark.parametrize("fmt", ["JPEG", "PNG"])
+    def test_reduced_decode_matches_full_decode(self, fmt):
+        src = (
+            Image.effect_noise((2048, 1364), 60).convert("RGB").filter(ImageFilter.GaussianBlur(3))
+        )
+        buf = BytesIO()
+        src.save(buf, format=fmt, quality=90)
+        b64 = base64.b64encode(buf.getvalue()).decode()
+
+        reference = Image.open(BytesIO(buf.getvalue())).convert("RGB")
+        reference = reference.resize((1024, 682), Image.LANCZOS)
+
+        result = ImageLoader(max_size=1024).load_base64(b64)
+        assert result.size == reference.size
+        diff = np.abs(np.asarray(result, dtype=float) - np.asarray(reference, dtype=float))
+        assert diff.mean() < 1.0
+
+    def test_cmyk_jpeg_downscaled_to_rgb(self):
+        buf = BytesIO()
+        Image.new("CMYK", (2048, 1024), color=(0, 255, 255, 0)).save(buf, format="JPEG")
+        b64 = base64.b64encode(buf.getvalue()).decode()
+
+        result = ImageLoader(max_size=1024).load_base64(b64)
+        assert result.mode == "RGB"
+        assert result.size == (1024, 512)
+
 
 class TestColorMode:
     def test_converts_grayscale_to_rgb(self):
@@ -95,3 +124,187 @@ class TestColorMode:
         loader = ImageLoader(max_size=1024)
         result = loader.load_base64(b64)
         assert result.mode == "RGB"
+
+
+class TestLoadUrl:
+    def test_loads_url(self, image_server):
+        url = image_server.add_image("/a.jpg", size=(120, 80))
+
+        result = ImageLoader(max_size=1024).load_url(url)
+        assert result.size == (120, 80)
+
+    def test_http_error_is_value_error(self, image_server):
+        loader = ImageLoader(max_size=1024)
+        with pytest.raises(ValueError, match="Failed to fetch image"):
+            loader.load_url(image_server.base_url + "/missing.jpg")
+
+
+class TestAsyncLoadUrls:
+    async def test_loads_urls_in_order(self, image_server):
+        urls = [image_server.add_image(f"/{i}.png", size=(10 + i, 10), fmt="PNG") for i in range(4)]
+
+        loader = ImageLoader(max_size=1024)
+        results = await loader.aload_urls(urls)
+        await loader.aclose()
+
+        assert [img.size for img in results] == [(10, 10), (11, 10), (12, 10), (13, 10)]
+
+    async def test_reports_failures_in_place(self, image_server):
+        ok = image_server.add_image("/ok.jpg")
+        bad = image_server.add("/bad.jpg", b"not an image")
+        missing = image_server.base_url + "/missing.jpg"
+
+        loader = ImageLoader(max_size=1024)
+        results = await loader.aload_urls([ok, bad, missing])
+        await loader.aclose()
+
+        assert isinstance(results[0], Image.Image)
+        assert isinstance(results[1], ValueError)
+        assert "Unsupported image format" in str(results[1])
+        assert isinstance(results[2], ValueError)
+        assert "Failed to fetch image" in str(results[2])
+
+    async def test_downloads_concurrently_within_host_cap(self, image_server):
+        image_server.delay = 0.1
+        urls = [image_server.add_image(f"/{i}.jpg") for i in range(6)]
+
+        loader = ImageLoader(max_size=1024, max_connections=10, max_connections_per_host=3)
+        start = time.monotonic()
+        results = await loader.aload_urls(urls)
+        elapsed = time.monotonic() - start
+        await loader.aclose()
+
+        assert all(isinstance(img, Image.Image) for img in results)
+        assert image_server.peak == 3
+        assert elapsed < 6 * 0.1
+
+    async def test_total_cap(self, image_server):
+        image_server.delay = 0.05
+        urls = [image_server.add_image(f"/{i}.jpg") for i in range(5)]
+
+        loader = ImageLoader(max_size=1024, max_connections=2, max_connections_per_host=8)
+        await loader.aload_urls(urls)
+        await loader.aclose()
+
+        assert image_server.peak <= 2
+
+    async def test_drops_idle_host_limits(self, image_server):
+        urls = [image_server.add_image(f"/{i}.jpg") for i in range(3)]
+
+        loader = ImageLoader(max_size=1024)
+        await loader.aload_urls(urls)
+        await loader.aclose()
+
+        assert loader._host_limits == {}
+
+    def test_closes_client_of_previous_event_loop(self, image_server):
+        url = image_server.add_image("/a.jpg")
+        loader = ImageLoader(max_size=1024)
+
+        asyncio.run(loader.aload_url(url))
+        first = loader._client
+        asyncio.run(loader.aload_url(url))
+
+        assert first is not None and first.is_closed
+        assert loader._client is not first and not loader._client.is_closed
+        asyncio.run(loader.aclose())
+
+    def test_sync_pools_cover_max_connections(self):
+        loader = ImageLoader(max_size=1024, max_connections=32, max_connections_per_host=8)
+        adapter = loader._session.get_adapter("https://example.com")
+
+        assert adapter._pool_connections == 4
+        assert adapter._pool_maxsize == 8
+
+
+def _encoded(fmt: str, size: tuple[int, int] = (64, 48), noise: bool = False) -> bytes:
+    img = Image.effect_noise(size, 40).convert("RGB") if noise else Image.new("RGB", size)
+    buf = BytesIO()
+    img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+class TestSniffHeader:
+    @pytest.mark.parametrize("fmt", ["JPEG", "PNG", "WEBP"])
+    def test_reads_dimensions_from_prefix(self, fmt):
+        data = _encoded(fmt, size=(640, 480), noise=True)
+        assert _sniff_header(data[:4096]) == (fmt, (640, 480))
+
+    def test_needs_more_data(self):
+        assert _sniff_header(b"\x89PNG") is None
+
+    def test_rejects_unknown_magic(self):
+        with pytest.raises(ValueError, match="Unsupported image format"):
+            _sniff_header(b"GIF89a" + b"\x00" * 20)
+
+
+class TestStreamingLimits:
+    def test_rejects_content_length_over_cap(self, image_server):
+        url = image_server.add("/big.jpg", _encoded("JPEG", noise=True))
+
+        loader = ImageLoader(max_size=1024, max_download_bytes=100)
+        with pytest.raises(ValueError, match="Image too large"):
+            loader.load_url(url)
+
+    def test_aborts_stream_over_cap_without_content_length(self):
+        guard = _DownloadGuard(max_bytes=1000, max_pixels=10**9)
+        guard.check_headers({"content-type": "image/png"})
+        guard.feed(_encoded("PNG", noise=True)[:600])
+        with pytest.raises(ValueError, match="Image too large"):
+            guard.feed(b"\x00" * 600)
+
+    def test_rejects_non_image_content_type(self, image_server):
+        url = image_server.add("/page", b"<html></html>", content_type="text/html")
+
+        loader = ImageLoader(max_size=1024)
+        with pytest.raises(ValueError, match="Unsupported content type"):
+            loader.load_url(url)
+
+    def test_rejects_unsupported_format_from_first_chunk(self, image_server):
+        url = image_server.add("/a.gif", b"GIF89a" + b"\x00" * 5000, content_type="image/gif")
+
+        loader = ImageLoader(max_size=1024)
+        with pytest.raises(ValueError, match="Unsupported image format"):
+            loader.load_url(url)
+
+    def test_rejects_pixel_count_from_header(self):
+        guard = _DownloadGuard(max_bytes=10**9, max_pixels=100 * 100)
+        data = _encoded("PNG", size=(200, 200))
+        with pytest.raises(ValueError, match=r"200x200 pixels"):
+            guard.feed(data[:64])
+
+    async def test_async_path_enforces_limits(self, image_server):
+        url = image_server.add_image("/wide.png", size=(400, 300), fmt="PNG")
+
+        loader = ImageLoader(max_size=1024, max_pixels=1000)
+        [result] = await loader.aload_urls([url])
+        await loader.aclose()
+
+        assert isinstance(result, ValueError)
+        assert "400x300 pixels" in str(result)
+
+    def test_base64_enforces_pixel_cap(self):
+        b64 = base64.b64encode(_encoded("PNG", size=(200, 200))).decode()
+
+        loader = ImageLoader(max_size=1024, max_pixels=100 * 100)
+        with pytest.raises(ValueError, match="Image too large"):
+            loader.load_base64(b64)
+
+
+class TestLoadBytesAndFile:
+    def test_load_bytes(self):
+        result = ImageLoader(max_size=1024).load_bytes(_encoded("JPEG", size=(30, 20)))
+        assert result.size == (30, 20)
+
+    def test_load_file_detaches_from_file(self, tmp_path):
+        path = tmp_path / "a.png"
+        path.write_bytes(_encoded("PNG", size=(30, 20)))
+
+        with path.open("rb") as fp:
+            result = ImageLoader(max_size=1024).load_file(fp)
+        assert result.getpixel((0, 0)) == (0, 0, 0)
+
+    def test_upload_byte_cap(self):
+        loader = ImageLoader(max_size=1024, max_download_bytes=10)
+        with pytest.raises(ValueError, match="Image too large"):
+            loader.load_bytes(_encoded("JPEG"))
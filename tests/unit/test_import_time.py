@@ -0,0 +1,54 @@
+"""Startup stays light: no ML framework is imported until a model loads."""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+HEAVY_MODULES = ("torch", "transformers", "onnxruntime", "cv2", "numpy", "httpx")
+
+# Generous for a slow CI runner; the app itself starts in well under half of this.
+IMPORT_BUDGET_SECONDS = float(os.environ.get("IMPORT_BUDGET_SECONDS", "2.0"))
+
+# Runs the lifespan directly: TestClient would import httpx itself.
+STARTUP = """
+import asyncio, json, sys, time
+
+start = time.perf_counter()
+from lensforge.app import create_app
+app = create_app()
+imported = time.perf_counter() - start
+
+async def start_up():
+    async with app.router.lifespan_context(app):
+        pass
+    # Checked after shutdown too: closing must not build an unused loader.
+    return [name for name in {heavy!r} if name in sys.modules]
+
+loaded = asyncio.run(start_up())
+print(json.dumps({{"import_seconds": imported, "loaded": loaded}}))
+"""
+
+
+def _start_app() -> dict:
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "WARMUP_ENABLED": "false"}
+    out = subprocess.run(
+        [sys.executable, "-c", STARTUP.format(heavy=HEAVY_MODULES)],
+        cwd=ROOT,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def test_startup_imports_no_heavy_modules():
+    result = _start_app()
+
+    assert result["loaded"] == []
+    assert result["import_seconds"] < IMPORT_BUDGET_SECONDS
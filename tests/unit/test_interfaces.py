@@ -1,8 +1,10 @@
-"""Interface dataclass tests."""
+"""Interface dataclass and batch fallback tests."""
+
+from PIL import Image
 
 from lensforge.interfaces.domain_classifier import ClassificationResult, Prediction
-from lensforge.interfaces.nsfw_detector import NsfwResult
-from lensforge.interfaces.quality_checker import QualityResult
+from lensforge.interfaces.nsfw_detector import NsfwResult, detect_batch
+from lensforge.interfaces.quality_checker import QualityResult, check_batch
 
 
 class TestQualityResult:
@@ -49,3 +51,25 @@ class TestClassificationResult:
         assert r.predictions == []
         assert r.description == ""
         assert r.urgency is None
+
+
+class TestBatchFallback:
+    def test_falls_back_to_single_image_method(self, mock_quality_ok):
+        images = [Image.new("RGB", (8, 8))] * 3
+        results = check_batch(mock_quality_ok, images)
+
+        assert len(results) == 3
+        assert mock_quality_ok.check.call_count == 3
+
+    def test_prefers_batch_method(self):
+        class Detector:
+            version = "d-1.0"
+
+            def detect(self, image):
+                raise AssertionError("detect_batch should be used")
+
+            def detect_batch(self, images):
+                return [NsfwResult(is_safe=True, nsfw_score=0.0) for _ in images]
+
+        results = detect_batch(Detector(), [Image.new("RGB", (8, 8))] * 2)
+        assert [r.is_safe for r in results] == [True, True]
@@ -0,0 +1,94 @@
+"""Load-test harness: payload mix, summaries and a short in-process run."""
+
+import argparse
+import json
+
+import pytest
+
+from benchmarks import load_test
+from benchmarks.load_test import Payloads, Sample
+
+
+def test_weights_are_normalized():
+    assert load_test._weights("analyze=3,batch=1", load_test._kind) == {
+        "analyze": 0.75,
+        "batch": 0.25,
+    }
+    assert load_test._weights("640x480", load_test._size) == {(640, 480): 1.0}
+    with pytest.raises(ValueError, match="Unknown request kind"):
+        load_test._weights("upload=1", load_test._kind)
+
+
+def _payloads(**kwargs) -> Payloads:
+    images = {(8, 8): [b"a", b"b"], (16, 16): [b"c"]}
+    options = {
+        "sizes": {(8, 8): 0.5, (16, 16): 0.5},
+        "mix": {"analyze": 0.5, "batch": 0.5},
+        "url_share": 0.5,
+        "batch_size": 3,
+        "image_base_url": "http://images",
+    }
+    return Payloads(images, **{**options, **kwargs})
+
+
+def test_payloads_follow_the_mix_and_seed():
+    assert _payloads().next() == _payloads().next()  # same seed, same draw
+
+    payloads = _payloads(mix={"batch": 1.0}, url_share=1.0)
+    kind, body, images = payloads.next()
+    items = json.loads(body)["images"]
+    assert (kind, images, len(items)) == ("batch", 3, 3)
+    assert all(item["image_url"].startswith("http://images/") for item in items)
+
+    kind, body, images = _payloads(mix={"analyze": 1.0}, url_share=0.0).next()
+    assert (kind, images) == ("analyze", 1)
+    assert json.loads(body)["image_base64"] in ("YQ==", "Yg==", "Yw==")
+
+
+def test_remote_target_needs_a_reachable_image_host():
+    assert load_test._url_share("asgi", 0.25, None) == 0.25
+    assert load_test._url_share("http://10.0.0.2:8000", 0.25, None) == 0.0
+    assert load_test._url_share("http://10.0.0.2:8000", 0.25, "10.0.0.5") == 0.25
+
+
+def test_summarize_latency_and_errors():
+    samples = [Sample("analyze", float(ms), 1, None) for ms in range(1, 100)]
+    samples.append(Sample("batch", 1000.0, 4, "http 503"))
+
+    summary = load_test.summarize(samples, elapsed=2.0)
+
+    assert (summary["requests"], summary["images"]) == (100, 103)
+    assert summary["req_s"] == 50.0
+    assert (summary["p50_ms"], summary["p99_ms"], summary["max_ms"]) == (50.0, 99.0, 1000.0)
+    assert summary["error_rate"] == 0.01
+    assert summary["errors"] == {"http 503": 1}
+    assert summary["kinds"]["batch"]["error_rate"] == 1.0
+    assert summary["kinds"]["analyze"]["p95_ms"] == 95.0
+
+
+async def test_in_process_run(monkeypatch):
+    # The app's lifespan would apply its thread budget to the whole test process.
+    monkeypatch.setattr("lensforge.app.apply_thread_budget", lambda budget: None)
+    monkeypatch.setattr("lensforge.app.set_request_threads", lambda threads: None)
+    args = argparse.Namespace(
+        target="asgi",
+        concurrency="1,3",
+        requests=6,
+        mix="analyze=1,batch=1",
+        batch_size=2,
+        url_share=0.5,
+        image_host=None,
+        sizes="64x48=1,96x64=1",
+        distinct=2,
+        seed=0,
+        real_models=False,
+        cache=False,
+    )
+
+    report = await load_test.run(args)
+
+    assert [level["concurrency"] for level in report] == [1, 3]
+    for level in report:
+        assert level["requests"] == 6
+        assert level["error_rate"] == 0.0
+        assert level["p50_ms"] <= level["p95_ms"] <= level["p99_ms"]
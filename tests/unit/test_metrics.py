@@ -0,0 +1,167 @@
+"""Prometheus metrics tests (all models mocked)."""
+
+import base64
+import io
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from prometheus_client import REGISTRY
+
+from lensforge.cache.memory import MemoryResultCache
+from lensforge.metrics import InFlightMiddleware
+from lensforge.pipeline.analysis_pipeline import AnalysisPipeline
+from lensforge.pipeline.batching import MicroBatcher
+from lensforge.pipeline.stages import Stage, StageGraph
+from lensforge.warmup import load_stage_models
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def _value(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def _png_base64() -> str:
+    buf = io.BytesIO()
+    Image.new("RGB", (32, 32), color=(120, 80, 60)).save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+async def test_metrics_endpoint_exports_stage_latency_and_results(client):
+    quality = _value("lensforge_stage_seconds_count", stage="quality")
+    load = _value("lensforge_stage_seconds_count", stage="load")
+    success = _value("lensforge_results_total", status="success")
+
+    await client.post("/analyze", json={"image_base64": _png_base64()})
+    resp = await client.get("/metrics")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert 'lensforge_stage_seconds_bucket{le="0.001",stage="classifier"}' in resp.text
+    assert _value("lensforge_stage_seconds_count", stage="quality") == quality + 1
+    assert _value("lensforge_stage_seconds_count", stage="load") == load + 1
+    assert _value("lensforge_results_total", status="success") == success + 1
+
+
+async def test_rejections_and_errors_are_counted(client, mock_nsfw_safe, mock_nsfw_unsafe):
+    mock_nsfw_safe.detect.return_value = mock_nsfw_unsafe.detect.return_value
+    rejected = _value("lensforge_results_total", status="rejected_nsfw")
+    error = _value("lensforge_results_total", status="error")
+
+    await client.post("/analyze", json={"image_base64": _png_base64()})
+    await client.post("/analyze", json={"image_base64": "not-an-image"})
+    await client.post(
+        "/batch-analyze",
+        json={"images": [{"image_base64": _png_base64()}, {"image_base64": "bad"}]},
+    )
+
+    assert _value("lensforge_results_total", status="rejected_nsfw") == rejected + 2
+    assert _value("lensforge_results_total", status="error") == error + 2
+
+
+def test_cache_lookups_and_coalesced(mock_quality_ok, mock_nsfw_safe, mock_classifier):
+    hits = _value("lensforge_cache_lookups_total", result="hit")
+    misses = _value("lensforge_cache_lookups_total", result="miss")
+    pipe = AnalysisPipeline(
+        StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier),
+        cache=MemoryResultCache(),
+    )
+    image = Image.new("RGB", (8, 8))
+
+    pipe.analyze(image)
+    pipe.analyze(image)
+
+    assert _value("lensforge_cache_lookups_total", result="hit") == hits + 1
+    assert _value("lensforge_cache_lookups_total", result="miss") == misses + 1
+
+
+def test_micro_batch_sizes():
+    batcher = MicroBatcher(lambda images: list(images), max_wait_ms=1.0, name="test-batcher")
+    count = _value("lensforge_batch_size_count", batcher="test-batcher")
+
+    batcher(Image.new("RGB", (8, 8)))
+
+    assert _value("lensforge_batch_size_count", batcher="test-batcher") == count + 1
+    assert _value("lensforge_batch_size_sum", batcher="test-batcher") >= 1
+
+
+class Loadable:
+    version = "loadable-1.0"
+
+    def __init__(self) -> None:
+        self.loads = 0
+
+    def load(self) -> None:
+        self.loads += 1
+
+
+def test_model_load_time_recorded_once(mock_quality_ok):
+    component = Loadable()
+    stages = [
+        Stage("loadable", "quality", component),
+        Stage("no-load", "quality", mock_quality_ok),
+    ]
+
+    load_stage_models(stages)
+    load_stage_models(stages)  # e.g. warmup in a worker forked after loading
+
+    assert component.loads == 1
+    assert stages[0].load_seconds is not None
+    assert stages[1].load_seconds is None
+    assert REGISTRY.get_sample_value("lensforge_model_load_seconds", {"stage": "loadable"}) >= 0
+    assert REGISTRY.get_sample_value("lensforge_model_load_seconds", {"stage": "no-load"}) is None
+
+
+async def test_in_flight_gauge():
+    seen: list[float] = []
+
+    async def app(scope, receive, send):
+        seen.append(_value("lensforge_requests_in_flight", endpoint=scope["path"]))
+
+    middleware = InFlightMiddleware(app, paths={"/analyze"})
+    before = _value("lensforge_requests_in_flight", endpoint="/analyze")
+
+    await middleware({"type": "http", "path": "/analyze"}, None, None)
+    await middleware({"type": "http", "path": "/health"}, None, None)
+
+    assert seen == [before + 1, 0.0]
+    assert _value("lensforge_requests_in_flight", endpoint="/analyze") == before
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_multiprocess_mode_aggregates_workers(tmp_path):
+    script = textwrap.dedent(
+        """
+        import os
+        from lensforge import metrics
+
+        metrics.clear_multiprocess_dir()
+        metrics.record_result("success")
+        pid = os.fork()
+        if pid == 0:
+            metrics.record_result("success", 2)
+            os._exit(0)
+        os.waitpid(pid, 0)
+        metrics.mark_process_dead(pid)
+        print(metrics.render()[0].decode())
+        """
+    )
+    stale = tmp_path / "counter_1.db"
+    stale.write_bytes(b"")
+
+    out = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        env={**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "PYTHONPATH": str(ROOT)},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    assert 'lensforge_results_total{status="success"} 3.0' in out
+    assert not stale.exists()
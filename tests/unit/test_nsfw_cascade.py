@@ -0,0 +1,141 @@
+"""Two-tier NSFW cascade tests (both tiers stubbed)."""
+
+import pytest
+from PIL import Image
+from pydantic import ValidationError
+
+from lensforge.config import Settings
+from lensforge.container import _create_nsfw
+from lensforge.interfaces.nsfw_detector import NsfwResult
+from lensforge.pipeline.batching import BatchingNsfwDetector
+from lensforge.pipeline.cascade import CascadeNsfwDetector
+
+
+class ScoreDetector:
+    """Scores an image by its red channel (0-255 → 0.0-1.0)."""
+
+    def __init__(self, version: str = "score-1.0", threshold: float = 0.7, **kwargs) -> None:
+        self.version = version
+        self.threshold = threshold
+        self.kwargs = kwargs
+        self.batches: list[int] = []
+        self.loaded = False
+
+    def load(self) -> None:
+        self.loaded = True
+
+    def detect(self, image: Image.Image) -> NsfwResult:
+        return self.detect_batch([image])[0]
+
+    def detect_batch(self, images: list[Image.Image]) -> list[NsfwResult]:
+        self.batches.append(len(images))
+        results = []
+        for image in images:
+            score = image.getpixel((0, 0))[0] / 255
+            safe = score < self.threshold
+            results.append(NsfwResult(safe, score, None if safe else f"{self.version} unsafe"))
+        return results
+
+
+def _image(red: int) -> Image.Image:
+    return Image.new("RGB", (8, 8), (red, 0, 0))
+
+
+@pytest.fixture
+def tiers() -> tuple[ScoreDetector, ScoreDetector]:
+    return ScoreDetector("fast-1.0"), ScoreDetector("full-1.0")
+
+
+def test_fast_tier_decides_outside_band(tiers):
+    fast, full = tiers
+    cascade = CascadeNsfwDetector(fast, full, low=0.2, high=0.9)
+
+    safe = cascade.detect(_image(10))
+    unsafe = cascade.detect(_image(250))
+
+    assert (safe.is_safe, safe.decided_by) == (True, "fast")
+    assert (unsafe.is_safe, unsafe.decided_by) == (False, "fast")
+    assert unsafe.reason == "fast-1.0 unsafe"
+    assert full.batches == []
+
+
+def test_uncertain_scores_escalate(tiers):
+    fast, full = tiers
+    cascade = CascadeNsfwDetector(fast, full, low=0.2, high=0.9)
+
+    result = cascade.detect(_image(200))  # 0.78: the full tier says unsafe
+
+    assert (result.is_safe, result.decided_by) == (False, "full")
+    assert result.reason == "full-1.0 unsafe"
+    assert cascade.decided == {"fast": 0, "full": 1}
+
+
+def test_batch_escalates_only_the_band_in_one_call(tiers):
+    fast, full = tiers
+    cascade = CascadeNsfwDetector(fast, full, low=0.2, high=0.9)
+
+    results = cascade.detect_batch([_image(r) for r in (0, 100, 255, 150, 20)])
+
+    assert [r.decided_by for r in results] == ["fast", "full", "fast", "full", "fast"]
+    assert [r.is_safe for r in results] == [True, True, False, True, True]
+    assert (fast.batches, full.batches) == ([5], [2])
+    assert cascade.decided == {"fast": 3, "full": 2}
+
+
+def test_version_and_load_cover_both_tiers(tiers):
+    fast, full = tiers
+    cascade = CascadeNsfwDetector(fast, full, low=0.25, high=0.9)
+
+    cascade.load()
+
+    assert cascade.version == "cascade-fast-1.0-0.25-0.9-full-1.0"
+    assert fast.loaded and full.loaded
+
+
+@pytest.mark.parametrize(("low", "high"), [(0.5, 0.4), (-0.1, 0.5), (0.2, 1.5)])
+def test_invalid_band(tiers, low, high):
+    with pytest.raises(ValueError, match="Invalid cascade band"):
+        CascadeNsfwDetector(*tiers, low=low, high=high)
+
+
+def test_container_wraps_configured_detector_in_cascade():
+    detector = _create_nsfw(
+        "tests.unit.test_nsfw_cascade.ScoreDetector",
+        threshold=0.7,
+        max_batch_size=8,
+        max_wait_ms=1.0,
+        cascade=True,
+        cascade_fast_class="tests.unit.test_nsfw_cascade.ScoreDetector",
+        cascade_fast_options={"version": "fast-2.0", "backend": "onnx"},
+        cascade_low=0.1,
+        cascade_high=0.8,
+    )
+
+    assert isinstance(detector, BatchingNsfwDetector)
+    assert detector.version == "cascade-fast-2.0-0.1-0.8-score-1.0"
+    assert detector.detect(_image(255)).decided_by == "fast"
+
+
+def test_fast_tier_inherits_detector_and_onnx_settings():
+    detector = _create_nsfw(
+        "tests.unit.test_nsfw_cascade.ScoreDetector",
+        threshold=0.6,
+        max_batch_size=1,
+        max_wait_ms=1.0,
+        onnx_dir="/srv/onnx",
+        onnx_quantized=False,
+        cascade=True,
+        cascade_fast_class="tests.unit.test_nsfw_cascade.ScoreDetector",
+        cascade_fast_options={"version": "fast-2.0", "backend": "onnx"},
+    )
+
+    fast = detector._fast
+    assert fast.threshold == 0.6
+    assert fast.kwargs == {"backend": "onnx", "onnx_dir": "/srv/onnx", "quantized": False}
+
+
+def test_threshold_must_lie_inside_cascade_band():
+    with pytest.raises(ValidationError, match="NSFW_THRESHOLD"):
+        Settings(nsfw_cascade=True, nsfw_threshold=0.7, nsfw_cascade_low=0.1, nsfw_cascade_high=0.5)
+    # Not checked while the cascade is off.
+    Settings(nsfw_threshold=0.7, nsfw_cascade_low=0.1, nsfw_cascade_high=0.5)
@@ -0,0 +1,118 @@
+"""ONNX Runtime backend tests (session and processor faked)."""
+
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from custom.extensions.dermatology.falconsai_nsfw import FalconsaiNsfwDetector
+from custom.extensions.dermatology.vit_skin import VitSkinClassifier
+from lensforge.config import Settings
+from lensforge.inference import onnx
+from lensforge.inference.onnx import OnnxImagePipeline, check_backend, model_dir
+
+
+class FakeSession:
+    def __init__(self, logits: list[float]) -> None:
+        self._logits = np.array(logits, dtype=np.float32)
+        self.batches: list[int] = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="pixel_values")]
+
+    def run(self, outputs, feeds):
+        batch = feeds["pixel_values"].shape[0]
+        self.batches.append(batch)
+        return [np.tile(self._logits, (batch, 1))]
+
+
+def fake_processor(images, return_tensors):
+    assert return_tensors == "np"
+    return {"pixel_values": np.zeros((len(images), 3, 4, 4), dtype=np.float64)}
+
+
+def _pipe(logits=(2.0, 0.0, 1.0), top_k=5) -> tuple[OnnxImagePipeline, FakeSession]:
+    session = FakeSession(list(logits))
+    return OnnxImagePipeline(session, fake_processor, ["a", "b", "c"], top_k=top_k), session
+
+
+IMG = Image.new("RGB", (8, 8))
+
+
+class TestOnnxImagePipeline:
+    def test_single_image_returns_sorted_softmax(self):
+        pipe, _ = _pipe()
+        result = pipe(IMG)
+
+        assert [r["label"] for r in result] == ["a", "c", "b"]
+        assert sum(r["score"] for r in result) == pytest.approx(1.0)
+        assert result[0]["score"] == pytest.approx(np.exp(2) / (np.exp(2) + 1 + np.exp(1)))
+
+    def test_top_k(self):
+        pipe, _ = _pipe(top_k=1)
+        assert [r["label"] for r in pipe(IMG)] == ["a"]
+
+    def test_batch_is_chunked_by_batch_size(self):
+        pipe, session = _pipe()
+        outputs = pipe([IMG] * 5, batch_size=2)
+
+        assert len(outputs) == 5
+        assert session.batches == [2, 2, 1]
+
+    def test_missing_model_file(self, tmp_path):
+        with pytest.raises(FileNotFoundError, match="lensforge.inference.onnx"):
+            OnnxImagePipeline.from_dir(tmp_path)
+
+
+@pytest.mark.parametrize(("flags", "quantize"), [([], True), (["--no-quantize"], False)])
+def test_export_cli_quantizes_by_default(monkeypatch, flags, quantize):
+    # ONNX_QUANTIZED defaults to true: a plain export must write the int8 model it serves.
+    calls = []
+    monkeypatch.setattr(onnx, "export_model", lambda name, out, quantize: calls.append(quantize))
+    monkeypatch.setattr(sys, "argv", ["onnx", "org/model", *flags])
+
+    onnx.main()
+
+    assert calls == [quantize]
+    assert Settings.model_fields["onnx_quantized"].default is True
+
+
+def test_model_dir_flattens_org():
+    assert model_dir("models/onnx", "org/name").as_posix() == "models/onnx/org__name"
+
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError, match="Unknown inference backend"):
+        check_backend("tensorrt")
+    with pytest.raises(ValueError):
+        VitSkinClassifier(backend="tensorrt")
+
+
+class TestExtensionsOnOnnx:
+    def test_vit_skin_uses_onnx_pipeline_output(self):
+        session = FakeSession([0.1, 3.0])
+        pipe = OnnxImagePipeline(session, fake_processor, ["nv", "mel"])
+        classifier = VitSkinClassifier(backend="onnx", _pipeline=pipe)
+
+        result = classifier.classify(IMG)
+
+        assert result.predictions[0].label == "mel"
+        assert result.predictions[0].risk_level == "high"
+        assert classifier.version.endswith("-onnx-int8")
+
+    def test_falconsai_batch_on_onnx(self):
+        session = FakeSession([0.0, 4.0])
+        pipe = OnnxImagePipeline(session, fake_processor, ["normal", "nsfw"])
+        detector = FalconsaiNsfwDetector(backend="onnx", quantized=False, _pipeline=pipe)
+
+        results = detector.detect_batch([IMG, IMG])
+
+        assert [r.is_safe for r in results] == [False, False]
+        assert session.batches == [2]
+        assert detector.version == "falconsai-nsfw-vit-1.0-onnx"
+
+    def test_version_unchanged_on_torch(self):
+        assert FalconsaiNsfwDetector().version == "falconsai-nsfw-vit-1.0"
+        assert VitSkinClassifier().version == "vit-skin-Skin_Cancer-Image_Classification"
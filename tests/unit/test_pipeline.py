@@ -1,13 +1,24 @@
 """AnalysisPipeline tests (all models mocked)."""
 
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from PIL import Image
 
+from lensforge.cache.memory import MemoryResultCache
+from lensforge.interfaces.nsfw_detector import NsfwResult
+from lensforge.interfaces.quality_checker import QualityResult
 from lensforge.pipeline.analysis_pipeline import DISCLAIMER, AnalysisPipeline
+from lensforge.pipeline.singleflight import SingleFlight
+from lensforge.pipeline.stages import StageGraph
 
 
 class TestPipelineRejection:
     def test_rejects_low_quality(self, mock_quality_bad, mock_nsfw_safe, mock_classifier):
-        pipe = AnalysisPipeline(mock_quality_bad, mock_nsfw_safe, mock_classifier)
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_bad, mock_nsfw_safe, mock_classifier)
+        )
         result = pipe.analyze(Image.new("RGB", (224, 224)))
 
         assert result.status == "rejected_quality"
@@ -16,7 +27,9 @@ class TestPipelineRejection:
         mock_classifier.classify.assert_not_called()
 
     def test_rejects_nsfw(self, mock_quality_ok, mock_nsfw_unsafe, mock_classifier):
-        pipe = AnalysisPipeline(mock_quality_ok, mock_nsfw_unsafe, mock_classifier)
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_unsafe, mock_classifier)
+        )
         result = pipe.analyze(Image.new("RGB", (224, 224)))
 
         assert result.status == "rejected_nsfw"
@@ -26,7 +39,9 @@ class TestPipelineRejection:
 
 class TestPipelineSuccess:
     def test_full_pipeline(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
-        pipe = AnalysisPipeline(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+        )
         result = pipe.analyze(Image.new("RGB", (224, 224)))
 
         assert result.status == "success"
@@ -35,14 +50,18 @@ class TestPipelineSuccess:
         assert result.predictions[0].label == "nv"
 
     def test_includes_disclaimer(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
-        pipe = AnalysisPipeline(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+        )
         result = pipe.analyze(Image.new("RGB", (224, 224)))
 
         assert result.disclaimer == DISCLAIMER
         assert "NOT a medical diagnosis" in result.disclaimer
 
     def test_includes_model_versions(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
-        pipe = AnalysisPipeline(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+        )
         result = pipe.analyze(Image.new("RGB", (224, 224)))
 
         assert "nn1_quality" in result.model_versions
@@ -50,15 +69,390 @@ class TestPipelineSuccess:
         assert "nn2" in result.model_versions
 
     def test_measures_inference_time(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
-        pipe = AnalysisPipeline(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+        )
         result = pipe.analyze(Image.new("RGB", (224, 224)))
 
         assert result.inference_time_ms >= 0
 
     def test_melanoma_high_urgency(self, mock_quality_ok, mock_nsfw_safe, mock_classifier_melanoma):
-        pipe = AnalysisPipeline(mock_quality_ok, mock_nsfw_safe, mock_classifier_melanoma)
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier_melanoma)
+        )
         result = pipe.analyze(Image.new("RGB", (224, 224)))
 
         assert result.status == "success"
         assert result.predictions[0].risk_level == "high"
         assert "days" in (result.urgency or "").lower()
+
+
+class TestPipelineBatch:
+    def test_all_success(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+        )
+        results = pipe.analyze_batch([Image.new("RGB", (224, 224))] * 3)
+
+        assert [r.status for r in results] == ["success"] * 3
+        assert all(r.disclaimer == DISCLAIMER for r in results)
+        assert "nn2" in results[0].model_versions
+
+    def test_empty_batch(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+        )
+        assert pipe.analyze_batch([]) == []
+        mock_quality_ok.check.assert_not_called()
+
+    def test_only_survivors_reach_next_stage(
+        self, mock_quality_ok, mock_nsfw_safe, mock_classifier
+    ):
+        blurry = Image.new("RGB", (224, 224), color="gray")
+        nsfw = Image.new("RGB", (224, 224), color="red")
+        ok = Image.new("RGB", (224, 224), color="blue")
+
+        mock_quality_ok.check.side_effect = lambda img: (
+            QualityResult(score=0.1, is_acceptable=False, reason="Too blurry")
+            if img is blurry
+            else QualityResult(score=0.9, is_acceptable=True)
+        )
+        mock_nsfw_safe.detect.side_effect = lambda img: (
+            NsfwResult(is_safe=False, nsfw_score=0.9, reason="NSFW content")
+            if img is nsfw
+            else NsfwResult(is_safe=True, nsfw_score=0.01)
+        )
+
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+        )
+        results = pipe.analyze_batch([blurry, nsfw, ok])
+
+        assert [r.status for r in results] == ["rejected_quality", "rejected_nsfw", "success"]
+        assert mock_nsfw_safe.detect.call_count == 2
+        mock_classifier.classify.assert_called_once_with(ok)
+
+    def test_uses_batch_methods(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        class BatchClassifier:
+            version = "batch-1.0"
+
+            def __init__(self):
+                self.batches = []
+
+            def classify(self, image):
+                raise AssertionError("classify_batch should be used")
+
+            def classify_batch(self, images):
+                self.batches.append(len(images))
+                return [mock_classifier.classify.return_value for _ in images]
+
+        classifier = BatchClassifier()
+        pipe = AnalysisPipeline(StageGraph.default(mock_quality_ok, mock_nsfw_safe, classifier))
+        results = pipe.analyze_batch([Image.new("RGB", (224, 224))] * 4)
+
+        assert len(results) == 4
+        assert classifier.batches == [4]
+
+
+class TestPipelineCache:
+    def test_second_call_is_cached(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        cache = MemoryResultCache()
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier), cache=cache
+        )
+
+        first = pipe.analyze(Image.new("RGB", (224, 224), color="red"))
+        second = pipe.analyze(Image.new("RGB", (224, 224), color="red"))
+
+        assert second.predictions == first.predictions
+        assert mock_classifier.classify.call_count == 1
+        assert (cache.stats().hits, cache.stats().misses) == (1, 1)
+
+    def test_model_upgrade_invalidates(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        cache = MemoryResultCache()
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier), cache=cache
+        )
+        pipe.analyze(Image.new("RGB", (224, 224)))
+
+        mock_classifier.version = "mock-skin-2.0"
+        result = pipe.analyze(Image.new("RGB", (224, 224)))
+
+        assert result.model_versions["nn2"] == "mock-skin-2.0"
+        assert mock_classifier.classify.call_count == 2
+
+    def test_threshold_change_invalidates(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        cache = MemoryResultCache()
+        graph = StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+        AnalysisPipeline(graph, cache=cache, cache_settings={"nsfw_threshold": 0.7}).analyze(
+            Image.new("RGB", (224, 224))
+        )
+
+        AnalysisPipeline(graph, cache=cache, cache_settings={"nsfw_threshold": 0.5}).analyze(
+            Image.new("RGB", (224, 224))
+        )
+
+        assert mock_classifier.classify.call_count == 2
+        assert cache.stats().hits == 0
+
+    def test_batch_only_runs_misses(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        cache = MemoryResultCache()
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier), cache=cache
+        )
+        pipe.analyze(Image.new("RGB", (224, 224), color="red"))
+
+        results = pipe.analyze_batch(
+            [Image.new("RGB", (224, 224), color="red"), Image.new("RGB", (224, 224), color="blue")]
+        )
+
+        assert [r.status for r in results] == ["success", "success"]
+        assert mock_classifier.classify.call_count == 2
+        assert cache.stats().hits == 1
+
+
+class TestPipelineCoalescing:
+    def test_concurrent_identical_images_share_analysis(
+        self, mock_quality_ok, mock_nsfw_safe, mock_classifier
+    ):
+        result = mock_classifier.classify.return_value
+        started = threading.Event()
+
+        def slow_classify(image):
+            started.set()
+            time.sleep(0.1)
+            return result
+
+        mock_classifier.classify.side_effect = slow_classify
+        inflight = SingleFlight()
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier), inflight=inflight
+        )
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            first = pool.submit(pipe.analyze, Image.new("RGB", (224, 224), color="red"))
+            started.wait(timeout=1)
+            second = pool.submit(pipe.analyze, Image.new("RGB", (224, 224), color="red"))
+            responses = [first.result(), second.result()]
+
+        assert [r.status for r in responses] == ["success", "success"]
+        assert responses[0].predictions == responses[1].predictions
+        assert mock_classifier.classify.call_count == 1
+        assert inflight.coalesced == 1
+
+    def test_batch_deduplicates_items(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        inflight = SingleFlight()
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier), inflight=inflight
+        )
+        red = Image.new("RGB", (224, 224), color="red")
+        blue = Image.new("RGB", (224, 224), color="blue")
+
+        results = pipe.analyze_batch([red, blue, red.copy(), red.copy()])
+
+        assert len(results) == 4
+        assert all(r.status == "success" for r in results)
+        assert mock_classifier.classify.call_count == 2
+        assert inflight.coalesced == 2
+
+    def test_batch_waits_on_inflight_single(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        result = mock_classifier.classify.return_value
+        started = threading.Event()
+
+        def slow_classify(image):
+            started.set()
+            time.sleep(0.1)
+            return result
+
+        mock_classifier.classify.side_effect = slow_classify
+        inflight = SingleFlight()
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier), inflight=inflight
+        )
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            single = pool.submit(pipe.analyze, Image.new("RGB", (224, 224), color="red"))
+            started.wait(timeout=1)
+            batch = pool.submit(pipe.analyze_batch, [Image.new("RGB", (224, 224), color="red")])
+            assert single.result().status == "success"
+            assert batch.result()[0].status == "success"
+
+        assert mock_classifier.classify.call_count == 1
+
+
+class TestPipelineParallelStages:
+    def test_classifier_overlaps_safety_check(
+        self, mock_quality_ok, mock_nsfw_safe, mock_classifier
+    ):
+        classifying = threading.Event()
+        result = mock_classifier.classify.return_value
+
+        def classify(image):
+            classifying.set()
+            return result
+
+        def detect(image):
+            # Only returns once the classifier has started on the other thread.
+            assert classifying.wait(timeout=1)
+            return mock_nsfw_safe.detect.return_value
+
+        mock_classifier.classify.side_effect = classify
+        mock_nsfw_safe.detect.side_effect = detect
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pipe = AnalysisPipeline(
+                StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier),
+                stage_executor=executor,
+            )
+            response = pipe.analyze(Image.new("RGB", (224, 224)))
+
+        assert response.status == "success"
+        assert response.predictions[0].label == "nv"
+
+    def test_safety_check_overlaps_quality_check(
+        self, mock_quality_ok, mock_nsfw_safe, mock_classifier
+    ):
+        detecting = threading.Event()
+        quality = mock_quality_ok.check.return_value
+
+        def detect(image):
+            detecting.set()
+            return mock_nsfw_safe.detect.return_value
+
+        def check(image):
+            # Only returns once the NSFW check has started on the other thread.
+            assert detecting.wait(timeout=1)
+            return quality
+
+        mock_nsfw_safe.detect.side_effect = detect
+        mock_quality_ok.check.side_effect = check
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pipe = AnalysisPipeline(
+                StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier),
+                stage_executor=executor,
+            )
+            response = pipe.analyze(Image.new("RGB", (224, 224)))
+
+        assert response.status == "success"
+
+    def test_nsfw_rejection_wins(self, mock_quality_ok, mock_nsfw_unsafe, mock_classifier):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pipe = AnalysisPipeline(
+                StageGraph.default(mock_quality_ok, mock_nsfw_unsafe, mock_classifier),
+                stage_executor=executor,
+            )
+            response = pipe.analyze(Image.new("RGB", (224, 224)))
+
+        assert response.status == "rejected_nsfw"
+        assert response.predictions == []
+
+    def test_rejection_cancels_queued_classification(
+        self, mock_quality_ok, mock_nsfw_unsafe, mock_classifier
+    ):
+        release = threading.Event()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(release.wait, 1)  # occupy the only thread
+            pipe = AnalysisPipeline(
+                StageGraph.default(mock_quality_ok, mock_nsfw_unsafe, mock_classifier),
+                stage_executor=executor,
+            )
+            response = pipe.analyze(Image.new("RGB", (224, 224)))
+            release.set()
+
+        assert response.status == "rejected_nsfw"
+        mock_classifier.classify.assert_not_called()
+
+    def test_quality_rejection_skips_classifier(
+        self, mock_quality_bad, mock_nsfw_safe, mock_classifier
+    ):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pipe = AnalysisPipeline(
+                StageGraph.default(mock_quality_bad, mock_nsfw_safe, mock_classifier),
+                stage_executor=executor,
+            )
+            response = pipe.analyze(Image.new("RGB", (224, 224)))
+
+        assert response.status == "rejected_quality"
+        mock_classifier.classify.assert_not_called()
+
+    def test_batch_keeps_statuses(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        blurry = Image.new("RGB", (224, 224), color="gray")
+        nsfw = Image.new("RGB", (224, 224), color="red")
+        ok = Image.new("RGB", (224, 224), color="blue")
+        mock_quality_ok.check.side_effect = lambda img: QualityResult(
+            score=0.5, is_acceptable=img is not blurry, reason=None
+        )
+        mock_nsfw_safe.detect.side_effect = lambda img: NsfwResult(
+            is_safe=img is not nsfw, nsfw_score=0.5
+        )
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pipe = AnalysisPipeline(
+                StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier),
+                stage_executor=executor,
+            )
+            results = pipe.analyze_batch([blurry, nsfw, ok])
+
+        assert [r.status for r in results] == ["rejected_quality", "rejected_nsfw", "success"]
+        # Only images that passed quality are classified (the NSFW one only if
+        # classification started before the NSFW check finished).
+        classified = [c.args[0] for c in mock_classifier.classify.call_args_list]
+        assert ok in classified
+        assert blurry not in classified
+
+
+class TestPipelineStageTimings:
+    def test_off_by_default(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+        )
+
+        assert pipe.analyze(Image.new("RGB", (224, 224))).stage_timings_ms is None
+
+    def test_timings_per_stage_that_ran(self, mock_quality_ok, mock_nsfw_unsafe, mock_classifier):
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_unsafe, mock_classifier),
+            stage_timings=True,
+        )
+
+        response = pipe.analyze(Image.new("RGB", (224, 224)))
+
+        assert set(response.stage_timings_ms) == {"quality", "nsfw"}
+        assert all(ms >= 0 for ms in response.stage_timings_ms.values())
+
+    def test_per_call_override_and_batch(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+        )
+
+        results = pipe.analyze_batch(
+            [Image.new("RGB", (224, 224)), Image.new("RGB", (224, 224), "red")],
+            stage_timings=True,
+        )
+
+        assert [set(r.stage_timings_ms) for r in results] == [{"quality", "nsfw", "classifier"}] * 2
+
+    def test_cache_hit_reports_no_stages(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier),
+            cache=MemoryResultCache(),
+        )
+        image = Image.new("RGB", (224, 224))
+
+        first = pipe.analyze(image, stage_timings=True)
+        second = pipe.analyze(image, stage_timings=True)
+        third = pipe.analyze(image)
+
+        assert set(first.stage_timings_ms) == {"quality", "nsfw", "classifier"}
+        assert second.stage_timings_ms == {}
+        assert third.stage_timings_ms is None
+
+    def test_parallel_stages_report_timings(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pipe = AnalysisPipeline(
+                StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier),
+                stage_executor=executor,
+                stage_timings=True,
+            )
+            response = pipe.analyze(Image.new("RGB", (224, 224)))
+
+        assert set(response.stage_timings_ms) == {"quality", "nsfw", "classifier"}
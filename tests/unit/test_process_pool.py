@@ -0,0 +1,169 @@
+"""InferencePool tests with lightweight stand-in models in spawned workers."""
+
+import os
+import threading
+import time
+from functools import partial
+from unittest.mock import MagicMock
+
+import cv2
+import pytest
+from PIL import Image
+
+from lensforge.container import _create_inference_pool, _create_nsfw
+from lensforge.interfaces.nsfw_detector import NsfwResult
+from lensforge.interfaces.quality_checker import QualityResult
+from lensforge.pipeline.process_pool import (
+    InferencePool,
+    PooledNsfwDetector,
+    PooledQualityChecker,
+    WorkerCrashedError,
+)
+from lensforge.threads import ThreadBudget, available_cpus, init_inference_worker, worker_cpus
+
+CRASH_SIZE = (13, 13)
+
+
+class PixelChecker:
+    """Reports the mean of the red channel, so pixels must arrive intact."""
+
+    version = "pixel-1.0"
+
+    def check(self, image: Image.Image) -> QualityResult:
+        if image.size == CRASH_SIZE:
+            os._exit(3)
+        if image.size == (7, 7):
+            raise ValueError("bad image")
+        red = image.getchannel("R").getdata()
+        return QualityResult(score=sum(red) / len(red), is_acceptable=True, reason=str(os.getpid()))
+
+
+class SlowDetector:
+    version = "slow-1.0"
+
+    def detect_batch(self, images: list[Image.Image]) -> list[NsfwResult]:
+        time.sleep(0.3)
+        return [NsfwResult(is_safe=True, nsfw_score=0.0, reason=str(os.getpid())) for _ in images]
+
+
+class AffinityChecker:
+    version = "affinity-1.0"
+
+    def check(self, image: Image.Image) -> QualityResult:
+        cpus = ",".join(str(cpu) for cpu in sorted(os.sched_getaffinity(0)))
+        return QualityResult(score=cv2.getNumThreads(), is_acceptable=True, reason=cpus)
+
+
+def build_affinity_model() -> dict[str, object]:
+    return {"quality": AffinityChecker()}
+
+
+def build_models(models: list[str]) -> dict[str, object]:
+    stages = {"quality": PixelChecker, "nsfw": SlowDetector}
+    return {name: stages[name]() for name in models}
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = InferencePool(partial(build_models, ["quality", "nsfw"]), ["quality", "nsfw"], 2)
+    yield pool
+    pool.close()
+
+
+def test_images_arrive_through_shared_memory(pool):
+    checker = PooledQualityChecker(pool, PixelChecker())
+    images = [Image.new("RGB", (32, 20), color=(red, 0, 0)) for red in (10, 200, 77)]
+
+    results = checker.check_batch(images)
+
+    assert [r.score for r in results] == [10, 200, 77]
+    assert all(int(r.reason) != os.getpid() for r in results)
+    assert checker.version == "pixel-1.0"
+
+
+def test_buffer_grows_for_large_batches(pool):
+    checker = PooledQualityChecker(pool, PixelChecker())
+    images = [Image.new("RGB", (1024, 1024), color=(i, 0, 0)) for i in range(4)]
+
+    assert [r.score for r in checker.check_batch(images)] == [0, 1, 2, 3]
+
+
+def test_model_errors_propagate(pool):
+    checker = PooledQualityChecker(pool, PixelChecker())
+    with pytest.raises(ValueError, match="bad image"):
+        checker.check(Image.new("RGB", (7, 7)))
+    assert checker.check(Image.new("RGB", (8, 8), color=(5, 0, 0))).score == 5
+
+
+def test_calls_run_in_parallel_workers(pool):
+    detector = PooledNsfwDetector(pool, SlowDetector())
+    pids: list[str] = []
+
+    def call() -> None:
+        pids.append(detector.detect(Image.new("RGB", (8, 8))).reason)
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(set(pids)) == 2
+    assert time.monotonic() - start < 0.55
+
+
+def test_crashed_worker_is_respawned(pool):
+    checker = PooledQualityChecker(pool, PixelChecker())
+    restarts = pool.restarts
+
+    with pytest.raises(WorkerCrashedError, match="exit code 3"):
+        checker.check(Image.new("RGB", CRASH_SIZE))
+
+    assert pool.restarts == restarts + 1
+    for _ in range(pool.size):
+        assert checker.check(Image.new("RGB", (8, 8), color=(9, 0, 0))).score == 9
+
+
+def test_unknown_stage_rejected():
+    with pytest.raises(ValueError, match="Unknown pool models"):
+        InferencePool(partial(build_models, []), ["ocr"], 1)
+
+
+def test_no_pool_without_workers():
+    assert _create_inference_pool(0, ["nsfw"], {}) is None
+
+
+def test_container_routes_pooled_models_to_pool():
+    pool = MagicMock(models=frozenset({"nsfw"}))
+    detector = _create_nsfw(
+        "custom.extensions.dermatology.falconsai_nsfw.FalconsaiNsfwDetector",
+        threshold=0.7,
+        max_batch_size=8,
+        max_wait_ms=5.0,
+        pool=pool,
+    )
+
+    assert isinstance(detector, PooledNsfwDetector)
+    assert detector.version == "falconsai-nsfw-vit-1.0"
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="Linux only")
+def test_initializer_pins_workers_and_applies_budget():
+    budget = ThreadBudget.derive(cpu_threads=2, opencv_threads=3)
+    pool = InferencePool(
+        build_affinity_model,
+        ["quality"],
+        2,
+        initializer=partial(init_inference_worker, budget, True),
+    )
+    try:
+        checker = PooledQualityChecker(pool, AffinityChecker())
+        results = [checker.check(Image.new("RGB", (4, 4))) for _ in range(2)]
+    finally:
+        pool.close()
+
+    cpus = available_cpus()
+    expected = {",".join(map(str, worker_cpus(i, 2, cpus))) for i in range(2)}
+    assert {r.reason for r in results} <= expected
+    assert all(r.score == 3 for r in results)
@@ -0,0 +1,75 @@
+"""Sampled request profiler tests."""
+
+import pstats
+import time
+
+from PIL import Image
+
+from lensforge.container import _create_profiler
+from lensforge.pipeline.analysis_pipeline import AnalysisPipeline
+from lensforge.pipeline.stages import StageGraph
+from lensforge.profiling import RequestProfiler
+
+
+def _busy(ms: float) -> None:
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        pass
+
+
+def test_cprofiles_one_in_n(tmp_path):
+    profiler = RequestProfiler(tmp_path, sample_every=3)
+
+    for _ in range(6):
+        with profiler.profile("analyze"):
+            _busy(1)
+
+    files = list(tmp_path.glob("*.prof"))
+    assert sorted(int(path.name.split("-")[2]) for path in files) == [3, 6]
+    stats = pstats.Stats(str(files[0]))
+    assert any(func[2] == "_busy" for func in stats.stats)  # type: ignore[attr-defined]
+
+
+def test_keeps_stacks_of_slow_requests_only(tmp_path):
+    profiler = RequestProfiler(tmp_path, slow_ms=30, interval_ms=1)
+
+    with profiler.profile("fast"):
+        _busy(1)
+    with profiler.profile("slow"):
+        _busy(60)
+
+    (folded,) = tmp_path.glob("*.folded")
+    assert "-slow-" in folded.name
+    stack, count = folded.read_text().splitlines()[0].rsplit(" ", 1)
+    assert stack.endswith("test_profiling.py:_busy")
+    assert int(count) > 0
+
+
+def test_max_files(tmp_path):
+    profiler = RequestProfiler(tmp_path, sample_every=1, max_files=2)
+
+    for _ in range(4):
+        with profiler.profile("analyze"):
+            pass
+
+    assert profiler.written == 2
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_pipeline_runs_under_profiler(tmp_path, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+    pipe = AnalysisPipeline(
+        StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier),
+        profiler=RequestProfiler(tmp_path, sample_every=1),
+    )
+
+    pipe.analyze(Image.new("RGB", (224, 224)))
+    pipe.analyze_batch([Image.new("RGB", (224, 224))])
+
+    names = sorted(path.name.split("-")[3] for path in tmp_path.glob("*.prof"))
+    assert names == ["analyze", "analyze_batch"]
+
+
+def test_container_leaves_profiling_off_without_trigger(tmp_path):
+    assert _create_profiler("", 10, 0.0, 5.0, 100) is None
+    assert _create_profiler(str(tmp_path), 0, 0.0, 5.0, 100) is None
+    assert isinstance(_create_profiler(str(tmp_path), 0, 500.0, 5.0, 100), RequestProfiler)
@@ -0,0 +1,181 @@
+"""Result cache backend and key tests."""
+
+import multiprocessing
+import time
+
+import pytest
+from PIL import Image
+
+from lensforge.cache.disk import DiskResultCache
+from lensforge.cache.keys import image_digest, result_key
+from lensforge.cache.memory import MemoryResultCache
+from lensforge.cache.sqlite import EVICT_EVERY_WRITES, SqliteResultCache
+from lensforge.schemas.response import AnalyzeResponse
+
+VERSIONS = {"nn2": "v1"}
+
+
+def _response(status: str = "success", versions: dict[str, str] = VERSIONS) -> AnalyzeResponse:
+    return AnalyzeResponse(status=status, disclaimer="AI only", model_versions=versions)
+
+
+class TestKeys:
+    def test_same_pixels_same_digest(self):
+        a = Image.new("RGB", (32, 32), color=(1, 2, 3))
+        b = Image.new("RGB", (32, 32), color=(1, 2, 3))
+        assert image_digest(a) == image_digest(b)
+
+    def test_different_pixels_or_size(self):
+        base = image_digest(Image.new("RGB", (32, 32), color=(1, 2, 3)))
+        assert image_digest(Image.new("RGB", (32, 32), color=(1, 2, 4))) != base
+        assert image_digest(Image.new("RGB", (16, 64), color=(1, 2, 3))) != base
+
+    def test_model_versions_change_key(self):
+        digest = image_digest(Image.new("RGB", (8, 8)))
+        assert result_key(digest, {"nn2": "v1"}) != result_key(digest, {"nn2": "v2"})
+        assert result_key(digest, {"a": "1", "b": "2"}) == result_key(digest, {"b": "2", "a": "1"})
+
+    def test_settings_change_key(self):
+        digest = image_digest(Image.new("RGB", (8, 8)))
+        versions = {"nn2": "v1"}
+        strict = result_key(digest, versions, {"nsfw_threshold": 0.5})
+        assert strict != result_key(digest, versions, {"nsfw_threshold": 0.7})
+        assert strict != result_key(digest, versions)
+        assert result_key(digest, versions, {}) == result_key(digest, versions)
+
+
+@pytest.fixture(params=["memory", "disk", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        return MemoryResultCache(max_entries=3, ttl_seconds=60)
+    if request.param == "disk":
+        return DiskResultCache(str(tmp_path), max_entries=3, ttl_seconds=60)
+    return SqliteResultCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=60)
+
+
+class TestBackends:
+    def test_miss_then_hit(self, cache):
+        assert cache.get("k", VERSIONS) is None
+        cache.set("k", _response())
+        assert cache.get("k", VERSIONS).status == "success"
+
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.entries) == (1, 1, 1)
+        assert stats.hit_ratio == 0.5
+
+    def test_returns_copies(self, cache):
+        cache.set("k", _response())
+        cache.get("k", VERSIONS).predictions.append(None)
+        assert cache.get("k", VERSIONS).predictions == []
+
+    def test_bounded(self, cache):
+        if isinstance(cache, SqliteResultCache):
+            pytest.skip("sqlite backend is bounded by bytes, see TestSqlite")
+        for i in range(10):
+            cache.set(f"k{i}", _response())
+        assert cache.stats().entries <= 3
+        assert cache.get("k9", VERSIONS) is not None
+
+    def test_stale_model_versions_never_returned(self, cache):
+        cache.set("k", _response(versions={"nn2": "v1"}))
+        assert cache.get("k", {"nn2": "v2"}) is None
+
+    def test_expires(self, tmp_path):
+        for cache in (
+            MemoryResultCache(ttl_seconds=0.01),
+            DiskResultCache(str(tmp_path), ttl_seconds=0.01),
+            SqliteResultCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=0.01),
+        ):
+            cache.set("k", _response())
+            time.sleep(0.02)
+            assert cache.get("k", VERSIONS) is None
+
+
+class TestMemoryLru:
+    def test_evicts_least_recently_used(self):
+        cache = MemoryResultCache(max_entries=2)
+        cache.set("a", _response())
+        cache.set("b", _response())
+        cache.get("a", VERSIONS)
+        cache.set("c", _response())
+
+        assert cache.get("a", VERSIONS) is not None
+        assert cache.get("b", VERSIONS) is None
+
+
+class TestDiskPersistence:
+    def test_entry_removed_after_read_is_still_a_hit(self, tmp_path, monkeypatch):
+        cache = DiskResultCache(str(tmp_path))
+        cache.set("k", _response())
+
+        def evicted(path, *args):
+            raise FileNotFoundError(path)
+
+        monkeypatch.setattr("lensforge.cache.disk.os.utime", evicted)
+        assert cache.get("k", VERSIONS) is not None
+        assert cache.stats().hits == 1
+
+    def test_failed_write_leaves_no_temp_file(self, tmp_path, monkeypatch):
+        cache = DiskResultCache(str(tmp_path))
+
+        def full_disk(*args, **kwargs):
+            raise OSError("No space left on device")
+
+        monkeypatch.setattr("lensforge.cache.disk.json.dump", full_disk)
+        with pytest.raises(OSError):
+            cache.set("k", _response())
+        assert list(tmp_path.iterdir()) == []
+
+    def test_survives_new_instance(self, tmp_path):
+        DiskResultCache(str(tmp_path)).set("k", _response("rejected_nsfw"))
+
+        reopened = DiskResultCache(str(tmp_path))
+        assert reopened.stats().entries == 1
+        assert reopened.get("k", VERSIONS).status == "rejected_nsfw"
+
+    def test_corrupt_entry_is_miss(self, tmp_path):
+        (tmp_path / "k.json").write_text("{not json")
+        assert DiskResultCache(str(tmp_path)).get("k", VERSIONS) is None
+
+
+def _hammer(path: str, worker: int, n: int) -> None:
+    cache = SqliteResultCache(path)
+    for i in range(n):
+        cache.set(f"w{worker}-{i}", _response())
+        assert cache.get(f"w{worker}-{i}", VERSIONS) is not None
+
+
+class TestSqlite:
+    def test_evicts_least_recently_used_past_max_bytes(self, tmp_path):
+        entry_size = len(_response().model_dump_json())
+        cache = SqliteResultCache(str(tmp_path / "c.sqlite3"), max_bytes=entry_size * 10)
+        for i in range(EVICT_EVERY_WRITES):
+            cache.set(f"k{i}", _response())
+            time.sleep(0.001)
+
+        assert cache.stats().entries <= 10
+        assert cache.get(f"k{EVICT_EVERY_WRITES - 1}", VERSIONS) is not None
+        assert cache.get("k0", VERSIONS) is None
+
+    def test_purge_stale(self, tmp_path):
+        cache = SqliteResultCache(str(tmp_path / "c.sqlite3"))
+        cache.set("old", _response(versions={"nn2": "v1"}))
+        cache.set("new", _response(versions={"nn2": "v2"}))
+
+        assert cache.purge_stale({"nn2": "v2"}) == 1
+        assert cache.stats().entries == 1
+
+    def test_shared_across_processes(self, tmp_path):
+        path = str(tmp_path / "c.sqlite3")
+        SqliteResultCache(path)
+        ctx = multiprocessing.get_context("spawn")
+        procs = [ctx.Process(target=_hammer, args=(path, w, 25)) for w in range(4)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(timeout=60)
+
+        assert [p.exitcode for p in procs] == [0, 0, 0, 0]
+        cache = SqliteResultCache(path)
+        assert cache.stats().entries == 100
+        assert cache.get("w3-24", VERSIONS) is not None
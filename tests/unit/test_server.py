@@ -0,0 +1,142 @@
+"""Fork-after-load server tests (real processes, stand-in models)."""
+
+import base64
+import io
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+from PIL import Image
+
+from lensforge.interfaces.domain_classifier import ClassificationResult
+from lensforge.interfaces.nsfw_detector import NsfwResult
+from lensforge.interfaces.quality_checker import QualityResult
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+class LoadTracking:
+    """Records the pid that loaded it in ``version``; inference must not reload."""
+
+    def __init__(self, **kwargs: object) -> None:
+        self.loaded_by: int | None = None
+
+    @property
+    def version(self) -> str:
+        return f"loaded-by-{self.loaded_by}"
+
+    def load(self) -> None:
+        self.loaded_by = os.getpid()
+
+
+class FakeQuality(LoadTracking):
+    def check(self, image):
+        return QualityResult(score=1.0, is_acceptable=True)
+
+
+class FakeNsfw(LoadTracking):
+    def detect(self, image):
+        return NsfwResult(is_safe=True, nsfw_score=0.0)
+
+
+class FakeClassifier(LoadTracking):
+    def classify(self, image):
+        return ClassificationResult(detected=True, description=str(os.getpid()))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _children(pid: int) -> set[int]:
+    path = Path(f"/proc/{pid}/task/{pid}/children")
+    return {int(p) for p in path.read_text().split()} if path.exists() else set()
+
+
+def _wait_for(predicate, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if predicate():
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise AssertionError("condition not met in time")
+
+
+@pytest.fixture
+def server():
+    port = _free_port()
+    module = "tests.unit.test_server"
+    env = {
+        **os.environ,
+        "QUALITY_CLASS": f"{module}.FakeQuality",
+        "NSFW_CLASS": f"{module}.FakeNsfw",
+        "CLASSIFIER_CLASS": f"{module}.FakeClassifier",
+        "RESULT_CACHE_BACKEND": "none",
+        "PYTHONPATH": str(ROOT),
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "lensforge.server", "--workers", "2"]
+        + ["--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_for(lambda: httpx.get(f"{base_url}/ready").status_code == 200)
+        _wait_for(lambda: len(_children(proc.pid)) == 2)
+        yield proc, base_url
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=20)
+
+
+@pytest.mark.skipif(not Path("/proc").exists(), reason="needs /proc")
+def test_workers_share_models_loaded_in_parent(server):
+    proc, base_url = server
+    buf = io.BytesIO()
+    Image.new("RGB", (32, 32), color=(120, 80, 60)).save(buf, format="PNG")
+
+    resp = httpx.post(
+        f"{base_url}/analyze", json={"image_base64": base64.b64encode(buf.getvalue()).decode()}
+    )
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["model_versions"]["nn2"] == f"loaded-by-{proc.pid}"
+    assert int(body["main_description"]) in _children(proc.pid)
+
+
+@pytest.mark.skipif(not Path("/proc").exists(), reason="needs /proc")
+def test_dead_worker_is_respawned(server):
+    proc, base_url = server
+    victim = min(_children(proc.pid))
+
+    os.kill(victim, signal.SIGKILL)
+
+    _wait_for(lambda: victim not in _children(proc.pid) and len(_children(proc.pid)) == 2)
+    assert httpx.get(f"{base_url}/health").status_code == 200
+
+
+def test_sigterm_stops_all_workers(server):
+    proc, _ = server
+    children = _children(proc.pid)
+
+    proc.send_signal(signal.SIGTERM)
+    assert proc.wait(timeout=20) == 0
+    for pid in children:
+        assert not Path(f"/proc/{pid}").exists() or "Z" in Path(f"/proc/{pid}/stat").read_text()
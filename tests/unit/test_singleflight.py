@@ -0,0 +1,57 @@
+"""SingleFlight coalescing tests."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from lensforge.pipeline.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    def test_concurrent_callers_share_one_call(self):
+        flight: SingleFlight[int] = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def work():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return 42
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            leader = pool.submit(flight.do, "k", work)
+            started.wait(timeout=1)
+            followers = [pool.submit(flight.do, "k", work) for _ in range(2)]
+            results = [leader.result()] + [f.result() for f in followers]
+
+        assert results == [(42, False), (42, True), (42, True)]
+        assert len(calls) == 1
+        assert flight.coalesced == 2
+
+    def test_sequential_calls_are_not_coalesced(self):
+        flight: SingleFlight[int] = SingleFlight()
+        assert flight.do("k", lambda: 1) == (1, False)
+        assert flight.do("k", lambda: 2) == (2, False)
+        assert flight.coalesced == 0
+
+    def test_error_propagates_to_followers(self):
+        flight: SingleFlight[int] = SingleFlight()
+        started = threading.Event()
+
+        def fail():
+            started.set()
+            time.sleep(0.05)
+            raise RuntimeError("boom")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, "k", fail)
+            started.wait(timeout=1)
+            follower = pool.submit(flight.do, "k", fail)
+            for f in (leader, follower):
+                with pytest.raises(RuntimeError, match="boom"):
+                    f.result()
+
+        assert flight.do("k", lambda: 3) == (3, False)
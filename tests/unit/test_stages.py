@@ -0,0 +1,299 @@
+"""Stage graph tests (all models mocked)."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from lensforge.config import Settings
+from lensforge.container import _create_stage_graph
+from lensforge.interfaces.nsfw_detector import NsfwResult
+from lensforge.interfaces.quality_checker import QualityResult
+from lensforge.pipeline.analysis_pipeline import AnalysisPipeline
+from lensforge.pipeline.stages import DEFAULT_STAGES, Stage, StageGraph
+
+
+class NoExif:
+    """Extension gate: rejects images without metadata."""
+
+    version = "no-exif-1.0"
+
+    def __init__(self, required: bool = True) -> None:
+        self.required = required
+        self.calls = 0
+
+    def check(self, image: Image.Image) -> QualityResult:
+        self.calls += 1
+        if self.required and not image.info:
+            return QualityResult(score=0.0, is_acceptable=False, reason="No EXIF metadata")
+        return QualityResult(score=1.0, is_acceptable=True)
+
+
+def _graph(quality, nsfw, classifier, *extra: Stage) -> StageGraph:
+    return StageGraph(
+        [
+            Stage("quality", "quality", quality, cost=1, version_key="nn1_quality"),
+            Stage("nsfw", "nsfw", nsfw, after=["quality"], cost=10, version_key="nn1_safety"),
+            Stage("classifier", "classifier", classifier, after=["quality"], version_key="nn2"),
+            *extra,
+        ]
+    )
+
+
+class TestStageGraph:
+    def test_default_order_and_versions(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        graph = StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+
+        assert [s.name for s in graph.order] == ["quality", "nsfw", "classifier"]
+        assert graph.versions() == {
+            "nn1_quality": "mock-quality-1.0",
+            "nn1_safety": "mock-nsfw-1.0",
+            "nn2": "mock-skin-1.0",
+        }
+
+    def test_cheap_gates_run_first(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        exif = Stage("exif", "quality", NoExif(), cost=0.1)
+        graph = _graph(mock_quality_ok, mock_nsfw_safe, mock_classifier, exif)
+
+        assert [s.name for s in graph.order] == ["exif", "quality", "nsfw", "classifier"]
+
+    @pytest.mark.parametrize(
+        ("stages", "message"),
+        [
+            ([("a", "quality", ["b"]), ("b", "quality", ["a"]), ("c", "classifier", [])], "cycle"),
+            ([("a", "quality", ["x"]), ("c", "classifier", [])], "unknown"),
+            ([("a", "quality", []), ("a", "nsfw", []), ("c", "classifier", [])], "Duplicate"),
+            ([("a", "quality", [])], "exactly one classifier"),
+            ([("c", "classifier", []), ("a", "quality", ["c"])], "after the classifier"),
+        ],
+    )
+    def test_invalid_graphs(self, mock_quality_ok, stages, message):
+        with pytest.raises(ValueError, match=message):
+            StageGraph([Stage(name, kind, mock_quality_ok, after) for name, kind, after in stages])
+
+    def test_extension_gate_rejects_with_its_status(
+        self, mock_quality_ok, mock_nsfw_safe, mock_classifier
+    ):
+        exif = Stage("exif", "quality", NoExif(), cost=0.1, reject_status="rejected_exif")
+        pipe = AnalysisPipeline(_graph(mock_quality_ok, mock_nsfw_safe, mock_classifier, exif))
+
+        result = pipe.analyze(Image.new("RGB", (224, 224)))
+
+        assert result.status == "rejected_exif"
+        assert result.reason == "No EXIF metadata"
+        assert result.model_versions["exif"] == "no-exif-1.0"
+        mock_quality_ok.check.assert_not_called()
+        mock_classifier.classify.assert_not_called()
+
+    def test_first_gate_in_order_wins_when_concurrent(
+        self, mock_quality_bad, mock_nsfw_unsafe, mock_classifier
+    ):
+        graph = StageGraph(
+            [
+                Stage("quality", "quality", mock_quality_bad, cost=1),
+                Stage("nsfw", "nsfw", mock_nsfw_unsafe, cost=10),
+                Stage("classifier", "classifier", mock_classifier, after=["quality", "nsfw"]),
+            ]
+        )
+        both_running = threading.Barrier(2, timeout=1)
+        quality_result = mock_quality_bad.check.return_value
+        nsfw_result = mock_nsfw_unsafe.detect.return_value
+
+        def check(image):
+            both_running.wait()
+            return quality_result
+
+        def detect(image):
+            both_running.wait()
+            return nsfw_result
+
+        mock_quality_bad.check.side_effect = check
+        mock_nsfw_unsafe.detect.side_effect = detect
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pipe = AnalysisPipeline(graph, stage_executor=executor)
+            result = pipe.analyze(Image.new("RGB", (224, 224)))
+
+        # Both gates ran at once and both rejected: quality comes first in the order.
+        assert result.status == "rejected_quality"
+        mock_nsfw_unsafe.detect.assert_called_once()
+        mock_classifier.classify.assert_not_called()
+
+    def test_stage_stats(self, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+        mock_nsfw_safe.detect.side_effect = lambda img: NsfwResult(
+            is_safe=img.getpixel((0, 0)) == (0, 0, 0), nsfw_score=0.5
+        )
+        graph = StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier)
+        pipe = AnalysisPipeline(graph)
+
+        pipe.analyze_batch([Image.new("RGB", (8, 8)), Image.new("RGB", (8, 8), "red")])
+
+        stats = graph.stats()
+        assert (stats["quality"].calls, stats["quality"].images) == (1, 2)
+        assert (stats["nsfw"].images, stats["nsfw"].rejected) == (2, 1)
+        assert stats["nsfw"].reject_rate == 0.5
+        assert stats["classifier"].images == 1
+        assert stats["classifier"].seconds >= 0
+
+
+class TestStageConfig:
+    def test_settings_parse_pipeline_stages(self, monkeypatch):
+        monkeypatch.setenv(
+            "PIPELINE_STAGES",
+            '[{"name": "exif", "kind": "quality", "class_path": "tests.unit.test_stages.NoExif",'
+            ' "options": {"required": false}, "cost": 0.1, "reject_status": "rejected_exif"},'
+            ' {"name": "quality", "kind": "quality"},'
+            ' {"name": "classifier", "kind": "classifier", "after": ["exif", "quality"]}]',
+        )
+
+        specs = Settings().pipeline_stages
+
+        assert [s.name for s in specs] == ["exif", "quality", "classifier"]
+        assert specs[0].options == {"required": False}
+
+    def test_container_builds_extension_stages(
+        self, mock_quality_ok, mock_nsfw_safe, mock_classifier
+    ):
+        specs = [
+            {"name": "quality", "kind": "quality"},
+            {
+                "name": "exif",
+                "kind": "quality",
+                "class_path": "tests.unit.test_stages.NoExif",
+                "options": {"required": False},
+            },
+            {"name": "classifier", "kind": "classifier", "after": ["quality", "exif"]},
+        ]
+
+        graph = _create_stage_graph(specs, mock_quality_ok, mock_nsfw_safe, mock_classifier)
+
+        exif = graph.stages[1].component
+        assert isinstance(exif, NoExif) and exif.required is False
+        assert graph.stages[0].component is mock_quality_ok
+        assert set(graph.versions()) == {"nn1_quality", "exif", "nn2"}
+
+
+class ColorGate:
+    """Gate rejecting images whose top-left pixel has one of ``colors``."""
+
+    def __init__(self, version: str, colors: set[tuple[int, int, int]], delay: float = 0.0):
+        self.version = version
+        self._colors = colors
+        self._delay = delay
+        self.seen = 0
+
+    def check(self, image: Image.Image) -> QualityResult:
+        self.seen += 1
+        time.sleep(self._delay)
+        rejected = image.getpixel((0, 0)) in self._colors
+        return QualityResult(score=0.0, is_acceptable=not rejected, reason=self.version)
+
+
+RED, GREEN, BLUE = (255, 0, 0), (0, 128, 0), (0, 0, 255)
+
+
+def _adaptive_graph(mock_classifier, adaptive: bool) -> StageGraph:
+    # Fixed order: slow "blur" (rejects red and blue) before fast "exif" (rejects green and blue).
+    blur = ColorGate("blur-1", {RED, BLUE}, delay=0.002)
+    exif = ColorGate("exif-1", {GREEN, BLUE})
+    return StageGraph(
+        [
+            Stage("blur", "quality", blur, cost=1, reject_status="rejected_quality"),
+            Stage("exif", "quality", exif, cost=2, reject_status="rejected_exif"),
+            Stage("classifier", "classifier", mock_classifier, after=["blur", "exif"]),
+        ],
+        adaptive=adaptive,
+        min_images=4,
+    )
+
+
+class TestAdaptiveOrder:
+    def test_reorders_by_cost_per_rejection(self, mock_classifier):
+        graph = _adaptive_graph(mock_classifier, adaptive=True)
+        pipe = AnalysisPipeline(graph)
+
+        assert [s.name for s in graph.current_order()] == ["blur", "exif", "classifier"]
+        for color in [GREEN, GREEN, GREEN, (0, 0, 0), RED]:
+            pipe.analyze(Image.new("RGB", (8, 8), color))
+
+        assert [s.name for s in graph.current_order()] == ["exif", "blur", "classifier"]
+        described = graph.describe()
+        assert described["fixed_order"] == ["blur", "exif", "classifier"]
+        assert described["current_order"] == ["exif", "blur", "classifier"]
+        assert described["stages"]["exif"]["recent_reject_rate"] > 0
+
+    def test_responses_match_fixed_order(self, mock_classifier):
+        colors = [GREEN, GREEN, GREEN, (0, 0, 0), RED] + [BLUE, GREEN, RED, (9, 9, 9), BLUE] * 3
+        images = [Image.new("RGB", (8, 8), color) for color in colors]
+        fixed = AnalysisPipeline(_adaptive_graph(mock_classifier, adaptive=False))
+        adaptive_graph = _adaptive_graph(mock_classifier, adaptive=True)
+        adaptive = AnalysisPipeline(adaptive_graph)
+
+        expected = [(r.status, r.reason) for r in map(fixed.analyze, images)]
+        got = [(r.status, r.reason) for r in map(adaptive.analyze, images)]
+        got_batch = [(r.status, r.reason) for r in adaptive.analyze_batch(images)]
+
+        assert got == expected
+        assert got_batch == expected
+        # Blue fails both gates: the fixed order says the blur gate decides.
+        assert expected[5] == ("rejected_quality", "blur-1")
+        assert adaptive_graph.current_order()[0].name == "exif"
+
+    def test_fixed_order_until_min_images(self, mock_classifier):
+        graph = _adaptive_graph(mock_classifier, adaptive=True)
+        AnalysisPipeline(graph).analyze(Image.new("RGB", (8, 8), GREEN))
+
+        assert [s.name for s in graph.current_order()] == ["blur", "exif", "classifier"]
+
+
+def test_adaptive_order_moves_nsfw_ahead_in_default_graph(
+    mock_quality_ok, mock_nsfw_unsafe, mock_classifier
+):
+    components = {"quality": mock_quality_ok, "nsfw": mock_nsfw_unsafe}
+    graph = StageGraph.from_specs(
+        DEFAULT_STAGES, {**components, "classifier": mock_classifier}, adaptive=True, min_images=4
+    )
+    pipe = AnalysisPipeline(graph)
+    for _ in range(4):
+        response = pipe.analyze(Image.new("RGB", (8, 8)))
+
+    assert [s.name for s in graph.current_order()] == ["nsfw", "quality", "classifier"]
+    assert pipe.analyze(Image.new("RGB", (8, 8))).status == response.status == "rejected_nsfw"
+    mock_classifier.classify.assert_not_called()
+
+
+def test_parallel_outcomes_match_sequential_with_dependent_gate(mock_classifier):
+    # "b" ranks before "c" but, depending on "a", starts after "c".
+    def graph() -> StageGraph:
+        return StageGraph(
+            [
+                Stage("a", "quality", ColorGate("a-1", {RED}), cost=1),
+                Stage("b", "quality", ColorGate("b-1", {GREEN, BLUE}), after=["a"], cost=2),
+                Stage("c", "quality", ColorGate("c-1", {BLUE, (9, 9, 9)}), cost=10),
+                Stage("classifier", "classifier", mock_classifier, after=["b", "c"]),
+            ]
+        )
+
+    colors = [RED, GREEN, BLUE, (9, 9, 9), (0, 0, 0)]
+    images = [Image.new("RGB", (8, 8), color) for color in colors]
+    sequential = AnalysisPipeline(graph())
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        parallel = AnalysisPipeline(graph(), stage_executor=executor)
+        got = [(r.status, r.reason) for r in map(parallel.analyze, images)]
+        got_batch = [(r.status, r.reason) for r in parallel.analyze_batch(images)]
+
+    expected = [(r.status, r.reason) for r in map(sequential.analyze, images)]
+    assert got == expected
+    assert got_batch == expected
+    assert [reason for _, reason in expected[:4]] == ["a-1", "b-1", "b-1", "c-1"]
+
+
+async def test_pipeline_stages_endpoint(client):
+    resp = await client.get("/pipeline/stages")
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["adaptive"] is False
+    assert data["fixed_order"] == ["quality", "nsfw", "classifier"]
+    assert set(data["stages"]["nsfw"]) >= {"calls", "images", "reject_rate", "ms_per_image"}
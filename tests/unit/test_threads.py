@@ -0,0 +1,130 @@
+"""Thread budget and CPU pinning tests."""
+
+import os
+import sys
+
+import anyio.to_thread
+import cv2
+import pytest
+
+from lensforge import threads as threads_module
+from lensforge.config import Settings
+from lensforge.container import Container
+from lensforge.threads import (
+    BLAS_ENV_VARS,
+    ThreadBudget,
+    apply_thread_budget,
+    available_cpus,
+    parse_cpu_list,
+    pin_to_cpus,
+    set_request_threads,
+    worker_cpus,
+)
+
+
+class TestDerive:
+    def test_splits_cores_across_processes(self):
+        budget = ThreadBudget.derive(cpu_threads=16, processes=4)
+        assert budget.torch_intra_op == 4
+        assert budget.blas == 4
+        assert budget.torch_inter_op == 1
+
+    def test_explicit_counts_win(self):
+        budget = ThreadBudget.derive(cpu_threads=16, torch_intra_op_threads=6, opencv_threads=2)
+        assert budget.torch_intra_op == 6
+        assert budget.opencv == 2
+
+    def test_splits_process_share_across_model_threads(self):
+        budget = ThreadBudget.derive(cpu_threads=16, processes=2, model_threads=4)
+        assert budget.torch_intra_op == 2
+
+    def test_never_below_one(self):
+        assert ThreadBudget.derive(cpu_threads=2, processes=8).torch_intra_op == 1
+
+    def test_defaults_to_available_cores(self):
+        assert ThreadBudget.derive().torch_intra_op == len(available_cpus())
+
+
+@pytest.mark.parametrize(
+    ("server_workers", "inference_workers", "expected"), [(1, 0, 16), (4, 0, 4), (2, 2, 4)]
+)
+def test_container_budget_covers_server_workers(server_workers, inference_workers, expected):
+    container = Container()
+    container.config.from_pydantic(
+        Settings(cpu_threads=16, server_workers=server_workers, inference_workers=inference_workers)
+    )
+
+    assert container.thread_budget().torch_intra_op == expected
+
+
+def test_container_budget_covers_parallel_stage_threads():
+    container = Container()
+    container.config.from_pydantic(
+        Settings(cpu_threads=16, parallel_stages=True, parallel_stage_threads=3)
+    )
+
+    # The request thread plus three stage threads may each run a model.
+    assert container.thread_budget().torch_intra_op == 4
+
+
+def test_parse_cpu_list():
+    assert parse_cpu_list("0-3,8, 10-11") == [0, 1, 2, 3, 8, 10, 11]
+    assert parse_cpu_list("") == []
+    with pytest.raises(ValueError, match="Invalid CPU list"):
+        parse_cpu_list("a-b")
+
+
+def test_worker_cpus_are_disjoint_slices():
+    cpus = list(range(8))
+    assert [worker_cpus(i, 4, cpus) for i in range(4)] == [[0, 1], [2, 3], [4, 5], [6, 7]]
+    assert worker_cpus(2, 3, [0, 1]) == [0]
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="Linux only")
+def test_pin_to_cpus():
+    before = os.sched_getaffinity(0)
+    try:
+        target = [min(before)]
+        assert pin_to_cpus(target) is True
+        assert os.sched_getaffinity(0) == set(target)
+    finally:
+        os.sched_setaffinity(0, before)
+
+
+def test_apply_thread_budget(monkeypatch):
+    for var in BLAS_ENV_VARS:
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv("MKL_NUM_THREADS", "7")
+    monkeypatch.delenv("OPENCV_FOR_THREADS_NUM", raising=False)
+    monkeypatch.setattr(threads_module, "_pending_torch", None)
+    threads = cv2.getNumThreads()
+    try:
+        apply_thread_budget(ThreadBudget.derive(cpu_threads=3, opencv_threads=2))
+
+        assert os.environ["OMP_NUM_THREADS"] == "3"
+        assert os.environ["MKL_NUM_THREADS"] == "7"  # explicit environment is kept
+        assert cv2.getNumThreads() == 2
+        assert os.environ["OPENCV_FOR_THREADS_NUM"] == "2"
+    finally:
+        cv2.setNumThreads(threads)
+
+
+def test_apply_thread_budget_defers_torch_until_imported(monkeypatch):
+    monkeypatch.setattr(threads_module, "_pending_torch", None)
+    monkeypatch.delitem(sys.modules, "torch", raising=False)
+    budget = ThreadBudget.derive(cpu_threads=2)
+
+    apply_thread_budget(budget)
+
+    assert "torch" not in sys.modules
+    assert threads_module._pending_torch == budget
+
+
+async def test_set_request_threads():
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    tokens = limiter.total_tokens
+    try:
+        set_request_threads(12)
+        assert limiter.total_tokens == 12
+    finally:
+        limiter.total_tokens = tokens
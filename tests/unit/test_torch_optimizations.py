@@ -0,0 +1,92 @@
+"""Torch CPU optimization option tests."""
+
+from unittest.mock import MagicMock
+
+import pytest
+from PIL import Image
+
+from custom.extensions.dermatology.falconsai_nsfw import FalconsaiNsfwDetector
+from custom.extensions.dermatology.vit_skin import VitSkinClassifier
+from lensforge.container import _backend_kwargs
+from lensforge.inference import torch_cpu
+from lensforge.inference.torch_cpu import optimize_pipeline, resolve_optimizations, version_suffix
+
+
+@pytest.fixture
+def bf16(monkeypatch):
+    def set_supported(supported: bool) -> None:
+        monkeypatch.setattr(torch_cpu, "bf16_supported", lambda device="cpu": supported)
+
+    return set_supported
+
+
+class TestResolveOptimizations:
+    def test_unknown_rejected(self):
+        with pytest.raises(ValueError, match="Unknown torch optimizations"):
+            resolve_optimizations(["fp8"])
+
+    def test_int8_is_cpu_only(self):
+        assert resolve_optimizations(["int8", "inference_mode"], "cuda") == {"inference_mode"}
+
+    def test_bf16_dropped_when_unsupported(self, bf16):
+        bf16(False)
+        assert resolve_optimizations(["bf16"]) == frozenset()
+
+    def test_bf16_kept_when_supported(self, bf16):
+        bf16(True)
+        assert resolve_optimizations(["bf16", "compile"]) == {"bf16", "compile"}
+
+    def test_int8_wins_over_bf16(self, bf16):
+        bf16(True)
+        assert resolve_optimizations(["int8", "bf16"]) == {"int8"}
+
+
+def test_version_suffix_only_for_numeric_changes():
+    assert version_suffix({"inference_mode", "compile"}) == ""
+    assert version_suffix({"bf16", "int8"}) == "-int8-bf16"
+
+
+def test_no_optimizations_returns_pipeline_unchanged():
+    pipe = MagicMock()
+    assert optimize_pipeline(pipe, frozenset()) is pipe
+
+
+class TestExtensions:
+    def test_versions_reflect_int8(self):
+        assert VitSkinClassifier(optimizations=["int8"]).version.endswith("-int8")
+        assert FalconsaiNsfwDetector(optimizations=["int8"]).version.endswith("-int8")
+
+    def test_default_version_unchanged(self):
+        assert FalconsaiNsfwDetector().version == "falconsai-nsfw-vit-1.0"
+
+    def test_injected_pipeline_used_as_is(self):
+        mock_pipe = MagicMock(return_value=[{"label": "nv", "score": 0.9}])
+        classifier = VitSkinClassifier(optimizations=["compile"], _pipeline=mock_pipe)
+
+        assert classifier.classify(Image.new("RGB", (8, 8))).predictions[0].label == "nv"
+
+
+class TestBackendKwargs:
+    def test_defaults_pass_nothing(self):
+        assert _backend_kwargs("torch", "models/onnx", True, None) == {}
+
+    def test_optimizations_passed_on_torch(self):
+        assert _backend_kwargs("torch", "models/onnx", True, ["int8"]) == {
+            "optimizations": ["int8"]
+        }
+
+    def test_onnx_ignores_optimizations(self):
+        assert "optimizations" not in _backend_kwargs("onnx", "models/onnx", True, ["int8"])
+
+
+def test_wrapped_pipeline_runs_under_inference_mode():
+    torch = pytest.importorskip("torch")
+    seen = {}
+
+    def pipe(image):
+        seen["inference"] = torch.is_inference_mode_enabled()
+        return []
+
+    wrapped = torch_cpu.TorchOptimizedPipeline(pipe, frozenset({"inference_mode"}))
+    wrapped(Image.new("RGB", (8, 8)))
+    assert seen["inference"] is True
@@ -0,0 +1,168 @@
+"""Tracing tests (spans collected in memory; models mocked)."""
+
+import base64
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+pytest.importorskip("opentelemetry.sdk")
+
+from opentelemetry.sdk.trace import TracerProvider  # noqa: E402
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor  # noqa: E402
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (  # noqa: E402
+    InMemorySpanExporter,
+)
+
+from lensforge import tracing  # noqa: E402
+from lensforge.container import _create_tracer_provider  # noqa: E402
+from lensforge.pipeline.analysis_pipeline import AnalysisPipeline  # noqa: E402
+from lensforge.pipeline.batching import MicroBatcher  # noqa: E402
+from lensforge.pipeline.stages import StageGraph  # noqa: E402
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def spans():
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    tracing.install(provider)
+    yield exporter
+    tracing.uninstall()
+    provider.shutdown()
+
+
+def _by_name(exporter) -> dict:
+    return {span.name: span for span in exporter.get_finished_spans()}
+
+
+def _png_base64(size: tuple[int, int] = (40, 30)) -> str:
+    buf = io.BytesIO()
+    Image.new("RGB", size, color=(120, 80, 60)).save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+async def test_request_continues_incoming_trace(client, spans):
+    resp = await client.post(
+        "/analyze",
+        json={"image_base64": _png_base64()},
+        headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"},
+    )
+
+    assert resp.status_code == 200
+    assert resp.headers["traceparent"].split("-")[1] == TRACE_ID
+    by_name = _by_name(spans)
+    assert {
+        "POST /analyze",
+        "image.load",
+        "pipeline.analyze",
+        "stage.quality",
+        "quality.check",
+        "stage.nsfw",
+        "nsfw.detect",
+        "stage.classifier",
+        "classifier.classify",
+    } <= set(by_name)
+    assert all(format(s.context.trace_id, "032x") == TRACE_ID for s in by_name.values())
+    server = by_name["POST /analyze"]
+    assert format(server.parent.span_id, "016x") == PARENT_ID
+    assert server.attributes["http.response.status_code"] == 200
+    # The sync handler runs on a worker thread: its spans still nest under the server span.
+    assert by_name["image.load"].parent.span_id == server.context.span_id
+    assert by_name["image.load"].attributes["image.width"] == 40
+    pipeline = by_name["pipeline.analyze"]
+    assert by_name["stage.nsfw"].parent.span_id == pipeline.context.span_id
+    assert by_name["nsfw.detect"].parent.span_id == by_name["stage.nsfw"].context.span_id
+    assert by_name["nsfw.detect"].attributes["model.version"] == "mock-nsfw-1.0"
+
+
+async def test_batch_url_downloads_are_traced(client, spans, image_server):
+    url = image_server.add_image("/a.jpg", size=(64, 48))
+
+    await client.post("/batch-analyze", json={"images": [{"image_url": url}]})
+
+    by_name = _by_name(spans)
+    load = by_name["image.load"]
+    assert load.attributes["image.source"] == "url"
+    assert load.attributes["image.height"] == 48
+    assert load.parent.span_id == by_name["POST /batch-analyze"].context.span_id
+    assert by_name["pipeline.analyze_batch"].attributes["batch.size"] == 1
+
+
+def test_cache_and_parallel_stages(spans, mock_quality_ok, mock_nsfw_safe, mock_classifier):
+    from lensforge.cache.memory import MemoryResultCache
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pipe = AnalysisPipeline(
+            StageGraph.default(mock_quality_ok, mock_nsfw_safe, mock_classifier),
+            cache=MemoryResultCache(),
+            stage_executor=executor,
+        )
+        pipe.analyze(Image.new("RGB", (8, 8)))
+        pipe.analyze(Image.new("RGB", (8, 8)))
+
+    finished = spans.get_finished_spans()
+    first, second = [s for s in finished if s.name == "pipeline.analyze"]
+    assert (first.attributes["cache.hit"], second.attributes["cache.hit"]) == (False, True)
+    # The classifier ran on the executor thread, under the first analysis.
+    (classifier,) = [s for s in finished if s.name == "stage.classifier"]
+    assert classifier.parent.span_id == first.context.span_id
+
+
+def test_micro_batch_wait_and_linked_batch(spans):
+    release = threading.Event()
+
+    def batch_fn(images):
+        release.wait(1)
+        return list(images)
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=2, max_wait_ms=200, name="test-batcher")
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(batcher, Image.new("RGB", (8, 8))) for _ in range(2)]
+        release.set()
+        [f.result() for f in futures]
+
+    finished = spans.get_finished_spans()
+    waits = [s for s in finished if s.name == "test-batcher.wait"]
+    (batch,) = [s for s in finished if s.name == "test-batcher.batch"]
+    assert [w.attributes["batch.size"] for w in waits] == [2, 2]
+    assert all(w.attributes["batch.queue_wait_ms"] >= 0 for w in waits)
+    assert {link.context.span_id for link in batch.links} == {w.context.span_id for w in waits}
+
+
+def test_disabled_tracing_is_a_shared_noop():
+    assert not tracing.enabled()
+    with tracing.span("x", {"a": 1}) as span:
+        assert not span.is_recording()
+    assert tracing.span("y") is tracing.span("z")
+
+
+def test_jsonl_exporter(tmp_path):
+    provider = _create_tracer_provider(
+        "jsonl", "lensforge-test", 1.0, "", str(tmp_path / "spans-{pid}.jsonl")
+    )
+    tracing.install(provider)
+    try:
+        with tracing.span("outer"):
+            with tracing.span("inner", {"batch.size": 3}):
+                pass
+    finally:
+        tracing.uninstall()
+        provider.shutdown()
+
+    lines = (tmp_path / f"spans-{os.getpid()}.jsonl").read_text().splitlines()
+    records = {r["name"]: r for r in map(json.loads, lines)}
+    assert records["inner"]["attributes"] == {"batch.size": 3}
+    assert records["inner"]["parent_id"] == records["outer"]["context"]["span_id"]
+    assert records["outer"]["resource"]["attributes"]["service.name"] == "lensforge-test"
+
+
+def test_none_exporter_disables_tracing():
+    assert _create_tracer_provider("none", "lensforge", 1.0, "", "") is None
@@ -56,6 +56,21 @@ class TestVitSkin:
         assert "nv" in result.description
         assert "90" in result.description
 
+    def test_classify_batch(self):
+        mock_pipe = MagicMock()
+        mock_pipe.return_value = [
+            [{"label": "nv", "score": 0.85}, {"label": "mel", "score": 0.10}],
+            [{"label": "mel", "score": 0.78}, {"label": "nv", "score": 0.15}],
+        ]
+
+        classifier = VitSkinClassifier(_pipeline=mock_pipe)
+        images = [Image.new("RGB", (224, 224)), Image.new("RGB", (224, 224))]
+        results = classifier.classify_batch(images)
+
+        assert [r.predictions[0].label for r in results] == ["nv", "mel"]
+        assert results[1].predictions[0].risk_level == "high"
+        mock_pipe.assert_called_once_with(images, batch_size=2)
+
     def test_version(self):
         classifier = VitSkinClassifier(_pipeline=MagicMock())
         assert "vit-skin" in classifier.version
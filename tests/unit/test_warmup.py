@@ -0,0 +1,90 @@
+"""Tests for startup warmup."""
+
+from unittest.mock import MagicMock
+
+from lensforge.cache.sqlite import SqliteResultCache
+from lensforge.interfaces.domain_classifier import ClassificationResult
+from lensforge.interfaces.nsfw_detector import NsfwResult
+from lensforge.interfaces.quality_checker import QualityResult
+from lensforge.pipeline.stages import StageGraph
+from lensforge.schemas.response import AnalyzeResponse
+from lensforge.warmup import load_models, warm_up, warmup_image
+
+
+class _BatchDetector:
+    version = "test"
+
+    def __init__(self) -> None:
+        self.single = 0
+        self.batches: list[int] = []
+
+    def detect(self, image):
+        self.single += 1
+        return NsfwResult(is_safe=True, nsfw_score=0.0)
+
+    def detect_batch(self, images):
+        self.batches.append(len(images))
+        return [NsfwResult(is_safe=True, nsfw_score=0.0) for _ in images]
+
+
+def _container(detector) -> MagicMock:
+    container = MagicMock()
+    container.quality_checker.return_value.check.return_value = QualityResult(
+        score=1.0, is_acceptable=True
+    )
+    container.nsfw_detector.return_value = detector
+    container.domain_classifier.return_value.classify.return_value = ClassificationResult(
+        detected=False
+    )
+    container.stage_graph.return_value = StageGraph.default(
+        container.quality_checker(), detector, container.domain_classifier()
+    )
+    container.reset_mock()
+    return container
+
+
+def test_warm_up_builds_singletons_and_runs_each_batch_size():
+    detector = _BatchDetector()
+    container = _container(detector)
+
+    warm_up(container, runs=2, batch_sizes=[1, 4])
+
+    container.image_loader.assert_called_once()
+    container.result_cache.assert_called_once()
+    assert detector.single == 2
+    assert detector.batches == [4, 4]
+    assert container.quality_checker.return_value.check.call_count == 2 + 2 * 4
+    assert container.domain_classifier.return_value.classify.call_count == 2 + 2 * 4
+
+
+def test_warm_up_zero_runs_only_builds_singletons():
+    detector = _BatchDetector()
+    container = _container(detector)
+
+    warm_up(container, runs=0, batch_sizes=[1, 8])
+
+    container.stage_graph.assert_called_once()
+    assert detector.single == 0
+    assert detector.batches == []
+
+
+def test_load_models_purges_results_of_other_model_versions(tmp_path):
+    container = _container(_BatchDetector())
+    container.quality_checker.return_value.version = "q1"
+    container.domain_classifier.return_value.version = "c1"
+    cache = SqliteResultCache(str(tmp_path / "c.sqlite3"))
+    container.result_cache.return_value = cache
+    current = container.stage_graph().versions()
+    cache.set("old", AnalyzeResponse(status="success", model_versions={**current, "nn2": "v0"}))
+    cache.set("new", AnalyzeResponse(status="success", model_versions=current))
+
+    load_models(container)
+
+    assert cache.stats().entries == 1
+    assert cache.get("new", current) is not None
+
+
+def test_warmup_image_is_rgb():
+    image = warmup_image(64)
+    assert image.mode == "RGB"
+    assert image.size == (64, 64)